@@ -1,16 +1,13 @@
 # auth/routes.py
 from fastapi import APIRouter, Body, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from supabase import create_client
-from dotenv import load_dotenv
 import os
+import threading
 
 from config import get_monthly_question_limit, ERROR_MESSAGES, SUCCESS_MESSAGES
 from utils.logging_config import get_logger
 from utils.exceptions import AuthenticationError, EmailNotVerifiedError, ValidationError
-
-load_dotenv()
+from utils.tracing import span
 
 # Setup logging
 logger = get_logger("auth")
@@ -19,20 +16,34 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", SUPABASE_KEY)  # Add this
 
-# Initialize supabase client if credentials are available
-supabase_client = None
+# The supabase client is created on first use so cold starts that only serve pages don't pay for it
+_supabase_client = None
+_supabase_lock = threading.Lock()
 if not SUPABASE_URL or not SUPABASE_KEY:
     logger.warning("⚠️  SUPABASE_URL and SUPABASE_KEY not set - Authentication will not work!")
     logger.warning("Please set environment variables in Vercel: Settings → Environment Variables")
-else:
-    supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    logger.info("✓ Supabase client initialized successfully")
+
+
+def get_supabase_client():
+    """Return the Supabase client, creating it on first use (None if credentials are missing)"""
+    global _supabase_client
+    if _supabase_client is None and SUPABASE_URL and SUPABASE_KEY:
+        with _supabase_lock:
+            if _supabase_client is None:
+                from supabase import create_client
+                _supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                logger.info("✓ Supabase client initialized successfully")
+    return _supabase_client
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 auth_router = APIRouter()
 
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
+    from jose import jwt, JWTError
+
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -40,6 +51,7 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     )
 
     # Check if Supabase is configured
+    supabase_client = get_supabase_client()
     if not supabase_client:
         raise HTTPException(
             status_code=503,
@@ -52,16 +64,17 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
 
         # Supabase tokens need the JWT secret to decode
         # Skip signature, audience, and expiry verification since Supabase handles that
-        payload = jwt.decode(
-            token,
-            SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
-            options={
-                "verify_signature": False,
-                "verify_aud": False,
-                "verify_exp": False
-            }
-        )
+        with span("jwt_decode"):
+            payload = jwt.decode(
+                token,
+                SUPABASE_JWT_SECRET,
+                algorithms=["HS256"],
+                options={
+                    "verify_signature": False,
+                    "verify_aud": False,
+                    "verify_exp": False
+                }
+            )
 
         user_id = payload.get("sub")  # Supabase uses 'sub' for user ID
         email = payload.get("email")
@@ -86,7 +99,8 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
 
     # Query Supabase for the user
     print(f"[AUTH] Querying Supabase for user: {user_id}")
-    response = supabase_client.table("users").select("*").eq("id", user_id).execute()
+    with span("user_lookup"):
+        response = supabase_client.table("users").select("*").eq("id", user_id).execute()
 
     if not response.data:
         print(f"[AUTH] User not found in database: {user_id}")
@@ -126,6 +140,7 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
 
 @auth_router.post("/register")
 async def register(username: str = Body(...), email: str = Body(...), password: str = Body(...)):
+    supabase_client = get_supabase_client()
     if not supabase_client:
         raise HTTPException(
             status_code=503,
@@ -185,6 +200,7 @@ async def register(username: str = Body(...), email: str = Body(...), password:
 
 @auth_router.post("/login")
 async def login(email: str = Body(...), password: str = Body(...)):
+    supabase_client = get_supabase_client()
     if not supabase_client:
         raise HTTPException(
             status_code=503,
@@ -211,7 +227,7 @@ async def login(email: str = Body(...), password: str = Body(...)):
 async def resend_verification(email: str = Body(...)):
     try:
         # Supabase resend verification email
-        supabase_client.auth.resend({
+        get_supabase_client().auth.resend({
             "type": "signup",
             "email": email
         })
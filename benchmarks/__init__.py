@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Load, soak and micro-benchmarks (run as modules, e.g. python -m benchmarks.load_test)
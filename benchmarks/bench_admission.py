@@ -0,0 +1,131 @@
+# benchmarks/bench_admission.py - Load shedding on /generate under a burst of generations
+"""
+Sends a burst of generate requests (POST /api/generator/generate's handler)
+to a fake provider with limited capacity: beyond --fake-capacity concurrent
+completions it shares its output speed, so every call slows down as load
+grows, like a saturated real provider.
+
+Each burst runs twice:
+
+    off   every request is accepted and goes straight to the provider
+    on    utils.admission admits requests by AI call slots and estimated
+          completion time; the rest get 503 + Retry-After
+
+and reports how many accepted requests finished within the SLO, their
+latency, and the output tokens spent per test delivered within the SLO.
+
+The estimator is warmed up with a few sequential generations first, as a
+running server's would be.
+
+Usage:
+    python -m benchmarks.bench_admission
+    python -m benchmarks.bench_admission --requests 60 --arrival-ms 100 --slo 15
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import FakeProviderProcess, percentile, print_table, save_results
+from benchmarks.fixtures import make_request_payload
+
+
+def _completion_tokens() -> float:
+    from utils import metrics
+
+    return sum(value for labels, value in metrics.AI_TOKENS_TOTAL.values().items() if labels[-1] == "completion")
+
+
+async def run_burst(mode: str, args) -> Dict[str, Any]:
+    from fastapi import HTTPException
+
+    from generator import routes
+    from utils.admission import AdmissionController
+
+    routes.admission = AdmissionController(max_calls=args.max_calls, slo_seconds=args.slo, enabled=mode == "on")
+    user = {"id": "bench", "tier": "business"}
+    outcomes: List[Dict[str, Any]] = []
+
+    async def one(i: int):
+        await asyncio.sleep(i * args.arrival_ms / 1000)
+        payload = make_request_payload(args.questions, ["single-choice", "true-false"])
+        payload["practice_test_title"] = f"{mode} burst {i}"
+        request = routes.GenerateTestRequest(**payload)
+        start = time.perf_counter()
+        try:
+            await routes.generate_test(request, user, idempotency_key=None, prefer=None)
+            status = 200
+        except HTTPException as e:
+            status = e.status_code
+        outcomes.append({"status": status, "seconds": time.perf_counter() - start})
+
+    tokens_before = _completion_tokens()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    total_tokens = _completion_tokens() - tokens_before
+
+    accepted = [o for o in outcomes if o["status"] == 200]
+    in_slo = [o for o in accepted if o["seconds"] <= args.slo]
+    latencies = [o["seconds"] for o in accepted]
+    return {
+        "admission": mode,
+        "accepted": len(accepted),
+        "rejected_503": sum(o["status"] == 503 for o in outcomes),
+        "failed": sum(o["status"] not in (200, 503) for o in outcomes),
+        "within_slo": len(in_slo),
+        "accepted_in_slo": f"{len(in_slo) / len(accepted):.0%}" if accepted else "",
+        "p50_s": round(percentile(latencies, 50), 1),
+        "p95_s": round(percentile(latencies, 95), 1),
+        "output_tokens": round(total_tokens),
+        "tokens_per_test_in_slo": round(total_tokens / len(in_slo)) if in_slo else "",
+    }
+
+
+async def run_all(args) -> List[Dict[str, Any]]:
+    from generator import routes
+
+    # Warm the estimator with uncontended generations
+    for i in range(args.warmup):
+        payload = make_request_payload(args.questions, ["single-choice", "true-false"])
+        payload["practice_test_title"] = f"Warm-up {i}"
+        await routes.generate_questions_with_ai(routes.GenerateTestRequest(**payload))
+    return [await run_burst(mode, args) for mode in ("off", "on")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure admission control under a burst of generations")
+    parser.add_argument("--requests", type=int, default=40, help="Generate requests in the burst")
+    parser.add_argument("--arrival-ms", type=float, default=150, help="Time between request arrivals")
+    parser.add_argument("--questions", type=int, default=30, help="Questions per request")
+    parser.add_argument("--slo", type=float, default=20, help="Completion time target (ADMISSION_SLO_SECONDS)")
+    parser.add_argument("--max-calls", type=int, default=12, help="AI call slots (ADMISSION_MAX_AI_CALLS)")
+    parser.add_argument("--warmup", type=int, default=3, help="Sequential generations before the bursts")
+    parser.add_argument("--fake-port", type=int, default=8001)
+    parser.add_argument("--fake-latency-ms", type=float, default=300)
+    parser.add_argument("--fake-tokens-per-sec", type=float, default=600)
+    parser.add_argument("--fake-capacity", type=float, default=12, help="Completions at full speed at once")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    # Settings are read at import time: point the generator at the fake provider before importing it
+    os.environ.update(AI_PROVIDER="fake", FAKE_PROVIDER_URL=f"http://127.0.0.1:{args.fake_port}",
+                      CHECKPOINT_BACKEND="off", HISTORY_BACKEND="off", IDEMPOTENCY_BACKEND="off",
+                      RATE_LIMIT_BACKEND="off", TRACE_EXPORT="off")
+    import logging
+    import utils.logging_config  # noqa: F401 - configures the logger before we silence it
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    with FakeProviderProcess(port=args.fake_port, latency_ms=args.fake_latency_ms, jitter_ms=0,
+                             tokens_per_sec=args.fake_tokens_per_sec, capacity=args.fake_capacity):
+        rows = asyncio.run(run_all(args))
+
+    print()
+    print_table(rows, ["admission", "accepted", "rejected_503", "failed", "within_slo", "accepted_in_slo",
+                       "p50_s", "p95_s", "output_tokens", "tokens_per_test_in_slo"])
+    path = save_results("bench_admission", {"settings": vars(args), "results": rows}, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_compression.py - Bytes saved vs. CPU cost of response compression levels
+"""
+Compresses realistic generator payloads the way CompressionMiddleware does
+(StreamCompressor fed CSV_CHUNK_SIZE chunks) at each brotli/gzip level and
+reports the compressed size, bytes saved and CPU time per payload:
+
+    csv    Udemy CSV from generate_test (convert_to_udemy_csv)
+    json   The questions as a JSON API body
+
+Usage:
+    python -m benchmarks.bench_compression
+    python -m benchmarks.bench_compression --sizes 250,1000 --payloads csv --gzip-levels 1,6,9 --br-levels 1,5,11
+"""
+
+import argparse
+import json
+from typing import Any, Callable, Dict, List
+
+from benchmarks.common import measure, print_table, save_results
+from benchmarks.fixtures import make_questions
+
+DEFAULT_SIZES = [20, 250, 1000]
+DEFAULT_GZIP_LEVELS = [1, 4, 6, 9]
+DEFAULT_BR_LEVELS = [1, 4, 5, 6, 9, 11]
+
+
+def make_payloads(size: int) -> Dict[str, bytes]:
+    from generator.models import Question
+    from generator.export import convert_to_udemy_csv
+
+    questions = make_questions(size)
+    return {
+        "csv": convert_to_udemy_csv([Question.from_dict(q) for q in questions]).encode("utf-8"),
+        "json": json.dumps({"questions": questions}).encode("utf-8"),
+    }
+
+
+def chunked_compressor(data: bytes, encoding: str, level: int) -> Callable[[], bytes]:
+    """Return a callable compressing data chunk by chunk, as the middleware does for a StreamingResponse"""
+    from generator.routes import CSV_CHUNK_SIZE
+    from utils.compression import StreamCompressor
+
+    chunks = [data[i:i + CSV_CHUNK_SIZE] for i in range(0, len(data), CSV_CHUNK_SIZE)]
+
+    def run() -> bytes:
+        compressor = StreamCompressor(encoding, level)
+        out = [compressor.compress(chunk) for chunk in chunks]
+        out.append(compressor.finish())
+        return b"".join(out)
+    return run
+
+
+def main():
+    from utils.compression import BROTLI_AVAILABLE, STREAM_COMPRESSION_LEVELS
+
+    parser = argparse.ArgumentParser(description="Response compression size/CPU trade-off per level")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="Questions per payload")
+    parser.add_argument("--payloads", default="csv,json")
+    parser.add_argument("--gzip-levels", default=",".join(str(l) for l in DEFAULT_GZIP_LEVELS))
+    parser.add_argument("--br-levels", default=",".join(str(l) for l in DEFAULT_BR_LEVELS))
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds of timing per level")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    levels = [("gzip", int(l)) for l in args.gzip_levels.split(",") if l]
+    if BROTLI_AVAILABLE:
+        levels += [("br", int(l)) for l in args.br_levels.split(",") if l]
+    else:
+        print("brotli is not installed - measuring gzip only")
+
+    rows: List[Dict[str, Any]] = []
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        payloads = make_payloads(size)
+        for name in (p for p in args.payloads.split(",") if p):
+            data = payloads[name]
+            for encoding, level in levels:
+                func = chunked_compressor(data, encoding, level)
+                compressed = len(func())
+                result = measure(func, min_time=args.min_time)
+                row = {
+                    "payload": name,
+                    "questions": size,
+                    "encoding": encoding,
+                    "level": level,
+                    "default": "*" if STREAM_COMPRESSION_LEVELS.get(encoding) == level else "",
+                    "raw_kb": round(len(data) / 1024, 1),
+                    "compressed_kb": round(compressed / 1024, 1),
+                    "saved_pct": round((1 - compressed / len(data)) * 100, 1),
+                    "cpu_ms": result["median_ms"],
+                    "mb_per_s": round(len(data) / 1024 / 1024 / (result["median_ms"] / 1000), 1),
+                    "peak_alloc_kb": result["peak_alloc_kb"],
+                }
+                rows.append(row)
+                print(f"  {name}[{size}] {encoding}-{level}: {row['raw_kb']}KB -> {row['compressed_kb']}KB "
+                      f"in {row['cpu_ms']}ms")
+
+    print()
+    print_table(rows, ["payload", "questions", "encoding", "level", "default", "raw_kb", "compressed_kb",
+                       "saved_pct", "cpu_ms", "mb_per_s", "peak_alloc_kb"])
+
+    path = save_results("bench_compression", {"settings": vars(args), "levels": rows}, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
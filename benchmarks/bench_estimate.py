@@ -0,0 +1,96 @@
+# benchmarks/bench_estimate.py - Accuracy and latency of the generation estimate
+"""
+Runs a series of generations of different sizes and explanation styles
+against the fake provider. Before each run the request is estimated
+(generator.routes.estimate_generation) and compared with the run's actual
+wall time and output tokens, so the table shows the estimator converging
+from its config priors to the provider's real behaviour.
+
+Also times estimate_generation itself (it must stay well under 5 ms).
+
+Usage:
+    python -m benchmarks.bench_estimate
+    python -m benchmarks.bench_estimate --rounds 3 --fake-tokens-per-sec 150
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import FakeProviderProcess, measure, print_table, save_results
+from benchmarks.fixtures import make_request_payload
+
+SCENARIOS = [(20, "short-concise"), (60, "technical"), (30, "very-detailed"), (100, "technical")]
+
+
+def _completion_tokens() -> float:
+    from utils import metrics
+
+    return sum(value for labels, value in metrics.AI_TOKENS_TOTAL.values().items() if labels[-1] == "completion")
+
+
+async def run_scenarios(rounds: int) -> List[Dict[str, Any]]:
+    from generator import routes
+
+    rows = []
+    for round_index in range(rounds):
+        for questions, style in SCENARIOS:
+            payload = make_request_payload(questions, ["single-choice", "true-false"])
+            payload["explanation_style"] = style
+            request = routes.GenerateTestRequest(**payload)
+            estimate = routes.estimate_generation(request)
+
+            tokens_before = _completion_tokens()
+            start = time.perf_counter()
+            await routes.generate_questions_with_ai(request)
+            elapsed = time.perf_counter() - start
+            tokens = _completion_tokens() - tokens_before
+            rows.append({
+                "round": round_index + 1, "questions": questions, "style": style,
+                "estimated_s": estimate.seconds, "actual_s": round(elapsed, 1),
+                "time_error": f"{(estimate.seconds - elapsed) / elapsed:+.0%}",
+                "estimated_tokens": estimate.output_tokens, "actual_tokens": round(tokens),
+                "token_error": f"{(estimate.output_tokens - tokens) / tokens:+.0%}" if tokens else "",
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure generation estimate accuracy and latency")
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over the scenarios")
+    parser.add_argument("--fake-port", type=int, default=8001)
+    parser.add_argument("--fake-latency-ms", type=float, default=300)
+    parser.add_argument("--fake-tokens-per-sec", type=float, default=400)
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    # Settings are read at import time: point the generator at the fake provider before importing it
+    os.environ.update(AI_PROVIDER="fake", FAKE_PROVIDER_URL=f"http://127.0.0.1:{args.fake_port}",
+                      CHECKPOINT_BACKEND="off", HISTORY_BACKEND="off", TRACE_EXPORT="off")
+    import logging
+    import utils.logging_config  # noqa: F401 - configures the logger before we silence it
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    with FakeProviderProcess(port=args.fake_port, latency_ms=args.fake_latency_ms, jitter_ms=0,
+                             tokens_per_sec=args.fake_tokens_per_sec):
+        rows = asyncio.run(run_scenarios(args.rounds))
+
+    from generator import routes
+
+    payload = make_request_payload(250, ["mix-all"])
+    payload["explanation_style"] = "very-detailed"
+    timing = measure(lambda: routes.estimate_generation(routes.GenerateTestRequest(**payload)))
+
+    print()
+    print_table(rows, ["round", "questions", "style", "estimated_s", "actual_s", "time_error",
+                       "estimated_tokens", "actual_tokens", "token_error"])
+    print(f"\nestimate_generation (250 questions, two-phase): {timing}")
+    path = save_results("bench_estimate", {"settings": vars(args), "results": rows, "estimate_timing": timing},
+                        args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
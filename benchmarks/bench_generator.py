@@ -0,0 +1,140 @@
+# benchmarks/bench_generator.py - Micro-benchmarks for the generator's CPU-bound stages
+"""
+Measures how the CPU-bound stages of a generation scale with the number of
+questions, recording both time and memory allocation per stage:
+
+    distribution   get_question_type_distribution
+    prompt         build_generation_prompt (prompt construction)
+    validate       parse_ai_response + validate_questions (JSON parse, validation and repair)
+    csv_encode     convert_to_udemy_csv + UTF-8 encode
+
+Usage:
+    python -m benchmarks.bench_generator
+    python -m benchmarks.bench_generator --sizes 20,250,10000 --stages csv_encode,validate
+    python -m benchmarks.bench_generator --baseline benchmarks/results/bench_generator-....json --max-regression 0.2
+
+With --baseline, exits non-zero if any stage got slower than --max-regression
+(fraction) so it can gate a deploy.
+"""
+
+import argparse
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.common import load_results, measure, print_table, save_results
+from benchmarks.fixtures import make_questions, make_request_payload, make_response_text
+
+DEFAULT_SIZES = [20, 100, 250, 1000, 10000]
+
+# Registered benchmarks: name -> setup(size) returning a zero-argument callable to time
+BENCHMARKS: Dict[str, Callable[[int], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark; the decorated function does setup and returns the callable to time"""
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def _generator():
+    from generator import routes
+    return routes
+
+
+@benchmark("distribution")
+def bench_distribution(size: int):
+    routes = _generator()
+    format_sets = [["mix-all"], ["single-choice", "multiple-select", "true-false", "scenario-based"], ["true-false"]]
+    return lambda: [routes.get_question_type_distribution(f, size) for f in format_sets]
+
+
+@benchmark("prompt")
+def bench_prompt(size: int):
+    routes = _generator()
+    # model_construct skips the 250-question request limit so bulk sizes can be measured
+    request = routes.GenerateTestRequest.model_construct(**make_request_payload(size))
+    distribution = routes.get_question_type_distribution(request.question_formats, size)
+    return lambda: routes.build_generation_prompt(request, distribution)
+
+
+@benchmark("validate")
+def bench_validate(size: int):
+    routes = _generator()
+    from generator.validation import validate_questions
+    response_text = make_response_text(make_questions(size))
+    return lambda: validate_questions(routes.parse_ai_response(response_text))
+
+
+@benchmark("csv_encode")
+def bench_csv_encode(size: int):
+    from generator.export import convert_to_udemy_csv
+    from generator.models import Question
+    questions = [Question.from_dict(q) for q in make_questions(size)]
+    return lambda: convert_to_udemy_csv(questions).encode("utf-8")
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Return descriptions of stages whose median time regressed beyond the threshold"""
+    previous = {(r["stage"], r["size"]): r for r in baseline["results"]["benchmarks"]}
+    regressions = []
+    for row in results:
+        old = previous.get((row["stage"], row["size"]))
+        if not old or not old["median_ms"]:
+            continue
+        change = (row["median_ms"] - old["median_ms"]) / old["median_ms"]
+        row["vs_baseline"] = f"{change:+.1%}"
+        if change > max_regression:
+            regressions.append(f"{row['stage']}[{row['size']}]: {old['median_ms']}ms -> {row['median_ms']}ms ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for generator CPU-bound stages")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--stages", default=",".join(BENCHMARKS), help=f"Subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds of timing per benchmark")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed median slowdown vs baseline before failing (fraction)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    stages = [s for s in args.stages.split(",") if s]
+
+    rows: List[Dict[str, Any]] = []
+    for stage in stages:
+        if stage not in BENCHMARKS:
+            raise SystemExit(f"Unknown stage: {stage} (choose from {', '.join(BENCHMARKS)})")
+        for size in sizes:
+            func = BENCHMARKS[stage](size)
+            result = measure(func, min_time=args.min_time)
+            row = {"stage": stage, "size": size, **result,
+                   "us_per_question": round(result["median_ms"] * 1000 / size, 2)}
+            rows.append(row)
+            print(f"  {stage}[{size}]: median={row['median_ms']}ms peak_alloc={row['peak_alloc_kb']}KB")
+
+    regressions: Optional[List[str]] = None
+    if args.baseline:
+        regressions = compare(rows, load_results(args.baseline), args.max_regression)
+
+    columns = ["stage", "size", "rounds", "median_ms", "us_per_question", "peak_alloc_kb", "retained_kb"]
+    if args.baseline:
+        columns.append("vs_baseline")
+    print()
+    print_table(rows, columns)
+
+    path = save_results("bench_generator", {"settings": vars(args), "benchmarks": rows}, args.output)
+    print(f"\nResults saved to {path}")
+
+    if regressions:
+        print("\nRegressions beyond threshold:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
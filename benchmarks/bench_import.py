@@ -0,0 +1,84 @@
+# benchmarks/bench_import.py - Throughput and peak memory of importing uploaded Udemy CSVs
+"""
+Writes Udemy CSVs of increasing size (from the benchmark fixtures) to disk,
+the way the multipart parser spools an upload, and times scan_import over
+them with tracemalloc tracking the peak memory allocated while scanning. The
+peak should stay flat as the file grows: rows are validated a chunk at a
+time and only counts and question fingerprints are kept.
+
+A second pass writes the merged CSV (valid rows followed by nothing new),
+as the extend endpoint does.
+
+Usage:
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --sizes 1000,10000 --runs 3
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from benchmarks.common import percentile, print_table, save_results
+from benchmarks.fixtures import make_questions
+
+DEFAULT_SIZES = [1000, 5000, 10000]
+
+
+def measure_pass(run: Callable[[], Any], runs: int) -> Dict[str, float]:
+    durations: List[float] = []
+    peaks: List[int] = []
+    for _ in range(runs):
+        tracemalloc.start()
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {"p50_ms": percentile(durations, 50) * 1000, "peak_kb": max(peaks) / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import throughput and peak memory per upload size")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    from generator.export import convert_to_udemy_csv
+    from generator.importer import merged_csv_file, scan_import
+    from generator.models import Question
+
+    rows: List[Dict[str, Any]] = []
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        upload = tempfile.TemporaryFile()
+        questions = [Question.from_dict(q) for q in make_questions(size, long_explanations=False)]
+        upload.write(convert_to_udemy_csv(questions).encode("utf-8"))
+        file_mb = upload.tell() / 1024 / 1024
+        del questions
+
+        report = scan_import(upload)
+        scan = measure_pass(lambda: scan_import(upload), args.runs)
+        merge = measure_pass(lambda: merged_csv_file(upload, []).close(), args.runs)
+        upload.close()
+
+        rows.append({
+            "rows": size,
+            "file_mb": round(file_mb, 2),
+            "valid": report.valid,
+            "scan_p50_ms": round(scan["p50_ms"], 1),
+            "rows_per_s": round(size / scan["p50_ms"] * 1000),
+            "scan_peak_kb": round(scan["peak_kb"]),
+            "merge_p50_ms": round(merge["p50_ms"], 1),
+            "merge_peak_kb": round(merge["peak_kb"]),
+        })
+
+    print_table(rows, ["rows", "file_mb", "valid", "scan_p50_ms", "rows_per_s", "scan_peak_kb",
+                       "merge_p50_ms", "merge_peak_kb"])
+    path = save_results("bench_import", {"settings": vars(args), "results": rows}, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_offload.py - Event-loop stalls caused by large CSV exports, inline vs. offloaded
+"""
+Encodes Udemy CSVs of increasing size with encode_udemy_csv while a probe
+task on the same event loop wakes up every millisecond, the way other
+requests' handlers would. Reports the export time and the longest the probe
+was kept waiting (the extra latency an unrelated request would see):
+
+    inline    CPU_OFFLOAD=off - everything on the event loop
+    thread    Thread pool
+    process   Process pool (the default)
+
+Usage:
+    python -m benchmarks.bench_offload
+    python -m benchmarks.bench_offload --sizes 250,1000 --runs 10 --workers 2
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import percentile, print_table, save_results
+from benchmarks.fixtures import make_questions
+
+DEFAULT_SIZES = [50, 250, 1000, 5000]
+PROBE_INTERVAL = 0.001
+
+
+async def export_with_probe(questions, runs: int) -> Dict[str, float]:
+    from generator.export import encode_udemy_csv
+
+    stalls: List[float] = []
+    durations: List[float] = []
+    for _ in range(runs):
+        done = asyncio.Event()
+        worst = 0.0
+
+        async def probe():
+            nonlocal worst
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(PROBE_INTERVAL)
+                worst = max(worst, time.perf_counter() - start - PROBE_INTERVAL)
+
+        probe_task = asyncio.create_task(probe())
+        await asyncio.sleep(0.005)
+        start = time.perf_counter()
+        await encode_udemy_csv(questions)
+        durations.append(time.perf_counter() - start)
+        done.set()
+        await probe_task
+        stalls.append(worst)
+
+    return {
+        "export_p50_ms": round(percentile(durations, 50) * 1000, 2),
+        "stall_p50_ms": round(percentile(stalls, 50) * 1000, 2),
+        "stall_max_ms": round(max(stalls) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure event-loop stalls of CSV exports per offload mode")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    from config import OFFLOAD_MIN_QUESTIONS
+    from generator import export
+    from generator.models import Question
+    from utils.offload import CpuPool
+
+    rows: List[Dict[str, Any]] = []
+    for mode in ("off", "thread", "process"):
+        pool = CpuPool(mode=mode, max_workers=args.workers)
+        export.cpu_pool = pool
+        # Start the workers before timing
+        asyncio.run(export.encode_udemy_csv([Question.from_dict(q) for q in make_questions(OFFLOAD_MIN_QUESTIONS)]))
+        for size in (int(s) for s in args.sizes.split(",") if s):
+            questions = [Question.from_dict(q) for q in make_questions(size)]
+            result = asyncio.run(export_with_probe(questions, args.runs))
+            rows.append({"mode": "inline" if mode == "off" else mode, "questions": size,
+                         "offloaded": "yes" if mode != "off" and size >= OFFLOAD_MIN_QUESTIONS else "no", **result})
+        pool.shutdown()
+
+    print_table(rows, ["mode", "questions", "offloaded", "export_p50_ms", "stall_p50_ms", "stall_max_ms"])
+    path = save_results("bench_offload", {"settings": vars(args), "results": rows}, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
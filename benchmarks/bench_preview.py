@@ -0,0 +1,115 @@
+# benchmarks/bench_preview.py - Preview latency and prompt cache reuse by the following full run
+"""
+Calls POST /api/generator/preview's handler for a series of distinct
+requests against the fake provider (which emulates provider prompt caching),
+then the full generation of the last one:
+
+    cold      previews generated on PREVIEW_ROUTE
+    cached    the same requests again, answered from the preview cache
+    full run  share of the full run's prompt tokens served from the prompt
+              cache, with and without a preview of the same request first
+
+The fake provider speaks the OpenAI API by default (automatic prefix caching,
+like DeepSeek); --api anthropic uses the messages API with cache_control.
+
+Usage:
+    python -m benchmarks.bench_preview
+    python -m benchmarks.bench_preview --previews 20 --api anthropic --fake-tokens-per-sec 150
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import FakeProviderProcess, print_table, save_results, summarize
+from benchmarks.fixtures import make_request_payload
+
+
+def _prompt_tokens() -> Dict[str, float]:
+    from utils import metrics
+
+    totals = {"prompt": 0.0, "cached": 0.0}
+    for labels, value in metrics.AI_TOKENS_TOTAL.values().items():
+        if labels[-1] in totals:
+            totals[labels[-1]] += value
+    return totals
+
+
+async def run_scenarios(previews: int, questions: int, style: str) -> List[Dict[str, Any]]:
+    from generator import routes
+
+    user = {"id": "bench", "tier": "business"}
+
+    def request(i: int, kind: str):
+        payload = make_request_payload(questions, ["single-choice", "true-false"])
+        payload["practice_test_title"] = f"Practice Test {i} ({kind})"
+        payload["explanation_style"] = style
+        return routes.GenerateTestRequest(**payload)
+
+    rows = []
+    for phase in ("cold", "cached"):
+        timings = []
+        for i in range(previews):
+            start = time.perf_counter()
+            body = await routes.preview_test(request(i, "preview"), user)
+            timings.append(time.perf_counter() - start)
+            assert body["cached"] == (phase == "cached")
+        stats = summarize(timings)
+        rows.append({"scenario": f"preview {phase}", "p50_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"],
+                     "within_timeout": f"{sum(t <= routes.PREVIEW_TIMEOUT_SECONDS for t in timings) / previews:.0%}",
+                     "cached_prompt_share": ""})
+
+    for preview_first in (False, True):
+        full_request = request(previews, "with preview" if preview_first else "without preview")
+        if preview_first:
+            await routes.preview_test(full_request, user)
+        before = _prompt_tokens()
+        start = time.perf_counter()
+        generated = await routes.generate_questions_with_ai(full_request)
+        elapsed = time.perf_counter() - start
+        assert len(generated) == questions, len(generated)
+        after = _prompt_tokens()
+        # OpenAI-style usage counts cached tokens inside prompt tokens, Anthropic-style next to them
+        cached = after["cached"] - before["cached"]
+        prompt = after["prompt"] - before["prompt"]
+        total = prompt if os.environ.get("FAKE_PROVIDER_API") != "anthropic" else prompt + cached
+        rows.append({"scenario": f"full run {'after' if preview_first else 'without'} preview",
+                     "p50_ms": round(elapsed * 1000, 1), "p95_ms": "", "within_timeout": "",
+                     "cached_prompt_share": f"{cached / total:.0%}" if total else ""})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure preview latency and prompt cache reuse")
+    parser.add_argument("--previews", type=int, default=10, help="Distinct requests to preview")
+    parser.add_argument("--questions", type=int, default=30, help="Questions in the full run")
+    parser.add_argument("--style", default="technical", help="Explanation style of the requests")
+    parser.add_argument("--api", choices=["openai", "anthropic"], default="openai")
+    parser.add_argument("--fake-port", type=int, default=8001)
+    parser.add_argument("--fake-latency-ms", type=float, default=500)
+    parser.add_argument("--fake-tokens-per-sec", type=float, default=200)
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    # Settings are read at import time: point the generator at the fake provider before importing it
+    os.environ.update(AI_PROVIDER="fake", FAKE_PROVIDER_URL=f"http://127.0.0.1:{args.fake_port}",
+                      FAKE_PROVIDER_API=args.api, CHECKPOINT_BACKEND="off", HISTORY_BACKEND="off",
+                      TRACE_EXPORT="off")
+    import logging
+    import utils.logging_config  # noqa: F401 - configures the logger before we silence it
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    with FakeProviderProcess(port=args.fake_port, latency_ms=args.fake_latency_ms, jitter_ms=0,
+                             tokens_per_sec=args.fake_tokens_per_sec):
+        rows = asyncio.run(run_scenarios(args.previews, args.questions, args.style))
+
+    print()
+    print_table(rows, ["scenario", "p50_ms", "p95_ms", "within_timeout", "cached_prompt_share"])
+    path = save_results("bench_preview", {"settings": vars(args), "results": rows}, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
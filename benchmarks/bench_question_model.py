@@ -0,0 +1,97 @@
+# benchmarks/bench_question_model.py - Memory held per question: nested dicts vs. slotted Question objects
+"""
+Parses AI responses the way the generator does (one JSON array per batch of
+GENERATION_BATCH_SIZE questions) and measures, with tracemalloc, the bytes
+still held per question when the results are kept as:
+
+    dicts     the parsed JSON (a dict per question and per answer)
+    slotted   generator.models.Question objects from validate_questions
+
+Text (question, answers, explanations) is the same in both, so the
+difference is the per-question structure: run with short explanations to see
+it without the text dominating.
+
+Usage:
+    python -m benchmarks.bench_question_model
+    python -m benchmarks.bench_question_model --sizes 1000,10000
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.common import print_table, save_results
+from benchmarks.fixtures import make_questions
+
+DEFAULT_SIZES = [250, 1000, 10000]
+
+
+def batch_responses(size: int, long_explanations: bool) -> List[str]:
+    from config import GENERATION_BATCH_SIZE
+
+    questions = make_questions(size, long_explanations=long_explanations)
+    return [json.dumps(questions[i:i + GENERATION_BATCH_SIZE], ensure_ascii=False)
+            for i in range(0, size, GENERATION_BATCH_SIZE)]
+
+
+def as_dicts(responses: List[str]) -> list:
+    return [question for response in responses for question in json.loads(response)]
+
+
+def as_slotted(responses: List[str]) -> list:
+    from generator.validation import validate_questions
+
+    return [question for response in responses for question in validate_questions(json.loads(response)).questions]
+
+
+def retained_bytes(build: Callable[[List[str]], list], responses: List[str]) -> Tuple[int, int]:
+    """Bytes still allocated after build() returns (while its result is alive), and the question count"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(responses)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory per question for dicts and slotted Question objects")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    # Import (and warm up) everything first so module objects are not counted
+    as_slotted(batch_responses(25, False))
+
+    representations: Dict[str, Callable[[List[str]], Any]] = {"dicts": as_dicts, "slotted": as_slotted}
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        for text, long_explanations in (("long", True), ("short", False)):
+            responses = batch_responses(size, long_explanations)
+            baseline = None
+            for name, build in representations.items():
+                held, count = retained_bytes(build, responses)
+                per_question = held / count
+                baseline = baseline or per_question
+                rows.append({
+                    "questions": size,
+                    "explanations": text,
+                    "representation": name,
+                    "kept": count,
+                    "bytes_per_question": round(per_question),
+                    "total_mb": round(held / 1024 / 1024, 2),
+                    "vs_dicts": f"{(per_question - baseline) / baseline:+.1%}",
+                })
+
+    print_table(rows, ["questions", "explanations", "representation", "kept", "bytes_per_question",
+                       "total_mb", "vs_dicts"])
+    path = save_results("bench_question_model", {"sizes": args.sizes, "results": rows}, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
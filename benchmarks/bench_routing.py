@@ -0,0 +1,144 @@
+# benchmarks/bench_routing.py - Latency and cost of per-question-type model routing
+"""
+Runs the same generations against the fake provider with MODEL_ROUTING off
+(every question on AI_MODEL) and on (MODEL_ROUTES in config.py), and compares
+wall time, tokens and estimated cost per generation.
+
+The fake provider answers models named "*fast*" (fake-fast, the AI_FAST_MODEL
+for AI_PROVIDER=fake) --fast-model-speedup times faster, and AI_MODEL_PRICING
+prices fake-chat/fake-fast like the Claude Sonnet/Haiku models.
+
+Each mode runs in a fresh interpreter because the routing settings are read
+from the environment at import time.
+
+Usage:
+    python -m benchmarks.bench_routing
+    python -m benchmarks.bench_routing --runs 5 --fake-latency-ms 800 --fake-tokens-per-sec 150
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import PROJECT_ROOT, FakeProviderProcess, print_table, save_results, summarize
+
+# (name, question_formats, difficulty_level, num_questions)
+SCENARIOS = [
+    ("true_false_beginner", ["true-false"], "beginner", 50),
+    ("mixed_beginner", ["mix-all"], "beginner", 60),
+    ("mixed_intermediate", ["mix-all"], "intermediate", 60),
+    ("scenario_advanced", ["single-choice", "scenario-based"], "advanced", 50),
+]
+
+
+def scenario_request(formats: List[str], difficulty: str, num_questions: int):
+    from generator.routes import GenerateTestRequest
+
+    return GenerateTestRequest(
+        working_title="AWS Certified Solutions Architect Associate",
+        practice_test_title="Practice Test 1",
+        category="IT & Software",
+        learning_objectives=["Design resilient architectures", "Choose compute and storage",
+                             "Secure workloads with IAM", "Optimize costs"],
+        requirements="Basic cloud knowledge",
+        target_audience="Engineers preparing for SAA-C03",
+        difficulty_level=difficulty,
+        num_questions=num_questions,
+        question_formats=formats,
+        explanation_style="technical",
+    )
+
+
+def _usage_snapshot() -> Dict[str, float]:
+    from utils import metrics
+
+    snapshot = {"cost_usd": sum(metrics.AI_COST_USD_TOTAL.values().values())}
+    for (_, model, kind), value in metrics.AI_TOKENS_TOTAL.values().items():
+        if kind != "cached":
+            snapshot[f"{model}:{kind}"] = snapshot.get(f"{model}:{kind}", 0) + value
+    return snapshot
+
+
+async def _run_worker(runs: int) -> Dict[str, Any]:
+    """Executed in the child interpreter: run every scenario and report timings and usage"""
+    from generator.routes import generate_questions_with_ai
+
+    results = {}
+    for name, formats, difficulty, num_questions in SCENARIOS:
+        request = scenario_request(formats, difficulty, num_questions)
+        before = _usage_snapshot()
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            questions = await generate_questions_with_ai(request)
+            timings.append(time.perf_counter() - start)
+            assert len(questions) == num_questions, (name, len(questions))
+        after = _usage_snapshot()
+        usage = {key: round((after.get(key, 0) - before.get(key, 0)) / runs, 6) for key in after}
+        results[name] = {"latency": summarize(timings), "usage_per_run": usage}
+    return results
+
+
+def run_mode(routing: str, fake_url: str, runs: int) -> Dict[str, Any]:
+    env = {**os.environ, "AI_PROVIDER": "fake", "FAKE_PROVIDER_URL": fake_url, "MODEL_ROUTING": routing,
+           "CHECKPOINT_BACKEND": "off", "TRACE_EXPORT": "off"}
+    proc = subprocess.run([sys.executable, "-m", "benchmarks.bench_routing", "--worker", "--runs", str(runs)],
+                          cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Routing benchmark worker failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare generation latency and cost with and without model routing")
+    parser.add_argument("--runs", type=int, default=3, help="Generations per scenario and mode")
+    parser.add_argument("--fake-port", type=int, default=8001)
+    parser.add_argument("--fake-latency-ms", type=float, default=500)
+    parser.add_argument("--fake-tokens-per-sec", type=float, default=2000)
+    parser.add_argument("--fast-model-speedup", type=float, default=3.0)
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        import logging
+        import utils.logging_config  # noqa: F401 - configures the logger before we silence it
+        logging.getLogger().setLevel(logging.CRITICAL)
+        print(json.dumps(asyncio.run(_run_worker(args.runs))))
+        return
+
+    with FakeProviderProcess(port=args.fake_port, latency_ms=args.fake_latency_ms, jitter_ms=0,
+                             tokens_per_sec=args.fake_tokens_per_sec,
+                             fast_model_speedup=args.fast_model_speedup) as fake:
+        modes = {mode: run_mode(mode, fake.url, args.runs) for mode in ("off", "on")}
+
+    rows = []
+    for name, *_ in SCENARIOS:
+        off, on = modes["off"][name], modes["on"][name]
+        off_ms, on_ms = off["latency"]["p50_ms"], on["latency"]["p50_ms"]
+        off_cost, on_cost = off["usage_per_run"]["cost_usd"], on["usage_per_run"]["cost_usd"]
+        rows.append({
+            "scenario": name,
+            "p50_ms_off": off_ms,
+            "p50_ms_on": on_ms,
+            "latency_change": f"{(on_ms - off_ms) / off_ms:+.1%}" if off_ms else "",
+            "cost_off_usd": round(off_cost, 4),
+            "cost_on_usd": round(on_cost, 4),
+            "cost_change": f"{(on_cost - off_cost) / off_cost:+.1%}" if off_cost else "",
+        })
+
+    print()
+    print_table(rows, ["scenario", "p50_ms_off", "p50_ms_on", "latency_change",
+                       "cost_off_usd", "cost_on_usd", "cost_change"])
+
+    path = save_results("bench_routing", {"settings": vars(args), "modes": modes, "comparison": rows}, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmarks/bench_two_phase.py - Wall time and cost of two-phase generation (stems, then explanations)
+"""
+Generates the same test against the fake provider with TWO_PHASE_GENERATION
+off (questions and explanations in one call per batch) and on (stems first,
+explanations in parallel calls of EXPLANATION_BATCH_SIZE questions), for
+increasingly long explanations - the fake provider's explanation_words
+stands in for the explanation style, from short-concise (~12 words per
+explanation) to very-detailed (~80).
+
+Reports the p50 wall time per generation, the AI calls it took and the
+estimated cost (AI_MODEL_PRICING): two-phase sends every stem to the model
+a second time as input, so it costs more input tokens for the same output.
+
+Usage:
+    python -m benchmarks.bench_two_phase
+    python -m benchmarks.bench_two_phase --questions 100 --runs 3 --fake-tokens-per-sec 150
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import FakeProviderProcess, print_table, save_results, summarize
+from benchmarks.fixtures import make_request_payload
+
+DEFAULT_EXPLANATION_WORDS = [12, 25, 50, 80]
+
+
+_calls = 0
+
+
+def _usage_snapshot() -> Dict[str, float]:
+    from utils import metrics
+
+    return {"cost_usd": sum(metrics.AI_COST_USD_TOTAL.values().values()), "calls": _calls}
+
+
+def count_ai_calls(routes):
+    """Wrap routes.call_ai to count the AI calls a generation makes"""
+    call_ai = routes.call_ai
+
+    async def counted(*args, **kwargs):
+        global _calls
+        _calls += 1
+        return await call_ai(*args, **kwargs)
+
+    routes.call_ai = counted
+
+
+async def run_scenarios(fake: FakeProviderProcess, word_counts: List[int], questions: int,
+                        runs: int) -> List[Dict[str, Any]]:
+    from generator import routes
+
+    count_ai_calls(routes)
+    request = routes.GenerateTestRequest(**make_request_payload(questions, ["single-choice", "multiple-select"]))
+    rows = []
+    for words in word_counts:
+        fake.configure(explanation_words=words)
+        results = {}
+        for mode in ("off", "on"):
+            routes.TWO_PHASE_GENERATION = mode
+            before = _usage_snapshot()
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                generated = await routes.generate_questions_with_ai(request)
+                timings.append(time.perf_counter() - start)
+                assert len(generated) == questions, len(generated)
+            after = _usage_snapshot()
+            results[mode] = {
+                "p50_ms": summarize(timings)["p50_ms"],
+                **{key: (after[key] - before[key]) / runs for key in after},
+            }
+
+        off, on = results["off"], results["on"]
+        rows.append({
+            "explanation_words": words,
+            "p50_ms_off": off["p50_ms"],
+            "p50_ms_on": on["p50_ms"],
+            "latency_change": f"{(on['p50_ms'] - off['p50_ms']) / off['p50_ms']:+.1%}",
+            "calls_off": round(off["calls"]),
+            "calls_on": round(on["calls"]),
+            "cost_change": f"{(on['cost_usd'] - off['cost_usd']) / off['cost_usd']:+.1%}" if off["cost_usd"] else "",
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare one-call and two-phase generation by explanation length")
+    parser.add_argument("--words", default=",".join(str(w) for w in DEFAULT_EXPLANATION_WORDS),
+                        help="Fake provider words per explanation to test")
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=2, help="Generations per length and mode")
+    parser.add_argument("--fake-port", type=int, default=8001)
+    parser.add_argument("--fake-latency-ms", type=float, default=500)
+    parser.add_argument("--fake-tokens-per-sec", type=float, default=400)
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    # Settings are read at import time: point the generator at the fake provider before importing it
+    os.environ.update(AI_PROVIDER="fake", FAKE_PROVIDER_URL=f"http://127.0.0.1:{args.fake_port}",
+                      MODEL_ROUTING="off", CHECKPOINT_BACKEND="off", TRACE_EXPORT="off")
+    import logging
+    import utils.logging_config  # noqa: F401 - configures the logger before we silence it
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    word_counts = [int(w) for w in args.words.split(",") if w]
+    with FakeProviderProcess(port=args.fake_port, latency_ms=args.fake_latency_ms, jitter_ms=0,
+                             tokens_per_sec=args.fake_tokens_per_sec) as fake:
+        rows = asyncio.run(run_scenarios(fake, word_counts, args.questions, args.runs))
+
+    print()
+    print_table(rows, ["explanation_words", "p50_ms_off", "p50_ms_on", "latency_change",
+                       "calls_off", "calls_on", "cost_change"])
+    path = save_results("bench_two_phase", {"settings": vars(args), "results": rows}, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# benchmarks/common.py - Shared helpers for benchmark scripts
+
+import gc
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Benchmark results are written here unless --output is given
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile (0 for an empty sample)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    ms = [s * 1000 for s in samples]
+    return {
+        "count": len(ms),
+        "min_ms": round(min(ms), 3) if ms else 0.0,
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def current_rss_mb() -> float:
+    """Current resident set size of this process in MB (falls back to peak RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_info() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_revision": git_revision(),
+    }
+
+
+def save_results(name: str, results: Dict[str, Any], output: Optional[str] = None) -> Path:
+    """Write a benchmark run to JSON so runs can be compared over time"""
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = Path(output) if output else RESULTS_DIR / f"{name}-{timestamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "benchmark": name,
+        "timestamp": timestamp,
+        "environment": environment_info(),
+        "results": results,
+    }
+    path.write_text(json.dumps(payload, indent=2))
+    return path
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    return json.loads(Path(path).read_text())
+
+
+def print_table(rows: List[Dict[str, Any]], columns: Sequence[str]):
+    """Print rows as a fixed-width table"""
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
+
+
+def measure(func: Callable[[], Any], min_time: float = 0.2, max_rounds: int = 1000) -> Dict[str, Any]:
+    """Time a callable over several rounds and measure its allocations in a separate run"""
+    # Warm-up and calibration
+    start = time.perf_counter()
+    func()
+    single = time.perf_counter() - start
+    rounds = max(3, min(max_rounds, int(min_time / single) if single > 0 else max_rounds))
+
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    timings: List[float] = []
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # Allocation is measured separately because tracemalloc slows execution down
+    tracemalloc.start()
+    func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "rounds": rounds,
+        "min_ms": round(timings[0] * 1000, 4),
+        "median_ms": round(timings[len(timings) // 2] * 1000, 4),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 4),
+        "max_ms": round(timings[-1] * 1000, 4),
+        "peak_alloc_kb": round(peak / 1024, 1),
+        "retained_kb": round(current / 1024, 1),
+    }
+
+
+class Stopwatch:
+    """Context manager measuring elapsed wall time in seconds"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+class FakeProviderProcess:
+    """
+    Run fake_provider.server in a subprocess for the duration of a benchmark
+
+    Usage:
+        with FakeProviderProcess(port=8001, latency_ms=300, tokens_per_sec=5000) as fake:
+            os.environ["FAKE_PROVIDER_URL"] = fake.url
+    """
+
+    def __init__(self, port: int = 8001, **settings):
+        self.port = port
+        self.settings = settings
+        self.url = f"http://127.0.0.1:{port}"
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self):
+        args = [sys.executable, "-m", "fake_provider.server", "--port", str(self.port)]
+        for key, value in self.settings.items():
+            if value is None or value is False:
+                continue
+            flag = "--" + key.replace("_", "-")
+            args.extend([flag] if value is True else [flag, str(value)])
+        self.process = subprocess.Popen(args, cwd=PROJECT_ROOT)
+        self._wait_until_ready()
+        return self
+
+    def _wait_until_ready(self, timeout: float = 15.0):
+        import urllib.request
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                urllib.request.urlopen(f"{self.url}/_fake/config", timeout=1).read()
+                return
+            except OSError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError(f"Fake provider did not start on port {self.port}")
+
+    def configure(self, **settings):
+        """Change fake provider behaviour between scenarios"""
+        import urllib.request
+        request = urllib.request.Request(
+            f"{self.url}/_fake/config",
+            data=json.dumps(settings).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        return json.loads(urllib.request.urlopen(request, timeout=5).read())
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
@@ -0,0 +1,98 @@
+# benchmarks/fixtures.py - Realistic synthetic question data for benchmarks
+
+import json
+import random
+from typing import Any, Dict, List
+
+# Text fragments mixing ASCII, accented Latin, CJK, Arabic, emoji and CSV-hostile characters
+_FRAGMENTS = [
+    "the load balancer distributes incoming traffic across healthy targets",
+    "a résumé of naïve caching strategies shows why café-style lookups fail",
+    "数据一致性 requires careful handling of concurrent writes",
+    "التحقق من الهوية is enforced before any request reaches the API",
+    "this reduces latency for users worldwide 🚀 while keeping costs predictable",
+    'the "eventual consistency" model, with its trade-offs, applies here',
+    "multi-AZ deployments survive the loss of a single data centre\nwithout manual failover",
+    "IAM policies follow least privilege, e.g. s3:GetObject on a single prefix",
+    "Ünïcödé normalisation matters when comparing user-supplied identifiers",
+    "queues decouple producers from consumers; retries must be idempotent",
+]
+
+
+def _text(rng: random.Random, min_words: int, max_words: int) -> str:
+    words: List[str] = []
+    target = rng.randint(min_words, max_words)
+    while len(words) < target:
+        words.extend(rng.choice(_FRAGMENTS).split(" "))
+    sentence = " ".join(words[:target])
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def make_question(rng: random.Random, index: int, long_explanations: bool = True) -> Dict[str, Any]:
+    """Build one question in the AI response schema (multiple-choice, multi-select or true/false)"""
+    kind = index % 3
+    explanation_words = (60, 140) if long_explanations else (10, 25)
+
+    if kind == 0:
+        correct = rng.randrange(4)
+        answers = [
+            {"text": _text(rng, 4, 12), "explanation": _text(rng, *explanation_words), "is_correct": i == correct}
+            for i in range(4)
+        ]
+        question_type = "multiple-choice"
+    elif kind == 1:
+        # Six-option multi-select with 2-3 correct answers
+        correct = set(rng.sample(range(6), rng.randint(2, 3)))
+        answers = [
+            {"text": _text(rng, 4, 12), "explanation": _text(rng, *explanation_words), "is_correct": i in correct}
+            for i in range(6)
+        ]
+        question_type = "multi-select"
+    else:
+        correct = rng.randrange(2)
+        answers = [
+            {"text": label, "explanation": _text(rng, *explanation_words), "is_correct": i == correct}
+            for i, label in enumerate(("TRUE", "FALSE"))
+        ]
+        question_type = "multiple-choice"
+
+    return {
+        "question": f"Q{index + 1}: {_text(rng, 20, 60)}",
+        "question_type": question_type,
+        "answers": answers,
+        "overall_explanation": _text(rng, explanation_words[0] * 2, explanation_words[1] * 2),
+        "domain": rng.choice(["IT & Software", "Développement", "データ分析", "Cloud ☁️"]),
+    }
+
+
+def make_questions(count: int, seed: int = 42, long_explanations: bool = True) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [make_question(rng, i, long_explanations) for i in range(count)]
+
+
+def make_response_text(questions: List[Dict[str, Any]], fenced: bool = True) -> str:
+    """Serialize questions the way the AI returns them (pretty JSON, optionally in a code fence)"""
+    body = json.dumps(questions, indent=2, ensure_ascii=False)
+    return f"```json\n{body}\n```" if fenced else body
+
+
+def make_request_payload(num_questions: int, formats=None) -> Dict[str, Any]:
+    return {
+        "working_title": "Kubernetes für Entwickler – Certified Application Developer (CKAD)",
+        "practice_test_title": "Practice Test 3 – Pods, Deployments & Services",
+        "category": "IT & Software",
+        "learning_objectives": [
+            "Design and build multi-container pods with init and sidecar containers",
+            "Configure deployments for rolling updates, rollbacks and scaling",
+            "Expose applications with Services, Ingress and NetworkPolicies",
+            "Manage configuration with ConfigMaps, Secrets and environment variables",
+            "Observe and debug workloads with probes, logs and kubectl tooling",
+            "Apply resource requests, limits and quotas to namespaces",
+        ],
+        "requirements": "Basic Linux command line and container knowledge (Docker or Podman)",
+        "target_audience": "Developers preparing for the CKAD exam who deploy services to Kubernetes",
+        "difficulty_level": "mixed",
+        "num_questions": num_questions,
+        "question_formats": formats or ["single-choice", "multiple-select", "true-false", "scenario-based"],
+        "explanation_style": "very-detailed",
+    }
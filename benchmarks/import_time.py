@@ -0,0 +1,159 @@
+# benchmarks/import_time.py - Serverless cold-start and import-time profile
+"""
+Measures what a Vercel cold start pays before the first response:
+
+    1. `python -X importtime -c "import api.index"` breakdown, aggregated per
+       top-level package, with the slowest modules by cumulative time
+    2. Wall time to import api.index and serve a first GET / in a fresh
+       interpreter (median over --runs)
+
+It also checks that the heavy SDKs (openai, anthropic, stripe, supabase, jose)
+are not imported at startup, and exits non-zero if that check or the
+--max-cold-start-ms budget fails.
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 10 --max-cold-start-ms 800 --top 25
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from benchmarks.common import PROJECT_ROOT, print_table, save_results
+
+# SDKs that must only be imported when they are first used
+LAZY_MODULES = ("openai", "anthropic", "stripe", "supabase", "jose")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Runs in a fresh interpreter: import the serverless entry point, then serve GET /
+COLD_START_SCRIPT = r"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+import api.index
+imported = time.perf_counter()
+
+async def first_request():
+    messages = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        messages.append(message)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "https", "path": "/", "raw_path": b"/", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"practicetestbulk.com")], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 443),
+    }
+    await api.index.fastapi_app(scope, receive, send)
+    return messages[0]["status"]
+
+status = asyncio.run(first_request())
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_request_ms": (served - imported) * 1000,
+    "total_ms": (served - start) * 1000,
+    "status": status,
+    "lazy_modules_loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def profile_imports() -> Dict[str, Any]:
+    """Run -X importtime and aggregate self time per top-level package"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api.index"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    modules: List[Dict[str, Any]] = []
+    per_package: Dict[str, int] = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append({"module": name, "self_us": int(self_us), "cumulative_us": int(cumulative_us),
+                        "depth": len(indent) // 2})
+        per_package[name.split(".")[0]] += int(self_us)
+
+    total_us = sum(per_package.values())
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "packages": sorted(
+            ({"package": p, "self_ms": round(us / 1000, 1), "share": round(us / total_us, 3) if total_us else 0}
+             for p, us in per_package.items()),
+            key=lambda row: row["self_ms"], reverse=True
+        ),
+        "modules": sorted(modules, key=lambda m: m["cumulative_us"], reverse=True),
+    }
+
+
+def measure_cold_starts(runs: int) -> Dict[str, Any]:
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Cold start run failed:\n{proc.stderr}")
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    return {
+        "runs": runs,
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "first_request_ms": round(statistics.median(s["first_request_ms"] for s in samples), 1),
+        "total_ms": round(statistics.median(s["total_ms"] for s in samples), 1),
+        "status": samples[-1]["status"],
+        "lazy_modules_loaded": sorted({m for s in samples for m in s["lazy_modules_loaded"]}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import profile for the serverless entry point")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh-interpreter cold starts to time")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to print")
+    parser.add_argument("--max-cold-start-ms", type=float, default=1500,
+                        help="Fail if median import + first request exceeds this")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    profile = profile_imports()
+    cold_start = measure_cold_starts(args.runs)
+
+    print(f"Import profile (-X importtime, total self time {profile['total_ms']}ms)\n")
+    print_table(profile["packages"][:args.top], ["package", "self_ms", "share"])
+    print()
+    top_modules = [
+        {"module": m["module"], "cumulative_ms": round(m["cumulative_us"] / 1000, 1), "self_ms": round(m["self_us"] / 1000, 1)}
+        for m in profile["modules"][:args.top]
+    ]
+    print_table(top_modules, ["module", "cumulative_ms", "self_ms"])
+
+    print(f"\nCold start (median of {cold_start['runs']}): import {cold_start['import_ms']}ms + "
+          f"first GET / {cold_start['first_request_ms']}ms = {cold_start['total_ms']}ms (status {cold_start['status']})")
+
+    failures = []
+    if cold_start["lazy_modules_loaded"]:
+        failures.append(f"SDKs imported at startup: {', '.join(cold_start['lazy_modules_loaded'])}")
+    if cold_start["total_ms"] > args.max_cold_start_ms:
+        failures.append(f"Cold start {cold_start['total_ms']}ms exceeds budget of {args.max_cold_start_ms}ms")
+
+    profile["modules"] = profile["modules"][:100]
+    path = save_results("import_time", {"settings": vars(args), "cold_start": cold_start,
+                                        "import_profile": profile, "failures": failures}, args.output)
+    print(f"Results saved to {path}")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# benchmarks/load_test.py - End-to-end load and soak benchmark for the FastAPI app
+"""
+Asyncio load generator that drives main.app in-process (via httpx's ASGI
+transport) with the AI provider replaced by the local fake provider, so no
+real DeepSeek/Claude credits are used.
+
+Usage:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --scenarios pages,usage --requests 1000 --concurrency 50
+    python -m benchmarks.load_test --scenarios generate_100 --generations 20 --generation-concurrency 20
+    python -m benchmarks.load_test --soak 600
+    python -m benchmarks.load_test --baseline benchmarks/results/load_test-20261019T120000Z.json
+
+Authentication is bypassed with a dependency override (JWT decode and the
+Supabase user lookup are not exercised); everything from the route handler
+down to the CSV export runs as in production.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.common import (
+    FakeProviderProcess, current_rss_mb, load_results, peak_rss_mb,
+    print_table, save_results, summarize
+)
+
+PAGE_PATHS = ["/", "/pro", "/login", "/register", "/verify-email", "/app"]
+
+GENERATION_SIZES = {"generate_20": 20, "generate_100": 100, "generate_250": 250}
+
+ALL_SCENARIOS = ["pages", "usage"] + list(GENERATION_SIZES)
+
+BENCH_USER = {
+    "id": "00000000-0000-0000-0000-000000000bench",
+    "email": "bench@practicetestbulk.com",
+    "username": "bench",
+    "tier": "business",
+    "email_verified": True,
+    "monthly_chars_used": 0,
+}
+
+
+def generation_payload(num_questions: int, variant: int = 0) -> Dict[str, Any]:
+    """A generate request; distinct variants are not coalesced with each other by the app"""
+    return {
+        "working_title": "AWS Certified Solutions Architect Associate",
+        "practice_test_title": f"Practice Test {variant + 1} - Compute and Networking",
+        "category": "IT & Software",
+        "learning_objectives": [
+            "Design resilient architectures on AWS",
+            "Choose high-performing compute and storage",
+            "Secure workloads with IAM and VPC controls",
+            "Optimize costs for common workloads",
+        ],
+        "requirements": "Basic cloud computing knowledge",
+        "target_audience": "Engineers preparing for the SAA-C03 exam",
+        "difficulty_level": "mixed",
+        "num_questions": num_questions,
+        "question_formats": ["mix-all"],
+        "explanation_style": "technical",
+    }
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag as the overshoot of a periodic short sleep"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def take(self) -> List[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+async def run_scenario(name: str, make_request: Callable[[int], Awaitable[int]], total: int,
+                       concurrency: int, lag: LoopLagMonitor) -> Dict[str, Any]:
+    """Issue `total` requests with at most `concurrency` in flight"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = iter(range(total))
+    lag.take()
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                status = await make_request(i)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[str(status)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - started
+
+    lag_samples = lag.take()
+    ok = statuses.get("200", 0)
+    return {
+        "scenario": name,
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "success_rate": round(ok / total, 4) if total else 0.0,
+        "statuses": dict(statuses),
+        "latency": summarize(latencies),
+        "event_loop_lag": summarize(lag_samples),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def run_soak(client, duration: float, concurrency: int, lag: LoopLagMonitor) -> Dict[str, Any]:
+    """Mixed traffic (pages, usage polling, small generations) for a fixed duration"""
+    mix = [("pages", 0.6), ("usage", 0.3), ("generate_20", 0.1)]
+    latencies: Dict[str, List[float]] = {name: [] for name, _ in mix}
+    statuses: Counter = Counter()
+    rss_timeline: List[Dict[str, float]] = []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    lag.take()
+
+    async def worker(seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            kind = rng.choices([m[0] for m in mix], weights=[m[1] for m in mix])[0]
+            start = time.perf_counter()
+            try:
+                if kind == "pages":
+                    status = (await client.get(rng.choice(PAGE_PATHS))).status_code
+                elif kind == "usage":
+                    status = (await client.get("/usage")).status_code
+                else:
+                    payload = generation_payload(20, rng.randrange(10 ** 6))
+                    status = (await client.post("/api/generator/generate", json=payload)).status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies[kind].append(time.perf_counter() - start)
+            statuses[f"{kind}:{status}"] += 1
+
+    async def sample_rss():
+        while time.perf_counter() < deadline:
+            rss_timeline.append({"t_s": round(time.perf_counter() - started, 1), "rss_mb": current_rss_mb()})
+            await asyncio.sleep(max(1.0, duration / 60))
+
+    await asyncio.gather(sample_rss(), *(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    total = sum(len(v) for v in latencies.values())
+
+    return {
+        "scenario": "soak",
+        "duration_s": round(elapsed, 1),
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "statuses": dict(statuses),
+        "latency": {kind: summarize(samples) for kind, samples in latencies.items()},
+        "event_loop_lag": summarize(lag.take()),
+        "rss_timeline": rss_timeline,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def build_client():
+    """Import the app (after the provider env vars are set) and return an in-process client"""
+    import httpx
+    import main
+    from auth.routes import get_current_user
+
+    main.app.dependency_overrides[get_current_user] = lambda: dict(BENCH_USER)
+    transport = httpx.ASGITransport(app=main.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None)
+
+
+async def run(args) -> Dict[str, Any]:
+    client = build_client()
+    lag = LoopLagMonitor()
+    lag.start()
+    results: Dict[str, Any] = {"settings": vars(args), "scenarios": []}
+
+    try:
+        scenarios = [s for s in args.scenarios.split(",") if s] if args.scenarios else ALL_SCENARIOS
+        for name in scenarios:
+            if name == "pages":
+                async def request(i):
+                    return (await client.get(PAGE_PATHS[i % len(PAGE_PATHS)])).status_code
+                result = await run_scenario(name, request, args.requests, args.concurrency, lag)
+            elif name == "usage":
+                async def request(i):
+                    return (await client.get("/usage")).status_code
+                result = await run_scenario(name, request, args.requests, args.concurrency, lag)
+            elif name in GENERATION_SIZES:
+                async def request(i, size=GENERATION_SIZES[name]):
+                    payload = generation_payload(size, variant=i)
+                    return (await client.post("/api/generator/generate", json=payload)).status_code
+                result = await run_scenario(name, request, args.generations, args.generation_concurrency, lag)
+            else:
+                raise SystemExit(f"Unknown scenario: {name} (choose from {', '.join(ALL_SCENARIOS)})")
+
+            results["scenarios"].append(result)
+            print(f"  {name}: p50={result['latency']['p50_ms']}ms p99={result['latency']['p99_ms']}ms "
+                  f"rps={result['throughput_rps']} ok={result['success_rate']:.0%}")
+
+        if args.soak:
+            result = await run_soak(client, args.soak, args.concurrency, lag)
+            results["scenarios"].append(result)
+    finally:
+        await lag.stop()
+        await client.aclose()
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def print_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    base = {}
+    if baseline:
+        base = {s["scenario"]: s for s in baseline["results"]["scenarios"]}
+
+    rows = []
+    for s in results["scenarios"]:
+        latency = s["latency"] if "p50_ms" in s["latency"] else s["latency"].get("pages", {})
+        row = {
+            "scenario": s["scenario"],
+            "requests": s["requests"],
+            "rps": s["throughput_rps"],
+            "p50_ms": latency.get("p50_ms"),
+            "p95_ms": latency.get("p95_ms"),
+            "p99_ms": latency.get("p99_ms"),
+            "loop_lag_p99_ms": s["event_loop_lag"]["p99_ms"],
+            "peak_rss_mb": s["peak_rss_mb"],
+        }
+        previous = base.get(s["scenario"])
+        if previous and "p99_ms" in previous["latency"] and previous["latency"]["p99_ms"]:
+            change = (row["p99_ms"] - previous["latency"]["p99_ms"]) / previous["latency"]["p99_ms"]
+            row["p99_vs_baseline"] = f"{change:+.1%}"
+        rows.append(row)
+
+    columns = ["scenario", "requests", "rps", "p50_ms", "p95_ms", "p99_ms", "loop_lag_p99_ms", "peak_rss_mb"]
+    if baseline:
+        columns.append("p99_vs_baseline")
+    print()
+    print_table(rows, columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and soak benchmark for the PracticeTestBulk app")
+    parser.add_argument("--scenarios", default="", help=f"Comma-separated subset of: {', '.join(ALL_SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per page/usage scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients for page/usage/soak traffic")
+    parser.add_argument("--generations", type=int, default=10, help="Requests per generation scenario")
+    parser.add_argument("--generation-concurrency", type=int, default=10)
+    parser.add_argument("--soak", type=float, default=0, help="Also run a mixed soak test for N seconds")
+    parser.add_argument("--fake-port", type=int, default=8011)
+    parser.add_argument("--fake-latency-ms", type=float, default=300)
+    parser.add_argument("--fake-tokens-per-sec", type=float, default=5000)
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--fake-api", choices=["openai", "anthropic"], default="openai")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Keep application logging enabled")
+    args = parser.parse_args()
+
+    fake = FakeProviderProcess(
+        port=args.fake_port,
+        latency_ms=args.fake_latency_ms,
+        tokens_per_sec=args.fake_tokens_per_sec,
+        error_rate=args.fake_error_rate,
+        rate_limit_rate=args.fake_rate_limit_rate,
+        seed=1,
+    )
+
+    with fake:
+        os.environ["AI_PROVIDER"] = "fake"
+        os.environ["FAKE_PROVIDER_URL"] = fake.url
+        os.environ["FAKE_PROVIDER_API"] = args.fake_api
+        os.environ.setdefault("TRACE_EXPORT", "off")
+        # One synthetic user drives all the load, which the per-tier limiter would throttle
+        os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+        if not args.verbose:
+            import utils.logging_config  # noqa: F401 - configures the logger before we silence it
+            logging.getLogger("testgenius").setLevel(logging.CRITICAL)
+
+        print(f"Running load test against main.app (fake provider on {fake.url})")
+        results = asyncio.run(run(args))
+
+    path = save_results("load_test", results, args.output)
+    print_report(results, load_results(args.baseline) if args.baseline else None)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,8 @@
 # billing/routes.py
 from fastapi import APIRouter, Request, HTTPException, Depends
 from fastapi.responses import RedirectResponse
-import stripe
 import os
-from dotenv import load_dotenv
-from auth.routes import get_current_user, supabase_client
-
-load_dotenv()
+from auth.routes import get_current_user, get_supabase_client
 
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PRICE_ID_PRO = os.getenv("STRIPE_PRICE_ID_PRO")  # $9/month Pro plan
@@ -19,9 +15,6 @@ if not STRIPE_PRICE_ID_PRO and os.getenv("STRIPE_PRICE_ID"):
 
 if not STRIPE_SECRET_KEY:
     print("WARNING: STRIPE_SECRET_KEY not found in environment variables")
-else:
-    stripe.api_key = STRIPE_SECRET_KEY
-    print(f"Stripe API key configured: {STRIPE_SECRET_KEY[:7]}...")
 
 if not STRIPE_PRICE_ID_PRO:
     print("WARNING: STRIPE_PRICE_ID_PRO not found in environment variables")
@@ -32,9 +25,20 @@ if not STRIPE_PRICE_ID_BUSINESS:
 billing_router = APIRouter()
 
 
+def get_stripe():
+    """Import and configure the Stripe SDK on first use (it is slow to import on cold starts)"""
+    import stripe
+    if STRIPE_SECRET_KEY and stripe.api_key != STRIPE_SECRET_KEY:
+        stripe.api_key = STRIPE_SECRET_KEY
+        print(f"Stripe API key configured: {STRIPE_SECRET_KEY[:7]}...")
+    return stripe
+
+
 @billing_router.post("/create-checkout-session")
 async def create_checkout_session(request: Request, user = Depends(get_current_user)):
     """Create Stripe checkout session for Pro or Business subscription, or upgrade existing subscription"""
+    stripe = get_stripe()
+    supabase_client = get_supabase_client()
     try:
         # Get tier from query parameter (default to 'pro')
         tier = request.query_params.get('tier', 'pro').lower()
@@ -171,6 +175,7 @@ async def create_checkout_session(request: Request, user = Depends(get_current_u
 @billing_router.get("/customer-portal")
 async def customer_portal(user = Depends(get_current_user)):
     """Create Stripe customer portal session for managing subscription"""
+    stripe = get_stripe()
     try:
         stripe_customer_id = user.get('stripe_custom')
 
@@ -191,6 +196,8 @@ async def customer_portal(user = Depends(get_current_user)):
 @billing_router.post("/webhook")
 async def stripe_webhook(request: Request):
     """Handle Stripe webhook events"""
+    stripe = get_stripe()
+    supabase_client = get_supabase_client()
     payload = await request.body()
     sig_header = request.headers.get('stripe-signature')
 
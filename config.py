@@ -1,7 +1,13 @@
 # config.py - Application Configuration and Constants
 
+import os
 from typing import Dict, Any
 
+from dotenv import load_dotenv
+
+# Load .env once, before any setting below reads the environment
+load_dotenv()
+
 # ==================== TIER CONFIGURATION ====================
 
 TIER_LIMITS: Dict[str, Dict[str, Any]] = {
@@ -9,6 +15,7 @@ TIER_LIMITS: Dict[str, Dict[str, Any]] = {
         "name": "Free",
         "questions_per_month": 20,
         "max_questions_per_test": 20,
+        "history_days": 7,  # Finished tests kept for re-download
         "price_monthly": 0,
         "price_annual": 0,
         "features": [
@@ -24,6 +31,7 @@ TIER_LIMITS: Dict[str, Dict[str, Any]] = {
         "name": "Pro",
         "questions_per_month": 2500,
         "max_questions_per_test": 250,
+        "history_days": 90,
         "price_monthly": 9,
         "price_annual": 90,  # $7.50/month when billed annually
         "features": [
@@ -38,6 +46,7 @@ TIER_LIMITS: Dict[str, Dict[str, Any]] = {
         "name": "Business",
         "questions_per_month": 7500,
         "max_questions_per_test": 250,
+        "history_days": 365,
         "price_monthly": 19,
         "price_annual": 190,  # $15.83/month when billed annually
         "features": [
@@ -64,6 +73,10 @@ def get_max_questions_per_test(tier: str) -> int:
     """Get max questions per test for a tier"""
     return get_tier_limit(tier, "max_questions_per_test", 20)
 
+def get_history_retention_days(tier: str) -> int:
+    """Get how many days a tier's generated tests stay downloadable"""
+    return get_tier_limit(tier, "history_days", 7)
+
 
 # ==================== STRIPE CONFIGURATION ====================
 
@@ -144,8 +157,9 @@ EXPLANATION_STYLES = {
 
 # ==================== API CONFIGURATION ====================
 
-# AI Provider Selection (options: "claude", "deepseek")
-AI_PROVIDER = "deepseek"
+# AI Provider Selection (options: "claude", "deepseek", "fake")
+# "fake" uses the bundled stand-in server (python -m fake_provider.server) for offline load testing
+AI_PROVIDER = os.getenv("AI_PROVIDER", "deepseek")
 
 # Claude Model Configuration
 CLAUDE_MODEL = "claude-3-5-sonnet-20241022"
@@ -156,14 +170,21 @@ DEEPSEEK_MODEL = "deepseek-chat"
 DEEPSEEK_MAX_TOKENS = 8000
 DEEPSEEK_BASE_URL = "https://api.deepseek.com"
 
+# Fake Provider Configuration (local stand-in, no credits used)
+FAKE_PROVIDER_URL = os.getenv("FAKE_PROVIDER_URL", "http://127.0.0.1:8001")
+FAKE_PROVIDER_API = os.getenv("FAKE_PROVIDER_API", "openai")  # "openai" (chat completions) or "anthropic" (messages)
+FAKE_MODEL = "fake-chat"
+FAKE_MAX_TOKENS = 8000
+
 # Shared AI Configuration
 AI_TEMPERATURE = 0.7
+AI_MAX_RETRIES = 2  # Retries for transient provider errors (429, 5xx, connection)
 
 # Dynamic configuration based on provider
-AI_MODEL = DEEPSEEK_MODEL if AI_PROVIDER == "deepseek" else CLAUDE_MODEL
-AI_MAX_TOKENS = DEEPSEEK_MAX_TOKENS if AI_PROVIDER == "deepseek" else CLAUDE_MAX_TOKENS
+AI_MODEL = {"deepseek": DEEPSEEK_MODEL, "fake": FAKE_MODEL}.get(AI_PROVIDER, CLAUDE_MODEL)
+AI_MAX_TOKENS = {"deepseek": DEEPSEEK_MAX_TOKENS, "fake": FAKE_MAX_TOKENS}.get(AI_PROVIDER, CLAUDE_MAX_TOKENS)
 
-# Rate Limiting
+# Rate Limiting (generation requests per minute, enforced by utils/rate_limit.py)
 RATE_LIMIT_REQUESTS_PER_MINUTE = {
     "free": 5,
     "pro": 20,
@@ -171,6 +192,145 @@ RATE_LIMIT_REQUESTS_PER_MINUTE = {
 }
 
 
+# ==================== GENERATION BATCHING ====================
+
+# Large tests are generated as several smaller AI calls that run concurrently.
+# Each completed batch is checkpointed, so a failed run only regenerates what is missing.
+GENERATION_BATCH_SIZE = 25  # Max questions per AI call
+GENERATION_MIN_BATCH_SIZE = 10  # Smaller tests are still split down to this size to use the parallel slots
+GENERATION_BATCH_CONCURRENCY = 4  # Max AI calls in flight per generation
+QUESTION_REGENERATION_ATTEMPTS = 1  # Extra AI calls per batch for questions that fail validation
+
+
+# ==================== TWO-PHASE GENERATION ====================
+
+# Explanations are most of the output tokens. For long-form explanation styles a batch
+# first generates question stems, options and correct answers only, then the explanations
+# are written in parallel calls of EXPLANATION_BATCH_SIZE questions each.
+# TWO_PHASE_GENERATION: "auto" (styles below), "on" (every style) or "off"
+TWO_PHASE_GENERATION = os.getenv("TWO_PHASE_GENERATION", "auto").lower()
+TWO_PHASE_EXPLANATION_STYLES = ["very-detailed", "academic"]
+EXPLANATION_BATCH_SIZE = 2  # Questions per explanation call
+EXPLANATION_BATCH_CONCURRENCY = 16  # Max explanation calls in flight per generation
+
+
+# ==================== CPU OFFLOAD ====================
+
+# CPU-heavy post-processing (CSV encoding, bulk validation) of large inputs runs in a
+# bounded worker pool (utils/offload.py) instead of on the event loop. Below the
+# threshold the work takes a few milliseconds and is cheaper to do inline than to ship.
+OFFLOAD_MIN_QUESTIONS = 100
+OFFLOAD_CHUNK_SIZE = 50  # Questions per task handed to a worker
+
+
+# ==================== MODEL ROUTING ====================
+
+# Fast, cheaper model per provider for simple questions
+CLAUDE_FAST_MODEL = "claude-3-5-haiku-20241022"
+FAKE_FAST_MODEL = "fake-fast"
+AI_FAST_MODEL = {"deepseek": DEEPSEEK_MODEL, "fake": FAKE_FAST_MODEL}.get(AI_PROVIDER, CLAUDE_FAST_MODEL)
+# Output speed of AI_FAST_MODEL relative to AI_MODEL; DeepSeek has no separate fast model
+AI_FAST_MODEL_SPEED = 3.0 if AI_FAST_MODEL != AI_MODEL else 1.0
+
+# Set MODEL_ROUTING=off to send every question to AI_MODEL
+MODEL_ROUTING_ENABLED = os.getenv("MODEL_ROUTING", "on").lower() != "off"
+
+# Each question type (see get_question_type_distribution) goes to the first route whose
+# question_types and difficulty_levels match; a missing key matches everything.
+# provider, model, temperature and max_tokens default to the AI_* settings above;
+# relative_speed (output speed vs. AI_MODEL, default 1) lets the batch planner give
+# slower routes smaller batches so all routes finish at about the same time.
+# Routes are generated in parallel and their questions merged into one test.
+MODEL_ROUTES = [
+    {"name": "fast", "question_types": ["true_false"], "model": AI_FAST_MODEL, "temperature": 0.5,
+     "relative_speed": AI_FAST_MODEL_SPEED},
+    {"name": "fast", "question_types": ["multiple_choice"], "difficulty_levels": ["beginner"],
+     "model": AI_FAST_MODEL, "temperature": 0.6, "relative_speed": AI_FAST_MODEL_SPEED},
+    {"name": "strong"},  # Scenario-based, multi-select, and intermediate/advanced/mixed questions
+]
+
+# USD per million (input, output) tokens, for the ptb_ai_cost_usd_total metric
+AI_MODEL_PRICING = {
+    CLAUDE_MODEL: (3.00, 15.00),
+    CLAUDE_FAST_MODEL: (0.80, 4.00),
+    DEEPSEEK_MODEL: (0.27, 1.10),
+    FAKE_MODEL: (3.00, 15.00),  # Priced like the Claude models so benchmarks show realistic ratios
+    FAKE_FAST_MODEL: (0.80, 4.00),
+}
+
+
+# ==================== QUESTION REGENERATION ====================
+
+# POST /api/generator/history/{id}/regenerate replaces selected questions of a stored test
+REGENERATE_MAX_QUESTIONS = 25  # Questions per request - one batch (GENERATION_BATCH_SIZE)
+REGENERATE_FEEDBACK_MAX_LENGTH = 1000
+
+
+# ==================== PREVIEW ====================
+
+# POST /api/generator/preview shows a few sample questions before a full run is
+# started. It uses the fast model with a small output budget and gives up after
+# PREVIEW_TIMEOUT_SECONDS; previews are cached per request for PREVIEW_CACHE_TTL_SECONDS.
+PREVIEW_QUESTIONS = 3
+PREVIEW_LONG_FORM_QUESTIONS = 2  # For the long-form TWO_PHASE_EXPLANATION_STYLES
+PREVIEW_MAX_TOKENS = 2000
+PREVIEW_TIMEOUT_SECONDS = float(os.getenv("PREVIEW_TIMEOUT_SECONDS", "3"))
+# Previews are rate limited in their own buckets, so trying a few settings never blocks /generate
+PREVIEW_RATE_LIMIT_REQUESTS_PER_MINUTE = {
+    "free": 20,
+    "pro": 60,
+    "business": 120
+}
+PREVIEW_CACHE_TTL_SECONDS = 3600
+PREVIEW_CACHE_MAX_ENTRIES = 1000
+
+
+# ==================== BACKGROUND JOBS ====================
+
+# POST /api/generator/jobs generates tests in the background (generator/jobs.py).
+# delivery "batch" sends the AI calls through the provider's batch API instead of
+# real-time calls; providers without one (DeepSeek) get realtime delivery.
+JOB_REALTIME_CONCURRENCY = 2  # Realtime jobs generating at a time per worker
+JOB_WORKER_INTERVAL_SECONDS = 5  # How often the worker looks for queued jobs and due provider batches
+BATCH_POLL_MIN_SECONDS = float(os.getenv("BATCH_POLL_MIN_SECONDS", "30"))  # First status check of a provider batch
+BATCH_POLL_MAX_SECONDS = 600  # Poll intervals double up to this
+BATCH_MAX_CALLS = 10000  # AI calls per provider batch (Anthropic allows 100,000)
+BATCH_PRICE_FACTOR = 0.5  # Batch API price relative to real-time calls
+
+
+# ==================== GENERATION ESTIMATES ====================
+
+# POST /api/generator/estimate predicts a request's output tokens, time and cost from
+# a rolling model of recent AI calls (generator/estimator.py). Each call's weight
+# decays by ESTIMATE_DECAY per newer call of its kind; until a provider, model and
+# explanation style have been seen, the priors below are used.
+ESTIMATE_DECAY = 0.05
+ESTIMATE_TOKENS_PER_QUESTION = {  # Output tokens of one complete question
+    "beginner-friendly": 320,
+    "technical": 300,
+    "very-detailed": 650,
+    "short-concise": 180,
+    "fun-casual": 320,
+    "academic": 600,
+}
+ESTIMATE_STEM_TOKEN_SHARE = 0.35  # Share of a question's tokens in its stem and answers (two-phase generation)
+ESTIMATE_PROMPT_TOKENS_PER_CALL = 1500
+ESTIMATE_CALL_OVERHEAD_SECONDS = 1.5  # Time to first token
+ESTIMATE_TOKENS_PER_SECOND = 50  # Output speed of AI_MODEL; routes scale it by relative_speed
+
+
+# ==================== ADMISSION CONTROL ====================
+
+# /generate admits a test only if it is expected to finish within ADMISSION_SLO_SECONDS:
+# the wait for AI call slots (ADMISSION_MAX_AI_CALLS, shared by all generations of this
+# worker) plus its estimate_generation time. Otherwise it answers 503 with Retry-After,
+# or queues a background job for clients that send "Prefer: respond-async".
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL", "on").lower() != "off"
+ADMISSION_MAX_AI_CALLS = int(os.getenv("ADMISSION_MAX_AI_CALLS", "48"))
+ADMISSION_MAX_QUEUE = 50  # Generations waiting for AI call slots
+ADMISSION_SLO_SECONDS = float(os.getenv("ADMISSION_SLO_SECONDS", "240"))  # Below the platform's 300s limit
+
+
 # ==================== VALIDATION CONSTRAINTS ====================
 
 VALIDATION = {
@@ -183,6 +343,24 @@ VALIDATION = {
 }
 
 
+# Generated questions must fit the Udemy practice test bulk upload template
+# (see generator/validation.py for what is repaired and what is regenerated)
+UDEMY_LIMITS = {
+    "min_answers": 2,
+    "max_answers": 6,  # The CSV template has 6 answer columns
+    "question_max_length": 1000,
+    "answer_max_length": 500,
+    "explanation_max_length": 2000,
+    "overall_explanation_max_length": 5000,
+}
+
+
+# Uploaded practice tests (POST /api/generator/import) are streamed row by row
+IMPORT_MAX_ROWS = 10000
+IMPORT_MAX_BYTES = 50 * 1024 * 1024
+AVOID_PROMPT_EXAMPLES = 30  # Existing questions quoted in the prompt so new ones do not repeat them
+
+
 # ==================== APPLICATION METADATA ====================
 
 APP_NAME = "PracticeTestBulk"
@@ -202,6 +380,18 @@ ERROR_MESSAGES = {
     "invalid_tier": "Invalid subscription tier.",
     "payment_failed": "Payment processing failed. Please try again.",
     "generation_failed": "Question generation failed. Please try again.",
+    "generation_incomplete": "Generated {done} of {total} questions before an error. Submit again to resume - only the missing questions will be generated.",
+    "run_not_found": "Generation run not found or expired.",
+    "job_not_found": "Generation job not found.",
+    "overloaded": "We're generating a lot of tests right now. Please try again in {retry_after} seconds.",
+    "invalid_notify_url": "The notification URL must be a public https:// URL.",
+    "preview_timeout": "The preview took too long. Please try again, or generate the full test.",
+    "history_not_found": "This test is no longer in your history.",
+    "invalid_range": "Requested range is not satisfiable.",
+    "history_not_regenerable": "This test was saved without its settings, so its questions cannot be regenerated.",
+    "invalid_question_indices": "Question numbers must be between 0 and {last}.",
+    "invalid_import": "The uploaded file is not a Udemy practice test CSV: {reason}",
+    "import_too_large": "The uploaded file is too large. Practice tests can have at most {rows} questions.",
     "insufficient_objectives": f"Please provide at least {VALIDATION['min_learning_objectives']} learning objectives.",
     "invalid_question_format": "Invalid question format selected."
 }
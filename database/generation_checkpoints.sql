@@ -0,0 +1,27 @@
+-- ============================================================================
+-- GENERATION RUN CHECKPOINTS
+-- ============================================================================
+-- Stores each completed batch of a generation run so a failed run can be
+-- resumed by generating only the missing batches (CHECKPOINT_BACKEND=supabase)
+-- Run this in Supabase SQL Editor
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.generation_runs (
+  run_id TEXT PRIMARY KEY,
+  user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+  request JSONB NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.generation_run_batches (
+  run_id TEXT NOT NULL REFERENCES public.generation_runs(run_id) ON DELETE CASCADE,
+  batch_index INTEGER NOT NULL,
+  questions JSONB NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (run_id, batch_index)
+);
+
+CREATE INDEX IF NOT EXISTS generation_runs_created_at_idx ON public.generation_runs (created_at);
+
+-- Unfinished runs are only resumable for 24 hours; clean up older ones periodically
+-- DELETE FROM public.generation_runs WHERE created_at < now() - interval '1 day';
@@ -0,0 +1,2 @@
+# fake_provider/__init__.py
+# Local stand-in AI provider for load testing
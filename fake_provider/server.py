@@ -0,0 +1,624 @@
+# fake_provider/server.py - Local OpenAI/Anthropic-compatible stand-in for load testing
+"""
+Fake AI provider that speaks both the OpenAI chat-completions API and the
+Anthropic messages API (including streaming), so the generator can be load
+tested without spending real DeepSeek/Claude credits.
+
+Run it with:
+
+    python -m fake_provider.server --port 8001 --latency-ms 400 --tokens-per-sec 150
+
+and start the app with AI_PROVIDER=fake (FAKE_PROVIDER_API=anthropic to use
+the messages API instead of chat completions).
+
+The responses are valid question JSON in the schema requested by the prompt
+(full questions, stems without explanations, or the explanations for given
+stems), so the whole pipeline (parse, validation, CSV export) is exercised.
+
+Message batches (POST /v1/messages/batches, the Anthropic batch protocol) are
+accepted on either API setting and end batch_latency_ms after submission,
+with each request answered - or failed, per error_rate - like a messages call.
+
+With capacity set, at most that many completions stream at full speed; when
+more are in progress they share the output speed, like a saturated provider.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# Rough characters-per-token ratio used for usage accounting and pacing
+CHARS_PER_TOKEN = 4
+
+# Tokens sent per streamed chunk
+TOKENS_PER_CHUNK = 8
+
+
+@dataclass
+class FakeProviderSettings:
+    """Behaviour knobs, settable via environment, CLI flags or POST /_fake/config"""
+    latency_ms: float = 300.0        # Delay before the first token
+    jitter_ms: float = 100.0         # Random extra delay added to latency_ms
+    tokens_per_sec: float = 200.0    # Output speed (0 = instant)
+    error_rate: float = 0.0          # Fraction of requests answered with HTTP 500
+    rate_limit_rate: float = 0.0     # Fraction of requests answered with HTTP 429
+    truncation_rate: float = 0.0     # Fraction of responses cut off mid-JSON
+    enforce_max_tokens: bool = False  # Truncate output at the request's max_tokens
+    explanation_words: int = 25      # Length of each generated explanation
+    fast_model_speedup: float = 3.0  # Models named "*fast*" (e.g. fake-fast) respond this many times faster
+    batch_latency_ms: float = 2000.0  # Time until a message batch has ended
+    capacity: float = 0.0            # Completions streamed at full speed at once; more share it (0 = unlimited)
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "FakeProviderSettings":
+        settings = cls()
+        for f in fields(cls):
+            raw = os.getenv(f"FAKE_{f.name.upper()}")
+            if raw is not None:
+                settings.update({f.name: raw})
+        return settings
+
+    def update(self, values: Dict[str, Any]):
+        for f in fields(self):
+            if f.name not in values:
+                continue
+            value = values[f.name]
+            if f.name == "seed":
+                value = None if value in (None, "") else int(value)
+            elif f.name == "enforce_max_tokens":
+                value = value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+            elif f.name == "explanation_words":
+                value = int(value)
+            else:
+                value = float(value)
+            setattr(self, f.name, value)
+
+
+settings = FakeProviderSettings.from_env()
+_rng = random.Random(settings.seed)
+
+app = FastAPI(title="Fake AI Provider", docs_url=None, redoc_url=None)
+
+
+# ==================== QUESTION SYNTHESIS ====================
+
+_FILLER = (
+    "this option reflects how the concept is applied in practice and why learners "
+    "should consider the trade-offs involved when choosing between similar approaches "
+    "in a real project with realistic constraints and requirements"
+).split()
+
+
+def _sentence(words: int, prefix: str = "") -> str:
+    body = " ".join(_FILLER[i % len(_FILLER)] for i in range(max(words, 1)))
+    return f"{prefix}{body[0].upper()}{body[1:]}."
+
+
+def _parse_prompt(prompt: str) -> Tuple[int, Dict[str, int], str]:
+    """Extract the requested question count, type distribution and domain"""
+    count_match = re.search(r"Generate exactly (\d+)", prompt)
+    total = int(count_match.group(1)) if count_match else 5
+
+    distribution: Dict[str, int] = {}
+    dist_match = re.search(r"QUESTION TYPE DISTRIBUTION:\s*(\{.*?\})", prompt, re.S)
+    if dist_match:
+        try:
+            distribution = {k: int(v) for k, v in json.loads(dist_match.group(1)).items()}
+        except (ValueError, AttributeError):
+            distribution = {}
+    if sum(distribution.values()) != total:
+        distribution = {"multiple_choice": total}
+
+    domain_match = re.search(r"- Category: (.+)", prompt)
+    domain = domain_match.group(1).strip() if domain_match else "General"
+    return total, distribution, domain
+
+
+def _make_question(index: int, qtype: str, domain: str, explanations: bool = True) -> Dict[str, Any]:
+    words = settings.explanation_words
+    if qtype == "true_false":
+        correct = index % 2
+        answers = [
+            {"text": label, "explanation": _sentence(words, f"{label} - "), "is_correct": i == correct}
+            for i, label in enumerate(("TRUE", "FALSE"))
+        ]
+        question_type = "multiple-choice"
+        stem = f"True or false: statement number {index + 1} about {domain} holds in every situation."
+    elif qtype == "multiple_select":
+        correct = {index % 5, (index + 2) % 5}
+        answers = [
+            {"text": f"Option {chr(65 + i)} for question {index + 1}", "explanation": _sentence(words),
+             "is_correct": i in correct}
+            for i in range(5)
+        ]
+        question_type = "multi-select"
+        stem = f"Which of the following statements about {domain} topic {index + 1} are correct? (Select two)"
+    else:
+        correct = index % 4
+        answers = [
+            {"text": f"Option {chr(65 + i)} for question {index + 1}", "explanation": _sentence(words),
+             "is_correct": i == correct}
+            for i in range(4)
+        ]
+        question_type = "multiple-choice"
+        stem = f"Which approach best addresses scenario {index + 1} in {domain}?"
+
+    if not explanations:
+        return {
+            "question": stem,
+            "question_type": question_type,
+            "answers": [{"text": answer["text"], "is_correct": answer["is_correct"]} for answer in answers],
+            "domain": domain,
+        }
+    return {
+        "question": stem,
+        "question_type": question_type,
+        "answers": answers,
+        "overall_explanation": _sentence(words * 2),
+        "domain": domain,
+    }
+
+
+def _make_explanations(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    words = settings.explanation_words
+    return [
+        {
+            "id": question.get("id", i + 1),
+            "answer_explanations": [_sentence(words) for _ in question.get("answers", [])],
+            "overall_explanation": _sentence(words * 2),
+        }
+        for i, question in enumerate(questions)
+    ]
+
+
+# Questions are numbered across requests so every stem is unique (the generator regenerates duplicates)
+_question_numbers = itertools.count()
+
+
+def build_completion_text(prompt: str) -> str:
+    """Build a JSON array of questions (or of explanations for given questions) matching the prompt's schema"""
+    to_explain = re.search(r"QUESTIONS TO EXPLAIN:\s*(\[.*?\])\s*OUTPUT FORMAT:", prompt, re.S)
+    if to_explain:
+        return json.dumps(_make_explanations(json.loads(to_explain.group(1))), indent=2, ensure_ascii=False)
+
+    explanations = "Do not write any explanations" not in prompt
+    total, distribution, domain = _parse_prompt(prompt)
+    questions: List[Dict[str, Any]] = []
+    for qtype, count in distribution.items():
+        for _ in range(count):
+            questions.append(_make_question(next(_question_numbers), qtype, domain, explanations))
+    return json.dumps(questions, indent=2, ensure_ascii=False)
+
+
+# ==================== PROMPT CACHE ====================
+
+# Prompt caching as the real providers do it, per model, so benchmarks see prefix reuse:
+# chat completions cache every prompt prefix automatically in units of PROMPT_CACHE_UNIT
+# characters (like DeepSeek), the messages API only the text up to a cache_control breakpoint.
+PROMPT_CACHE_UNIT = 64 * CHARS_PER_TOKEN
+PROMPT_CACHE_MAX_ENTRIES = 100_000
+
+_prompt_cache: "OrderedDict[str, None]" = OrderedDict()
+
+
+def _cache_lookup(digest: str) -> bool:
+    """Whether a prefix digest was cached, caching it either way"""
+    hit = digest in _prompt_cache
+    _prompt_cache[digest] = None
+    _prompt_cache.move_to_end(digest)
+    while len(_prompt_cache) > PROMPT_CACHE_MAX_ENTRIES:
+        _prompt_cache.popitem(last=False)
+    return hit
+
+
+def _cached_prefix_chars(model: str, prompt: str) -> int:
+    """Length of the longest cached unit-aligned prefix of a chat prompt"""
+    digest = hashlib.sha256(model.encode("utf-8"))
+    cached = 0
+    for end in range(PROMPT_CACHE_UNIT, len(prompt) + 1, PROMPT_CACHE_UNIT):
+        digest.update(prompt[end - PROMPT_CACHE_UNIT:end].encode("utf-8"))
+        if _cache_lookup(digest.hexdigest()) and cached == end - PROMPT_CACHE_UNIT:
+            cached = end
+    return cached
+
+
+def _breakpoint_prefix(body: Dict[str, Any]) -> str:
+    """Messages API text up to (and including) the last block marked with cache_control"""
+    blocks = []
+    for content in [body.get("system") or ""] + [m.get("content", "") for m in body.get("messages", [])]:
+        if isinstance(content, list):
+            blocks.extend(block for block in content if isinstance(block, dict))
+    marked = [i for i, block in enumerate(blocks) if block.get("cache_control")]
+    return "".join(block.get("text", "") for block in blocks[:marked[-1] + 1]) if marked else ""
+
+
+# ==================== BEHAVIOUR ====================
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _pick_failure() -> Optional[int]:
+    """Decide whether this request fails, returning the HTTP status to use"""
+    roll = _rng.random()
+    if roll < settings.rate_limit_rate:
+        return 429
+    if roll < settings.rate_limit_rate + settings.error_rate:
+        return 500
+    return None
+
+
+def _prepare_output(prompt: str, max_tokens: int) -> Tuple[str, bool]:
+    """Return the completion text and whether it was truncated"""
+    text = build_completion_text(prompt)
+    if settings.enforce_max_tokens and _estimate_tokens(text) > max_tokens:
+        return text[:max_tokens * CHARS_PER_TOKEN], True
+    if settings.truncation_rate and _rng.random() < settings.truncation_rate:
+        return text[:int(len(text) * _rng.uniform(0.3, 0.9))], True
+    return text, False
+
+
+def _speedup(model: str) -> float:
+    return max(settings.fast_model_speedup, 1e-6) if "fast" in model else 1.0
+
+
+async def _initial_delay(model: str):
+    delay = (settings.latency_ms + _rng.uniform(0, settings.jitter_ms)) / _speedup(model)
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+
+def _chunks(text: str):
+    size = TOKENS_PER_CHUNK * CHARS_PER_TOKEN
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+# Completions currently producing output, for capacity sharing
+_generating = 0
+
+
+@contextmanager
+def _generating_output():
+    global _generating
+    _generating += 1
+    try:
+        yield
+    finally:
+        _generating -= 1
+
+
+def _output_speed(model: str) -> float:
+    speed = settings.tokens_per_sec * _speedup(model)
+    if settings.capacity > 0 and _generating > settings.capacity:
+        speed *= settings.capacity / _generating
+    return speed
+
+
+async def _pace(chunk: str, model: str):
+    if settings.tokens_per_sec > 0:
+        await asyncio.sleep(_estimate_tokens(chunk) / _output_speed(model))
+
+
+async def _generate_fully(text: str, model: str):
+    if settings.tokens_per_sec > 0:
+        with _generating_output():
+            await asyncio.sleep(_estimate_tokens(text) / _output_speed(model))
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# ==================== OPENAI CHAT COMPLETIONS ====================
+
+def _openai_error(status: int) -> JSONResponse:
+    kind = "rate_limit_exceeded" if status == 429 else "server_error"
+    headers = {"retry-after": "1"} if status == 429 else {}
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": f"Fake provider {kind}", "type": kind, "code": kind}},
+        headers=headers
+    )
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+    model = body.get("model", "fake-chat")
+
+    failure = _pick_failure()
+    await _initial_delay(model)
+    if failure:
+        return _openai_error(failure)
+
+    text, truncated = _prepare_output(prompt, int(body.get("max_tokens") or 8000))
+    finish_reason = "length" if truncated else "stop"
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    cache_hit_tokens = _cached_prefix_chars(model, prompt) // CHARS_PER_TOKEN
+    usage = {
+        "prompt_tokens": _estimate_tokens(prompt),
+        "completion_tokens": _estimate_tokens(text),
+        "total_tokens": _estimate_tokens(prompt) + _estimate_tokens(text),
+        "prompt_cache_hit_tokens": cache_hit_tokens,
+        "prompt_cache_miss_tokens": _estimate_tokens(prompt) - cache_hit_tokens,
+    }
+
+    if not body.get("stream"):
+        await _generate_fully(text, model)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": finish_reason,
+            }],
+            "usage": usage,
+        }
+
+    include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+    async def event_stream():
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+        first = True
+        with _generating_output():
+            for chunk in _chunks(text):
+                delta = {"role": "assistant", "content": chunk} if first else {"content": chunk}
+                first = False
+                yield _sse({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                await _pace(chunk, model)
+        yield _sse({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+        if include_usage:
+            yield _sse({**base, "choices": [], "usage": usage})
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+# ==================== ANTHROPIC MESSAGES ====================
+
+def _anthropic_error(status: int) -> JSONResponse:
+    kind = "rate_limit_error" if status == 429 else "api_error"
+    headers = {"retry-after": "1"} if status == 429 else {}
+    return JSONResponse(
+        status_code=status,
+        content={"type": "error", "error": {"type": kind, "message": f"Fake provider {kind}"}},
+        headers=headers
+    )
+
+
+def _message_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    return "\n".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    body = await request.json()
+    system = body.get("system") or ""
+    prompt = "\n".join([_message_text(system)] + [_message_text(m.get("content", "")) for m in body.get("messages", [])])
+    model = body.get("model", "fake-chat")
+
+    failure = _pick_failure()
+    await _initial_delay(model)
+    if failure:
+        return _anthropic_error(failure)
+
+    text, truncated = _prepare_output(prompt, int(body.get("max_tokens") or 8000))
+    stop_reason = "max_tokens" if truncated else "end_turn"
+    message_id = f"msg_{uuid.uuid4().hex[:24]}"
+    output_tokens = _estimate_tokens(text)
+
+    # Cached prompt tokens are reported apart from input_tokens, like the real API does
+    cache_read = cache_creation = 0
+    breakpoint_prefix = _breakpoint_prefix(body)
+    if breakpoint_prefix:
+        digest = hashlib.sha256(f"{model}\0{breakpoint_prefix}".encode("utf-8")).hexdigest()
+        if _cache_lookup(digest):
+            cache_read = _estimate_tokens(breakpoint_prefix)
+        else:
+            cache_creation = _estimate_tokens(breakpoint_prefix)
+    input_tokens = max(1, _estimate_tokens(prompt) - cache_read - cache_creation)
+    usage = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+             "cache_read_input_tokens": cache_read, "cache_creation_input_tokens": cache_creation}
+
+    if not body.get("stream"):
+        await _generate_fully(text, model)
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": usage,
+        }
+
+    async def event_stream():
+        yield _sse({
+            "type": "message_start",
+            "message": {
+                "id": message_id, "type": "message", "role": "assistant", "model": model,
+                "content": [], "stop_reason": None, "stop_sequence": None,
+                "usage": {**usage, "output_tokens": 1},
+            },
+        }, "message_start")
+        yield _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+                   "content_block_start")
+        with _generating_output():
+            for chunk in _chunks(text):
+                yield _sse({"type": "content_block_delta", "index": 0,
+                            "delta": {"type": "text_delta", "text": chunk}}, "content_block_delta")
+                await _pace(chunk, model)
+        yield _sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        yield _sse({
+            "type": "message_delta",
+            "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+            "usage": {"output_tokens": output_tokens},
+        }, "message_delta")
+        yield _sse({"type": "message_stop"}, "message_stop")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+# ==================== MESSAGE BATCHES ====================
+
+_batches: Dict[str, Dict[str, Any]] = {}
+
+
+def _timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _batch_object(batch: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+    ended = batch["ended_at"] is not None
+    return {
+        "id": batch["id"],
+        "type": "message_batch",
+        "processing_status": "ended" if ended else "in_progress",
+        "request_counts": batch["counts"],
+        "created_at": _timestamp(batch["created_at"]),
+        "ended_at": _timestamp(batch["ended_at"]) if ended else None,
+        "expires_at": _timestamp(batch["created_at"] + timedelta(days=1).total_seconds()),
+        "archived_at": None,
+        "cancel_initiated_at": None,
+        "results_url": f"{base_url}v1/messages/batches/{batch['id']}/results" if ended else None,
+    }
+
+
+def _batch_result(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Result of one batch request, failed per the error settings"""
+    if _pick_failure():
+        return {"type": "errored", "error": {"type": "error", "error": {"type": "api_error",
+                                                                         "message": "Fake provider api_error"}}}
+    prompt = "\n".join([_message_text(params.get("system") or "")] +
+                       [_message_text(m.get("content", "")) for m in params.get("messages", [])])
+    text, truncated = _prepare_output(prompt, int(params.get("max_tokens") or 8000))
+    return {"type": "succeeded", "message": {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": params.get("model", "fake-chat"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "max_tokens" if truncated else "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": _estimate_tokens(prompt), "output_tokens": _estimate_tokens(text)},
+    }}
+
+
+async def _process_batch(batch: Dict[str, Any]):
+    await asyncio.sleep(settings.batch_latency_ms / 1000)
+    lines = []
+    for item in batch.pop("requests"):
+        result = _batch_result(item.get("params", {}))
+        batch["counts"]["processing"] -= 1
+        batch["counts"]["succeeded" if result["type"] == "succeeded" else "errored"] += 1
+        lines.append(json.dumps({"custom_id": item["custom_id"], "result": result}, ensure_ascii=False))
+    batch["results"] = "".join(f"{line}\n" for line in lines)
+    batch["ended_at"] = time.time()
+
+
+@app.post("/v1/messages/batches")
+async def create_message_batch(request: Request):
+    body = await request.json()
+    requests = body.get("requests", [])
+    batch = {
+        "id": f"msgbatch_{uuid.uuid4().hex[:24]}",
+        "requests": requests,
+        "counts": {"processing": len(requests), "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0},
+        "created_at": time.time(),
+        "ended_at": None,
+        "results": None,
+    }
+    _batches[batch["id"]] = batch
+    batch["task"] = asyncio.create_task(_process_batch(batch))
+    return _batch_object(batch, str(request.base_url))
+
+
+def _batch_not_found(batch_id: str) -> JSONResponse:
+    return JSONResponse(status_code=404, content={"type": "error", "error": {
+        "type": "not_found_error", "message": f"Message batch {batch_id} not found"}})
+
+
+@app.get("/v1/messages/batches/{batch_id}")
+async def retrieve_message_batch(batch_id: str, request: Request):
+    batch = _batches.get(batch_id)
+    if batch is None:
+        return _batch_not_found(batch_id)
+    return _batch_object(batch, str(request.base_url))
+
+
+@app.get("/v1/messages/batches/{batch_id}/results")
+async def message_batch_results(batch_id: str):
+    batch = _batches.get(batch_id)
+    if batch is None or batch["results"] is None:
+        return _batch_not_found(batch_id)
+    return Response(batch["results"], media_type="application/binary")
+
+
+# ==================== CONTROL ====================
+
+@app.get("/_fake/config")
+async def get_config():
+    """Current behaviour settings"""
+    return asdict(settings)
+
+
+@app.post("/_fake/config")
+async def set_config(request: Request):
+    """Change behaviour settings at runtime (e.g. between benchmark scenarios)"""
+    global _rng
+    values = await request.json()
+    settings.update(values)
+    if "seed" in values:
+        _rng = random.Random(settings.seed)
+    return asdict(settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI/Anthropic-compatible provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    for f in fields(FakeProviderSettings):
+        flag = "--" + f.name.replace("_", "-")
+        if f.type in (bool, "bool"):
+            parser.add_argument(flag, action="store_true", default=None)
+        else:
+            parser.add_argument(flag, default=None)
+    args = parser.parse_args()
+
+    global _rng
+    settings.update({k: v for k, v in vars(args).items() if v is not None and k not in ("host", "port")})
+    _rng = random.Random(settings.seed)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
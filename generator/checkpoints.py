@@ -0,0 +1,221 @@
+# generator/checkpoints.py - Per-batch checkpoints for resumable generation runs
+"""
+A generation run is split into batches (see generator.routes.plan_batches).
+Each batch's validated questions are saved as soon as it completes, keyed by
+the run id, so a run that dies part-way (provider error, platform timeout)
+can be resumed by generating only the batches that are missing.
+
+Backends (CHECKPOINT_BACKEND):
+    sqlite     Local SQLite file (CHECKPOINT_SQLITE_PATH) - default, one host
+    supabase   generation_runs / generation_run_batches tables
+               (database/generation_checkpoints.sql) - survives serverless instances
+    off        No checkpoints
+
+Every backend call is blocking I/O: async code runs them with
+asyncio.to_thread. Run ids are derived from the request, so the same
+request after CHECKPOINT_TTL_SECONDS maps to an expired run: start_run
+clears that run's old batches and restarts its clock, and neither get_run
+nor load_batches return anything past the TTL. Expired runs nobody asks
+for again are pruned by the job worker (generator.routes.job_worker).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from generator.models import Question
+from utils.logging_config import get_logger
+
+logger = get_logger("checkpoints")
+
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite").lower()
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "/tmp/ptb_checkpoints.sqlite3")
+
+# Unfinished runs older than this are not resumed, and are pruned every CHECKPOINT_PRUNE_INTERVAL_SECONDS
+CHECKPOINT_TTL_SECONDS = 24 * 3600
+CHECKPOINT_PRUNE_INTERVAL_SECONDS = 3600
+
+
+class SQLiteCheckpointStore:
+    """Checkpoints in a local SQLite file"""
+
+    def __init__(self, path: str = CHECKPOINT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS generation_runs "
+                "(run_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, request TEXT NOT NULL, created REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS generation_run_batches "
+                "(run_id TEXT NOT NULL, batch_index INTEGER NOT NULL, questions TEXT NOT NULL, "
+                "PRIMARY KEY (run_id, batch_index));"
+            )
+            self._local.conn = conn
+        return conn
+
+    def start_run(self, run_id: str, user_id: str, request: dict):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = conn.execute("SELECT 1 FROM generation_runs WHERE run_id = ? AND created < ?",
+                                   (run_id, now - CHECKPOINT_TTL_SECONDS)).fetchone()
+            if expired:
+                conn.execute("DELETE FROM generation_run_batches WHERE run_id = ?", (run_id,))
+                conn.execute("DELETE FROM generation_runs WHERE run_id = ?", (run_id,))
+            conn.execute("INSERT OR IGNORE INTO generation_runs (run_id, user_id, request, created) "
+                         "VALUES (?, ?, ?, ?)", (run_id, user_id, json.dumps(request), now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_run(self, run_id: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT user_id, request, created FROM generation_runs WHERE run_id = ?", (run_id,)
+        ).fetchone()
+        if row is None or row[2] < time.time() - CHECKPOINT_TTL_SECONDS:
+            return None
+        return {"user_id": row[0], "request": json.loads(row[1])}
+
+    def save_batch(self, run_id: str, batch_index: int, questions: List[dict]):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO generation_run_batches (run_id, batch_index, questions) VALUES (?, ?, ?)",
+            (run_id, batch_index, json.dumps(questions))
+        )
+
+    def load_batches(self, run_id: str) -> Dict[int, List[dict]]:
+        rows = self._connection().execute(
+            "SELECT b.batch_index, b.questions FROM generation_run_batches b "
+            "JOIN generation_runs r ON r.run_id = b.run_id WHERE b.run_id = ? AND r.created >= ?",
+            (run_id, time.time() - CHECKPOINT_TTL_SECONDS)
+        )
+        return {index: json.loads(questions) for index, questions in rows}
+
+    def delete_run(self, run_id: str):
+        conn = self._connection()
+        conn.execute("DELETE FROM generation_run_batches WHERE run_id = ?", (run_id,))
+        conn.execute("DELETE FROM generation_runs WHERE run_id = ?", (run_id,))
+
+    def prune(self, cutoff: float):
+        conn = self._connection()
+        conn.execute("DELETE FROM generation_run_batches WHERE run_id IN "
+                     "(SELECT run_id FROM generation_runs WHERE created < ?)", (cutoff,))
+        conn.execute("DELETE FROM generation_runs WHERE created < ?", (cutoff,))
+
+
+class SupabaseCheckpointStore:
+    """Checkpoints in Supabase, shared by every serverless instance"""
+
+    def _client(self):
+        from auth.routes import get_supabase_client
+        client = get_supabase_client()
+        if client is None:
+            raise RuntimeError("Supabase is not configured")
+        return client
+
+    def start_run(self, run_id: str, user_id: str, request: dict):
+        # An expired run with this id starts over: its batches go with it (ON DELETE CASCADE)
+        self._client().table("generation_runs").delete().eq("run_id", run_id).lt("created_at", self._cutoff()).execute()
+        self._client().table("generation_runs").upsert(
+            {"run_id": run_id, "user_id": user_id, "request": request}, on_conflict="run_id", ignore_duplicates=True
+        ).execute()
+
+    @staticmethod
+    def _cutoff() -> str:
+        return datetime.fromtimestamp(time.time() - CHECKPOINT_TTL_SECONDS, timezone.utc).isoformat()
+
+    def get_run(self, run_id: str) -> Optional[dict]:
+        response = self._client().table("generation_runs").select("user_id, request") \
+            .eq("run_id", run_id).gte("created_at", self._cutoff()).execute()
+        if not response.data:
+            return None
+        return {"user_id": response.data[0]["user_id"], "request": response.data[0]["request"]}
+
+    def save_batch(self, run_id: str, batch_index: int, questions: List[dict]):
+        self._client().table("generation_run_batches").upsert(
+            {"run_id": run_id, "batch_index": batch_index, "questions": questions}
+        ).execute()
+
+    def load_batches(self, run_id: str) -> Dict[int, List[dict]]:
+        if self.get_run(run_id) is None:  # Batches of expired runs are never resumed
+            return {}
+        response = self._client().table("generation_run_batches").select("batch_index, questions") \
+            .eq("run_id", run_id).execute()
+        return {row["batch_index"]: row["questions"] for row in response.data or []}
+
+    def delete_run(self, run_id: str):
+        # Batches are removed by ON DELETE CASCADE
+        self._client().table("generation_runs").delete().eq("run_id", run_id).execute()
+
+    def prune(self, cutoff: float):
+        created_before = datetime.fromtimestamp(cutoff, timezone.utc).isoformat()
+        self._client().table("generation_runs").delete().lt("created_at", created_before).execute()
+
+
+class CheckpointStore:
+    """
+    Failure-tolerant front for a checkpoint backend
+
+    Checkpointing is best-effort: if the backend is unavailable the run
+    carries on without it, it just cannot be resumed. Backends store plain
+    dicts; questions are converted to and from Question objects here.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _safe(self, operation: str, default, *args):
+        if self.backend is None:
+            return default
+        try:
+            return getattr(self.backend, operation)(*args)
+        except Exception as e:
+            logger.error(f"Checkpoint {operation} failed: {e}")
+            return default
+
+    def start_run(self, run_id: str, user_id: str, request: dict):
+        self._safe("start_run", None, run_id, user_id, request)
+
+    def get_run(self, run_id: str) -> Optional[dict]:
+        return self._safe("get_run", None, run_id)
+
+    def save_batch(self, run_id: str, batch_index: int, questions: List[Question]):
+        self._safe("save_batch", None, run_id, batch_index, [question.to_dict() for question in questions])
+
+    def load_batches(self, run_id: str) -> Dict[int, List[Question]]:
+        saved = self._safe("load_batches", {}, run_id)
+        try:
+            return {index: [Question.from_dict(q) for q in questions] for index, questions in saved.items()}
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.error(f"Ignoring unreadable checkpoints of run {run_id}: {e}")
+            return {}
+
+    def delete_run(self, run_id: str):
+        self._safe("delete_run", None, run_id)
+
+    def prune(self):
+        """Delete runs too old to be resumed"""
+        self._safe("prune", None, time.time() - CHECKPOINT_TTL_SECONDS)
+
+
+def create_backend(name: str = CHECKPOINT_BACKEND):
+    if name == "off":
+        return None
+    if name == "supabase":
+        return SupabaseCheckpointStore()
+    if name != "sqlite":
+        logger.warning(f"Unknown CHECKPOINT_BACKEND '{name}', using sqlite")
+    return SQLiteCheckpointStore()
+
+
+checkpoints = CheckpointStore(create_backend())
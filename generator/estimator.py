@@ -0,0 +1,134 @@
+# generator/estimator.py - Rolling model of AI output tokens and call time
+"""
+Every AI call of a generation returns its token usage and duration
+(generator.services.Completion), and generate_batch / explain_questions
+report them here. The estimator keeps exponentially decayed aggregates in
+memory:
+
+    tokens per question   per provider, model, explanation style and phase
+                          ("questions", or "stems" and "explanations" for
+                          two-phase generation)
+    prompt tokens         per provider, model and phase
+    call time             per provider and model, fitted as a line through
+                          (output tokens, seconds) so it follows batch size
+
+Reading them takes microseconds and no I/O, so the same estimates back
+POST /api/generator/estimate, admission control in front of /generate and
+the UI's progress bar. The aggregates are process-local and start from the
+ESTIMATE_* priors in config.py, which count as one call each.
+"""
+
+import threading
+from typing import Dict, Tuple
+
+from config import (
+    ESTIMATE_DECAY, ESTIMATE_TOKENS_PER_QUESTION, ESTIMATE_STEM_TOKEN_SHARE, ESTIMATE_PROMPT_TOKENS_PER_CALL,
+    ESTIMATE_CALL_OVERHEAD_SECONDS, ESTIMATE_TOKENS_PER_SECOND
+)
+from generator.services import ModelRoute
+
+
+class _DecayedMean:
+    __slots__ = ("weight", "total")
+
+    def __init__(self, prior: float):
+        self.weight = 1.0
+        self.total = prior
+
+    def add(self, value: float, decay: float):
+        self.weight = self.weight * (1 - decay) + 1
+        self.total = self.total * (1 - decay) + value
+
+    @property
+    def value(self) -> float:
+        return self.total / self.weight
+
+
+class _DecayedLine:
+    """Weighted least-squares line y = a + b * x over decayed observations"""
+    __slots__ = ("w", "x", "y", "xx", "xy")
+
+    def __init__(self, intercept: float, slope: float, span: float):
+        # The prior is two half-weight points on its line, at 0 and span
+        self.w, self.x, self.y = 1.0, span / 2, intercept + slope * span / 2
+        self.xx, self.xy = span * span / 2, span * (intercept + slope * span) / 2
+
+    def add(self, x: float, y: float, decay: float):
+        keep = 1 - decay
+        self.w = self.w * keep + 1
+        self.x = self.x * keep + x
+        self.y = self.y * keep + y
+        self.xx = self.xx * keep + x * x
+        self.xy = self.xy * keep + x * y
+
+    def at(self, x: float) -> float:
+        mean_x, mean_y = self.x / self.w, self.y / self.w
+        variance = self.xx / self.w - mean_x * mean_x
+        if variance <= 1e-9:
+            return mean_y
+        slope = max((self.xy / self.w - mean_x * mean_y) / variance, 0.0)
+        return max(mean_y + slope * (x - mean_x), 0.0)
+
+
+class GenerationEstimator:
+    """Output tokens per question and call time per route, learned from recent AI calls"""
+
+    def __init__(self, decay: float = ESTIMATE_DECAY):
+        self.decay = decay
+        self._lock = threading.Lock()
+        self._tokens: Dict[Tuple[str, str, str, str], _DecayedMean] = {}
+        self._prompts: Dict[Tuple[str, str, str], _DecayedMean] = {}
+        self._calls: Dict[Tuple[str, str], _DecayedLine] = {}
+
+    def _token_mean(self, route: ModelRoute, style: str, phase: str) -> _DecayedMean:
+        key = (route.provider, route.model, style, phase)
+        mean = self._tokens.get(key)
+        if mean is None:
+            prior = ESTIMATE_TOKENS_PER_QUESTION.get(style, ESTIMATE_TOKENS_PER_QUESTION["beginner-friendly"])
+            if phase == "stems":
+                prior *= ESTIMATE_STEM_TOKEN_SHARE
+            elif phase == "explanations":
+                prior *= 1 - ESTIMATE_STEM_TOKEN_SHARE
+            mean = self._tokens.setdefault(key, _DecayedMean(prior))
+        return mean
+
+    def _prompt_mean(self, route: ModelRoute, phase: str) -> _DecayedMean:
+        key = (route.provider, route.model, phase)
+        mean = self._prompts.get(key)
+        if mean is None:
+            mean = self._prompts.setdefault(key, _DecayedMean(ESTIMATE_PROMPT_TOKENS_PER_CALL))
+        return mean
+
+    def _call_line(self, route: ModelRoute) -> _DecayedLine:
+        key = (route.provider, route.model)
+        line = self._calls.get(key)
+        if line is None:
+            speed = ESTIMATE_TOKENS_PER_SECOND * route.relative_speed
+            line = self._calls.setdefault(key, _DecayedLine(ESTIMATE_CALL_OVERHEAD_SECONDS, 1 / speed, 1000))
+        return line
+
+    def observe(self, route: ModelRoute, style: str, phase: str, questions: int, response: str):
+        """Learn from one AI call that was asked for questions questions; responses without usage are ignored"""
+        completion_tokens = getattr(response, "completion_tokens", 0)
+        if not completion_tokens or questions <= 0:
+            return
+        with self._lock:
+            self._token_mean(route, style, phase).add(completion_tokens / questions, self.decay)
+            self._prompt_mean(route, phase).add(response.prompt_tokens, self.decay)
+            self._call_line(route).add(completion_tokens, response.seconds, self.decay)
+
+    def tokens_per_question(self, route: ModelRoute, style: str, phase: str) -> float:
+        with self._lock:
+            return self._token_mean(route, style, phase).value
+
+    def prompt_tokens(self, route: ModelRoute, phase: str) -> float:
+        with self._lock:
+            return self._prompt_mean(route, phase).value
+
+    def call_seconds(self, route: ModelRoute, completion_tokens: float) -> float:
+        """Expected duration of a call on a route producing completion_tokens"""
+        with self._lock:
+            return self._call_line(route).at(completion_tokens)
+
+
+estimator = GenerationEstimator()
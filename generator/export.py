@@ -0,0 +1,73 @@
+# generator/export.py - Udemy CSV export of generated questions
+import csv
+import io
+from typing import List, Sequence
+
+from config import OFFLOAD_CHUNK_SIZE, OFFLOAD_MIN_QUESTIONS
+from generator.models import Question
+from utils.offload import cpu_pool
+
+# Header matching the Udemy practice test template exactly
+UDEMY_CSV_HEADER = [
+    "Question",
+    "Question Type",
+    "Answer Option 1",
+    "Explanation 1",
+    "Answer Option 2",
+    "Explanation 2",
+    "Answer Option 3",
+    "Explanation 3",
+    "Answer Option 4",
+    "Explanation 4",
+    "Answer Option 5",
+    "Explanation 5",
+    "Answer Option 6",
+    "Explanation 6",
+    "Correct Answers",
+    "Overall Explanation",
+    "Domain"
+]
+
+
+def write_questions(writer, questions: Sequence[Question]):
+    for q in questions:
+        row = [q.question, q.question_type]
+
+        # Up to 6 answer options (validation keeps questions within that), empty cells for unused slots
+        answers = q.answers[:6]
+        for answer in answers:
+            row.append(answer.text)
+            row.append(answer.explanation)
+        row.extend(("", "") * (6 - len(answers)))
+
+        # Correct answers as comma-separated indices (1-based for Udemy)
+        row.append(",".join(str(i + 1) for i in q.correct_indices if i < 6))
+
+        row.append(q.overall_explanation)
+        row.append(q.domain)
+
+        writer.writerow(row)
+
+
+def convert_to_udemy_csv(questions: List[Question]) -> str:
+    """Convert questions to Udemy CSV format matching the official template"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(UDEMY_CSV_HEADER)
+    write_questions(writer, questions)
+    return output.getvalue()
+
+
+def encode_csv_rows(questions: Sequence[Question]) -> bytes:
+    """UTF-8 CSV rows (no header) for a chunk of questions - runs in an offload worker"""
+    output = io.StringIO()
+    write_questions(csv.writer(output), questions)
+    return output.getvalue().encode("utf-8")
+
+
+async def encode_udemy_csv(questions: List[Question]) -> bytes:
+    """UTF-8 Udemy CSV, encoded off the event loop in chunks for large tests"""
+    header = convert_to_udemy_csv([]).encode("utf-8")
+    chunks = await cpu_pool.map(encode_csv_rows, questions, OFFLOAD_CHUNK_SIZE, OFFLOAD_MIN_QUESTIONS,
+                                task="csv_encode")
+    return header + b"".join(chunks)
@@ -0,0 +1,307 @@
+# generator/history.py - Per-user history of finished tests for re-download
+"""
+Every finished test CSV is kept, gzip-compressed, so a user who loses the
+download can fetch it again without regenerating (or spending quota).
+
+Blobs are content-addressed: stored once under the SHA-256 of the CSV in
+HISTORY_DIR/blobs, however many history entries refer to them. Entry and
+blob metadata live in a SQLite file next to them. Entries expire after
+their tier's history_days (config.TIER_LIMITS); when the blobs outgrow
+HISTORY_MAX_BYTES, the least recently downloaded entries go first.
+
+Entries also keep the generate request, so single questions of a stored
+test can be regenerated in its context.
+
+Re-downloads stream straight from the compressed blob: as-is with
+Content-Encoding: gzip when the client accepts it, otherwise decompressed,
+optionally limited to a byte range of the CSV (see parse_range).
+
+Backends (HISTORY_BACKEND):
+    sqlite   Local directory HISTORY_DIR (default) - on serverless hosts only
+             as durable as the instance's disk
+    off      No history
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import BinaryIO, Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from config import get_history_retention_days
+from utils.logging_config import get_logger
+
+logger = get_logger("history")
+
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "sqlite").lower()
+HISTORY_DIR = os.getenv("HISTORY_DIR", "/tmp/ptb_history")
+HISTORY_MAX_BYTES = int(os.getenv("HISTORY_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+HISTORY_CHUNK_SIZE = 64 * 1024
+
+# Same trade-off as the idempotency store: CSVs shrink 5-10x for a few ms of CPU
+_GZIP_LEVEL = 6
+
+
+class HistoryEntry(NamedTuple):
+    id: str
+    user_id: str
+    title: str
+    test_title: str
+    num_questions: int
+    digest: str  # SHA-256 of the CSV
+    size: int  # CSV bytes
+    stored_size: int  # Compressed bytes on disk
+    created: float
+    expires: float
+    request: Optional[str] = None  # The generate request (JSON), for regenerating single questions
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "practice_test_title": self.test_title,
+            "num_questions": self.num_questions,
+            "size": self.size,
+            "created": self.created,
+            "expires": self.expires,
+        }
+
+
+_ENTRY_COLUMNS = "id, user_id, title, test_title, num_questions, digest, size, stored_size, created, expires, request"
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header into an inclusive (first, last) byte range of a size-byte body
+
+    Returns None to send the whole body (no header, another unit, or several
+    ranges - which servers may ignore). Raises ValueError when the range
+    cannot be satisfied.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash or not (first or last) or not (first or "0").isdigit() or not (last or "0").isdigit():
+        raise ValueError(f"malformed range {header!r}")
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or last < first:
+        raise ValueError(f"range {header!r} outside a {size}-byte body")
+    return first, last
+
+
+def iter_blob_range(path: str, first: int, last: int, chunk_size: int = HISTORY_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield bytes first..last (inclusive) of a stored CSV, decompressing as it goes"""
+    with gzip.open(path, "rb") as blob:
+        blob.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = blob.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class SQLiteHistoryStore:
+    """Entries in a SQLite file, blobs as gzip files in a directory next to it"""
+
+    def __init__(self, directory: str = HISTORY_DIR, max_bytes: int = HISTORY_MAX_BYTES,
+                 clock: Callable[[], float] = time.time):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.join(self.directory, "blobs"), exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, "history.sqlite3"), timeout=5,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS history_entries "
+                "(id TEXT PRIMARY KEY, user_id TEXT NOT NULL, title TEXT NOT NULL, test_title TEXT NOT NULL, "
+                "num_questions INTEGER NOT NULL, digest TEXT NOT NULL, size INTEGER NOT NULL, "
+                "stored_size INTEGER NOT NULL, created REAL NOT NULL, expires REAL NOT NULL, "
+                "last_access REAL NOT NULL, request TEXT);"
+                "CREATE INDEX IF NOT EXISTS history_entries_user ON history_entries (user_id, created);"
+                "CREATE INDEX IF NOT EXISTS history_entries_digest ON history_entries (digest);"
+                "CREATE TABLE IF NOT EXISTS history_blobs (digest TEXT PRIMARY KEY, stored_size INTEGER NOT NULL);"
+            )
+            # Stores created before entries kept their request
+            if "request" not in {row[1] for row in conn.execute("PRAGMA table_info(history_entries)")}:
+                conn.execute("ALTER TABLE history_entries ADD COLUMN request TEXT")
+            self._local.conn = conn
+        return conn
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], f"{digest}.csv.gz")
+
+    def _compress(self, source: BinaryIO) -> Tuple[str, str, int]:
+        """Compress source into a temporary file, returning (path, digest, CSV size)"""
+        digest = hashlib.sha256()
+        size = 0
+        fd, path = tempfile.mkstemp(dir=os.path.join(self.directory, "blobs"), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb",
+                                                           compresslevel=_GZIP_LEVEL, mtime=0) as blob:
+                while chunk := source.read(HISTORY_CHUNK_SIZE):
+                    digest.update(chunk)
+                    blob.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path, digest.hexdigest(), size
+
+    def save(self, user_id: str, retention_days: float, title: str, test_title: str, num_questions: int,
+             source: BinaryIO, request: Optional[dict] = None) -> HistoryEntry:
+        conn = self._connection()
+        temp_path, digest, size = self._compress(source)
+        now = self.clock()
+        entry_id = uuid.uuid4().hex
+
+        # The write lock keeps prune() from removing a blob between linking it and adding its entry
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            path = self.blob_path(digest)
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+            stored_size = os.path.getsize(path)
+            conn.execute("INSERT OR REPLACE INTO history_blobs (digest, stored_size) VALUES (?, ?)",
+                         (digest, stored_size))
+            entry = HistoryEntry(entry_id, user_id, title, test_title, num_questions, digest, size, stored_size,
+                                 now, now + retention_days * 86400,
+                                 json.dumps(request, ensure_ascii=False) if request is not None else None)
+            conn.execute(f"INSERT INTO history_entries ({_ENTRY_COLUMNS}, last_access) "
+                         f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (*entry, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self.prune()
+        return entry
+
+    def list(self, user_id: str, limit: int) -> List[HistoryEntry]:
+        rows = self._connection().execute(
+            f"SELECT {_ENTRY_COLUMNS} FROM history_entries WHERE user_id = ? AND expires > ? "
+            f"ORDER BY created DESC LIMIT ?", (user_id, self.clock(), limit)
+        )
+        return [HistoryEntry(*row) for row in rows]
+
+    def get(self, user_id: str, entry_id: str) -> Optional[HistoryEntry]:
+        """The user's live entry, marked as recently used for size-based eviction"""
+        conn = self._connection()
+        now = self.clock()
+        row = conn.execute(
+            f"SELECT {_ENTRY_COLUMNS} FROM history_entries WHERE id = ? AND user_id = ? AND expires > ?",
+            (entry_id, user_id, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE history_entries SET last_access = ? WHERE id = ?", (now, entry_id))
+        return HistoryEntry(*row)
+
+    def prune(self):
+        """Drop expired entries, then least recently used ones while blobs exceed max_bytes"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM history_entries WHERE expires <= ?", (self.clock(),))
+            total = conn.execute(
+                "SELECT COALESCE(SUM(stored_size), 0) FROM history_blobs "
+                "WHERE digest IN (SELECT digest FROM history_entries)"
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                for entry_id, digest in conn.execute(
+                    "SELECT id, digest FROM history_entries ORDER BY last_access"
+                ).fetchall():
+                    conn.execute("DELETE FROM history_entries WHERE id = ?", (entry_id,))
+                    if conn.execute("SELECT 1 FROM history_entries WHERE digest = ?", (digest,)).fetchone():
+                        continue
+                    total -= conn.execute("SELECT stored_size FROM history_blobs WHERE digest = ?",
+                                          (digest,)).fetchone()[0]
+                    if total <= self.max_bytes:
+                        break
+
+            orphans = [row[0] for row in conn.execute(
+                "SELECT digest FROM history_blobs WHERE digest NOT IN (SELECT digest FROM history_entries)"
+            )]
+            for digest in orphans:
+                conn.execute("DELETE FROM history_blobs WHERE digest = ?", (digest,))
+                try:
+                    os.remove(self.blob_path(digest))
+                except FileNotFoundError:
+                    pass
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if orphans:
+            logger.info(f"Pruned {len(orphans)} history blobs")
+
+
+class HistoryStore:
+    """
+    Failure-tolerant front for a history backend
+
+    Saving is best-effort: a test that cannot be stored is still delivered,
+    it just cannot be downloaded again.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def save(self, user: dict, title: str, test_title: str, num_questions: int,
+             source: BinaryIO, request: Optional[dict] = None) -> Optional[HistoryEntry]:
+        if self.backend is None:
+            return None
+        try:
+            return self.backend.save(user["id"], get_history_retention_days(user.get("tier", "free")),
+                                     title, test_title, num_questions, source, request)
+        except Exception as e:
+            logger.error(f"Saving to history failed: {e}")
+            return None
+
+    def list(self, user_id: str, limit: int) -> List[HistoryEntry]:
+        return self.backend.list(user_id, limit) if self.backend is not None else []
+
+    def get(self, user_id: str, entry_id: str) -> Optional[HistoryEntry]:
+        return self.backend.get(user_id, entry_id) if self.backend is not None else None
+
+    def blob_path(self, entry: HistoryEntry) -> str:
+        return self.backend.blob_path(entry.digest)
+
+
+def create_backend(name: str = HISTORY_BACKEND):
+    if name == "off":
+        return None
+    if name != "sqlite":
+        logger.warning(f"Unknown HISTORY_BACKEND '{name}', using sqlite")
+    return SQLiteHistoryStore()
+
+
+history = HistoryStore(create_backend())
@@ -0,0 +1,224 @@
+# generator/importer.py - Streaming import of existing Udemy practice test CSVs
+"""
+Customers upload a practice test in the static/files/udemy_template.csv format
+to check it, or to extend and fix it instead of generating from scratch.
+
+The upload (spooled to disk by the multipart parser) is read row by row,
+converted to the AI response schema and validated IMPORT_CHUNK_ROWS at a
+time with the same rules as generated questions. A scan keeps only counts,
+question fingerprints and the first MAX_LISTED_ROWS problems, so a 10k-row
+file takes constant memory; writing the valid rows back out is a second
+pass over the file.
+"""
+
+import csv
+import io
+import tempfile
+from collections import Counter
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from config import IMPORT_MAX_ROWS
+from generator.export import UDEMY_CSV_HEADER, write_questions
+from generator.models import Question
+from generator.validation import DuplicateFilter, question_kind, validate_questions
+
+IMPORT_CHUNK_ROWS = 500
+SPOOL_MAX_BYTES = 1024 * 1024  # Merged CSVs larger than this are written to a temporary file
+MAX_LISTED_ROWS = 100  # Rejected / duplicate rows listed individually in the report
+
+ANSWER_COLUMNS = 6
+
+
+class ImportRowError(ValueError):
+    """The file cannot be read as a Udemy practice test CSV"""
+
+
+def _row_to_raw(row: List[str]) -> Tuple[dict, List[str]]:
+    """Convert a template row to the AI response schema, with problems validation would not see"""
+    row = row + [""] * (len(UDEMY_CSV_HEADER) - len(row))
+    correct_column = 2 + 2 * ANSWER_COLUMNS
+    reasons = []
+
+    correct = set()
+    for value in row[correct_column].replace(";", ",").split(","):
+        value = value.strip()
+        if not value:
+            continue
+        if not value.isdigit() or not 1 <= int(value) <= ANSWER_COLUMNS:
+            reasons.append("invalid_correct_answers")
+            continue
+        correct.add(int(value))
+
+    answers = []
+    for position in range(1, ANSWER_COLUMNS + 1):
+        text, explanation = row[2 * position], row[2 * position + 1]
+        if text.strip():
+            answers.append({"text": text, "explanation": explanation, "is_correct": position in correct})
+        elif position in correct:
+            reasons.append("correct_answer_is_empty")
+
+    raw = {
+        "question": row[0],
+        "question_type": row[1],
+        "answers": answers,
+        "overall_explanation": row[correct_column + 1],
+        "domain": row[correct_column + 2],
+    }
+    return raw, reasons
+
+
+def iter_rows(binary: BinaryIO) -> Iterator[Tuple[int, List[str]]]:
+    """Yield (line number, cells) for each non-empty row after checking the header"""
+    binary.seek(0)
+    text = io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None or [cell.strip().lower() for cell in header] != [h.lower() for h in UDEMY_CSV_HEADER]:
+            raise ImportRowError("the header row does not match the Udemy template")
+
+        rows = 0
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            rows += 1
+            if rows > IMPORT_MAX_ROWS:
+                raise ImportRowError(f"more than {IMPORT_MAX_ROWS} questions")
+            yield reader.line_num, row
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ImportRowError(str(e))
+    finally:
+        # Leave the upload open for a second pass
+        text.detach()
+
+
+def iter_questions(binary: BinaryIO) -> Iterator[Tuple[int, Optional[Question], List[str]]]:
+    """Yield (line number, repaired question or None, reasons it was rejected) for each row"""
+    chunk: List[Tuple[int, dict, List[str]]] = []
+
+    def flush():
+        report = validate_questions([raw for _, raw, _ in chunk])
+        rejected = {rejection.index: rejection.reasons for rejection in report.rejected}
+        valid = iter(report.questions)
+        for index, (line, _, row_reasons) in enumerate(chunk):
+            reasons = row_reasons + rejected.get(index, [])
+            question = next(valid) if index not in rejected else None
+            yield line, (None if reasons else question), reasons
+
+    for line, row in iter_rows(binary):
+        raw, reasons = _row_to_raw(row)
+        chunk.append((line, raw, reasons))
+        if len(chunk) == IMPORT_CHUNK_ROWS:
+            yield from flush()
+            chunk = []
+    if chunk:
+        yield from flush()
+
+
+def iter_unique_questions(binary: BinaryIO, seen: DuplicateFilter) -> Iterator[Tuple[int, Optional[Question], List[str]]]:
+    """iter_questions with repeats of an earlier row (or of a question in seen) rejected as duplicates"""
+    for line, question, reasons in iter_questions(binary):
+        if question is not None:
+            earlier = seen.add(question.question, line)
+            if earlier is not None:
+                question, reasons = None, [f"duplicate_of_line_{earlier}"]
+        yield line, question, reasons
+
+
+def row_to_question(row: List[str]) -> Optional[Question]:
+    """The repaired question in a template row, or None if it fails validation"""
+    raw, reasons = _row_to_raw(row)
+    report = validate_questions([raw])
+    return report.questions[0] if report.questions and not reasons else None
+
+
+class ImportReport:
+    """Summary of an uploaded test, built in one pass"""
+
+    def __init__(self):
+        self.rows = 0
+        self.kinds: Counter = Counter()  # Valid questions per distribution type
+        self.domains: Counter = Counter()
+        self.rejected: List[dict] = []
+        self.rejected_count = 0
+        self.duplicate_count = 0
+        self.existing = DuplicateFilter()  # Fingerprints of the valid questions
+
+    @property
+    def valid(self) -> int:
+        return sum(self.kinds.values())
+
+    def add(self, line: int, question: Optional[Question], reasons: List[str]):
+        self.rows += 1
+        if question is not None:
+            self.kinds[question_kind(question)] += 1
+            self.domains[question.domain] += 1
+            return
+        if reasons[0].startswith("duplicate_of_line_"):
+            self.duplicate_count += 1
+        else:
+            self.rejected_count += 1
+        if len(self.rejected) < MAX_LISTED_ROWS:
+            self.rejected.append({"line": line, "reasons": reasons})
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "valid": self.valid,
+            "rejected": self.rejected_count,
+            "duplicates": self.duplicate_count,
+            "question_types": dict(self.kinds),
+            "domains": dict(self.domains.most_common(20)),
+            "problems": self.rejected,
+        }
+
+
+def scan_import(binary: BinaryIO) -> ImportReport:
+    """Validate an uploaded CSV and summarize it (raises ImportRowError if it cannot be read)"""
+    report = ImportReport()
+    for line, question, reasons in iter_unique_questions(binary, report.existing):
+        report.add(line, question, reasons)
+    return report
+
+
+def write_merged_csv(binary: BinaryIO, new_questions: List[Question], output: BinaryIO):
+    """Write the upload's valid, unique questions followed by new ones as a UTF-8 Udemy CSV"""
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(UDEMY_CSV_HEADER)
+    for _, question, _ in iter_unique_questions(binary, DuplicateFilter()):
+        if question is not None:
+            write_questions(writer, [question])
+    write_questions(writer, new_questions)
+    text.flush()
+    text.detach()
+    output.seek(0)
+
+
+def merged_csv_file(binary: BinaryIO, new_questions: List[Question]) -> BinaryIO:
+    """write_merged_csv into a spooled temporary file, rewound for reading"""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    write_merged_csv(binary, new_questions, output)
+    return output
+
+
+def write_patched_csv(rows: List[List[str]], replacements: Dict[int, Question], output: BinaryIO):
+    """Write template rows as a UTF-8 Udemy CSV, with the rows at the given indices replaced"""
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(UDEMY_CSV_HEADER)
+    for index, row in enumerate(rows):
+        if index in replacements:
+            write_questions(writer, [replacements[index]])
+        else:
+            writer.writerow(row)
+    text.flush()
+    text.detach()
+    output.seek(0)
+
+
+def patched_csv_file(rows: List[List[str]], replacements: Dict[int, Question]) -> BinaryIO:
+    """write_patched_csv into a spooled temporary file, rewound for reading"""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    write_patched_csv(rows, replacements, output)
+    return output
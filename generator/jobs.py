@@ -0,0 +1,221 @@
+# generator/jobs.py - Background generation jobs and the provider batches they are sent in
+"""
+POST /api/generator/jobs accepts a generate request, answers 202 with a job
+id straight away and generates the test in the background; the finished
+test is saved to the history (generator.history) and the job points at it.
+
+Delivery modes:
+    realtime   Generated like /generate, JOB_REALTIME_CONCURRENCY jobs at a
+               time per worker, checkpointed under the job id
+    batch      Every AI call of the test is sent through the provider's batch
+               API (Anthropic Message Batches): about half the price and no
+               load on real-time capacity, with results within 24 hours.
+               Queued jobs are grouped into one provider batch per provider,
+               and each provider batch - not each job - is polled, backing
+               off from BATCH_POLL_MIN_SECONDS to BATCH_POLL_MAX_SECONDS.
+
+Jobs, provider batches and the raw batch results waiting to be assembled
+live in a SQLite file (JOBS_SQLITE_PATH), so a restarted worker picks up
+where the last one stopped. State changes are compare-and-set updates
+(claim), so several workers on one host never submit or finish a job twice.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from utils.logging_config import get_logger
+
+logger = get_logger("jobs")
+
+JOBS_SQLITE_PATH = os.getenv("JOBS_SQLITE_PATH", "/tmp/ptb_jobs.sqlite3")
+
+# Finished and failed jobs are kept this long for status requests
+JOB_RETENTION_SECONDS = 30 * 86400
+
+# Jobs stuck in running / finishing this long (their worker died) are picked up again
+JOB_STALE_SECONDS = 15 * 60
+
+
+class Job(NamedTuple):
+    id: str
+    user_id: str
+    tier: str
+    request: str  # The generate request (JSON)
+    delivery: str  # realtime or batch
+    status: str  # queued, running, submitted, finishing, completed or failed
+    history_entry_id: Optional[str]
+    error: Optional[str]
+    notify_url: Optional[str]
+    created: float
+    updated: float
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "delivery": self.delivery,
+            "status": self.status,
+            "history_entry_id": self.history_entry_id,
+            "error": self.error,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+
+class ProviderBatch(NamedTuple):
+    id: str  # The provider's batch id
+    provider: str
+    job_ids: List[str]
+    submitted: float
+    next_poll: float
+    interval: float
+
+
+_JOB_COLUMNS = "id, user_id, tier, request, delivery, status, history_entry_id, error, notify_url, created, updated"
+
+
+class SQLiteJobStore:
+    """Jobs in a local SQLite file"""
+
+    def __init__(self, path: str = JOBS_SQLITE_PATH, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS generation_jobs "
+                "(id TEXT PRIMARY KEY, user_id TEXT NOT NULL, tier TEXT NOT NULL, request TEXT NOT NULL, "
+                "delivery TEXT NOT NULL, status TEXT NOT NULL, history_entry_id TEXT, error TEXT, notify_url TEXT, "
+                "created REAL NOT NULL, updated REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS generation_jobs_status ON generation_jobs (status, delivery, created);"
+                "CREATE INDEX IF NOT EXISTS generation_jobs_user ON generation_jobs (user_id, created);"
+                "CREATE TABLE IF NOT EXISTS provider_batches "
+                "(id TEXT PRIMARY KEY, provider TEXT NOT NULL, job_ids TEXT NOT NULL, submitted REAL NOT NULL, "
+                "next_poll REAL NOT NULL, interval REAL NOT NULL, ended INTEGER NOT NULL DEFAULT 0);"
+                "CREATE TABLE IF NOT EXISTS job_results "
+                "(job_id TEXT NOT NULL, batch_index INTEGER NOT NULL, response TEXT, "
+                "PRIMARY KEY (job_id, batch_index));"
+            )
+            self._local.conn = conn
+        return conn
+
+    def create(self, user_id: str, tier: str, request: dict, delivery: str, notify_url: Optional[str]) -> Job:
+        now = self.clock()
+        job = Job(uuid.uuid4().hex, user_id, tier, json.dumps(request, ensure_ascii=False), delivery, "queued",
+                  None, None, notify_url, now, now)
+        conn = self._connection()
+        conn.execute(f"INSERT INTO generation_jobs ({_JOB_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", job)
+        conn.execute("DELETE FROM generation_jobs WHERE status IN ('completed', 'failed') AND updated < ?",
+                     (now - JOB_RETENTION_SECONDS,))
+        conn.execute("DELETE FROM provider_batches WHERE ended = 1 AND submitted < ?", (now - JOB_RETENTION_SECONDS,))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._connection().execute(
+            f"SELECT {_JOB_COLUMNS} FROM generation_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return Job(*row) if row else None
+
+    def list(self, user_id: str, limit: int) -> List[Job]:
+        rows = self._connection().execute(
+            f"SELECT {_JOB_COLUMNS} FROM generation_jobs WHERE user_id = ? ORDER BY created DESC LIMIT ?",
+            (user_id, limit)
+        )
+        return [Job(*row) for row in rows]
+
+    def with_status(self, status: str, delivery: Optional[str] = None, limit: int = 1000) -> List[Job]:
+        """Jobs in a status, oldest first"""
+        rows = self._connection().execute(
+            f"SELECT {_JOB_COLUMNS} FROM generation_jobs WHERE status = ? AND delivery = COALESCE(?, delivery) "
+            f"ORDER BY created LIMIT ?", (status, delivery, limit)
+        )
+        return [Job(*row) for row in rows]
+
+    def count(self, status: str) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM generation_jobs WHERE status = ?", (status,)
+        ).fetchone()[0]
+
+    def claim(self, job_id: str, from_status: str, to_status: str) -> bool:
+        """Move a job from one status to another, unless another worker got there first"""
+        cursor = self._connection().execute(
+            "UPDATE generation_jobs SET status = ?, updated = ? WHERE id = ? AND status = ?",
+            (to_status, self.clock(), job_id, from_status)
+        )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, status: str, history_entry_id: Optional[str] = None, error: Optional[str] = None):
+        conn = self._connection()
+        conn.execute("UPDATE generation_jobs SET status = ?, history_entry_id = ?, error = ?, updated = ? WHERE id = ?",
+                     (status, history_entry_id, error, self.clock(), job_id))
+        conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+
+    def requeue_stale(self):
+        """Hand jobs whose worker died back to the queue (realtime) or to assembly (batch)"""
+        conn = self._connection()
+        cutoff = self.clock() - JOB_STALE_SECONDS
+        conn.execute("UPDATE generation_jobs SET status = 'queued' WHERE status = 'running' AND updated < ?", (cutoff,))
+        conn.execute("UPDATE generation_jobs SET status = 'submitted' WHERE status = 'finishing' AND updated < ?",
+                     (cutoff,))
+
+    def add_provider_batch(self, batch_id: str, provider: str, job_ids: List[str], poll_interval: float):
+        now = self.clock()
+        self._connection().execute(
+            "INSERT INTO provider_batches (id, provider, job_ids, submitted, next_poll, interval) "
+            "VALUES (?, ?, ?, ?, ?, ?)", (batch_id, provider, json.dumps(job_ids), now, now + poll_interval, poll_interval)
+        )
+
+    def due_provider_batches(self) -> List[ProviderBatch]:
+        rows = self._connection().execute(
+            "SELECT id, provider, job_ids, submitted, next_poll, interval FROM provider_batches "
+            "WHERE ended = 0 AND next_poll <= ?", (self.clock(),)
+        )
+        return [ProviderBatch(row[0], row[1], json.loads(row[2]), *row[3:]) for row in rows]
+
+    def claim_provider_batch(self, batch: ProviderBatch, interval: float) -> bool:
+        """Schedule a provider batch's next poll, unless another worker is polling it now"""
+        cursor = self._connection().execute(
+            "UPDATE provider_batches SET next_poll = ?, interval = ? WHERE id = ? AND next_poll = ?",
+            (self.clock() + interval, interval, batch.id, batch.next_poll)
+        )
+        return cursor.rowcount == 1
+
+    def pending_provider_batches(self, job_id: str) -> int:
+        """Provider batches with calls of a job that have not ended yet"""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM provider_batches WHERE ended = 0 AND job_ids LIKE ?", (f'%"{job_id}"%',)
+        ).fetchone()[0]
+
+    def save_results(self, batch_id: str, results: Dict[str, Dict[int, Optional[str]]]):
+        """Store a provider batch's responses (None for failed calls) by job and batch index, and mark it ended"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for job_id, responses in results.items():
+                conn.executemany(
+                    "INSERT OR REPLACE INTO job_results (job_id, batch_index, response) VALUES (?, ?, ?)",
+                    [(job_id, index, response) for index, response in responses.items()]
+                )
+            conn.execute("UPDATE provider_batches SET ended = 1 WHERE id = ?", (batch_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def results(self, job_id: str) -> Dict[int, Optional[str]]:
+        rows = self._connection().execute(
+            "SELECT batch_index, response FROM job_results WHERE job_id = ?", (job_id,)
+        )
+        return {index: response for index, response in rows}
+
+
+jobs = SQLiteJobStore()
@@ -0,0 +1,102 @@
+# generator/models.py - Compact in-memory representation of generated questions
+"""
+Bulk runs, checkpoints and caches can hold thousands of questions at once,
+so questions are slotted objects rather than nested dicts: an answer keeps
+only its text and explanation, which answers are correct is a single int
+bitmask on the question, and the handful of distinct question_type and
+domain strings are interned and shared by every question.
+
+Question.from_dict / to_dict convert at the boundaries (AI response JSON,
+checkpoints, JSON APIs). The text strings themselves are shared, not copied.
+"""
+
+import sys
+from typing import Iterable, List
+
+
+class Answer:
+    """One answer option"""
+    __slots__ = ("text", "explanation")
+
+    def __init__(self, text: str, explanation: str = ""):
+        self.text = text
+        self.explanation = explanation
+
+    def __reduce__(self):
+        return Answer, (self.text, self.explanation)
+
+    def __eq__(self, other):
+        return isinstance(other, Answer) and (self.text, self.explanation) == (other.text, other.explanation)
+
+    def __repr__(self):
+        return f"Answer({self.text!r})"
+
+
+class Question:
+    """A validated question; bit i of correct_mask is set when answers[i] is correct"""
+    __slots__ = ("question", "question_type", "answers", "correct_mask", "overall_explanation", "domain")
+
+    def __init__(self, question: str, question_type: str, answers: Iterable[Answer], correct_mask: int,
+                 overall_explanation: str = "", domain: str = ""):
+        self.question = question
+        self.question_type = sys.intern(question_type)
+        self.answers = tuple(answers)
+        self.correct_mask = correct_mask
+        self.overall_explanation = overall_explanation
+        self.domain = sys.intern(domain)
+
+    def is_correct(self, index: int) -> bool:
+        return bool(self.correct_mask >> index & 1)
+
+    @property
+    def correct_count(self) -> int:
+        return bin(self.correct_mask).count("1")
+
+    @property
+    def correct_indices(self) -> List[int]:
+        """0-based indices of the correct answers"""
+        return [i for i in range(len(self.answers)) if self.correct_mask >> i & 1]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Question":
+        """Build from the AI response / checkpoint schema (answers with is_correct flags)"""
+        answers = data.get("answers", [])
+        mask = 0
+        for i, answer in enumerate(answers):
+            if answer.get("is_correct"):
+                mask |= 1 << i
+        return cls(
+            data["question"],
+            data["question_type"],
+            (Answer(answer["text"], answer.get("explanation", "")) for answer in answers),
+            mask,
+            data.get("overall_explanation", ""),
+            data.get("domain", ""),
+        )
+
+    def to_dict(self) -> dict:
+        """Convert to the AI response / checkpoint schema"""
+        return {
+            "question": self.question,
+            "question_type": self.question_type,
+            "answers": [
+                {"text": answer.text, "explanation": answer.explanation, "is_correct": bool(self.correct_mask >> i & 1)}
+                for i, answer in enumerate(self.answers)
+            ],
+            "overall_explanation": self.overall_explanation,
+            "domain": self.domain,
+        }
+
+    def __reduce__(self):
+        # Positional args instead of the default per-object slot-name state keep the
+        # pickles handed to offload workers compact
+        return Question, (self.question, self.question_type, self.answers, self.correct_mask,
+                          self.overall_explanation, self.domain)
+
+    def __eq__(self, other):
+        return isinstance(other, Question) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self):
+        return f"Question({self.question[:40]!r}, {self.question_type!r}, answers={len(self.answers)})"
@@ -0,0 +1,49 @@
+# generator/preview.py - Cache of generated test previews
+"""
+A preview is a few sample questions generated for a request before the user
+starts the full run (POST /api/generator/preview). Users tweak the form and
+preview again, often going back to an earlier version, so previews are kept
+per request fingerprint for PREVIEW_CACHE_TTL_SECONDS.
+
+The cache is process-local: a miss on another worker only costs one more
+fast-model call.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from config import PREVIEW_CACHE_MAX_ENTRIES, PREVIEW_CACHE_TTL_SECONDS
+
+
+class PreviewCache:
+    """Preview questions (as dicts) by request fingerprint, expired by TTL and least recently used first"""
+
+    def __init__(self, ttl: float = PREVIEW_CACHE_TTL_SECONDS, max_entries: int = PREVIEW_CACHE_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, questions: List[dict]):
+        self._entries[key] = (self.clock() + self.ttl, questions)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+preview_cache = PreviewCache()
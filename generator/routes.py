@@ -1,36 +1,69 @@
 # generator/routes.py - Practice test generation routes
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
-from typing import List, Optional
-import os
-import csv
+from fastapi import APIRouter, HTTPException, Depends, Header, File, Form, Query, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError as PydanticValidationError
+from collections import Counter
+from typing import BinaryIO, Iterable, List, Literal, NamedTuple, Optional, Sequence, Union
+import asyncio
+import contextvars
+import gzip
+import hashlib
 import io
+import ipaddress
 import json
-from openai import OpenAI
-from anthropic import Anthropic
-from auth.routes import get_current_user, supabase_client
+import math
+import os
+import socket
+import time
+from urllib.parse import urlsplit
+import httpx
+from auth.routes import get_current_user, get_supabase_client
+from generator.services import (
+    PREVIEW_ROUTE, ModelRoute, Prompt, call_ai, iter_message_batch_results, message_batch_ended, resolve_route,
+    submit_message_batch, supports_message_batches
+)
+from generator.checkpoints import CHECKPOINT_PRUNE_INTERVAL_SECONDS, checkpoints
+from generator.models import Question
+from generator.export import encode_udemy_csv
+from generator.history import history, iter_blob_range, parse_range
+from generator.importer import (
+    ImportReport, ImportRowError, iter_rows, merged_csv_file, patched_csv_file, row_to_question, scan_import
+)
+from generator.estimator import estimator
+from generator.jobs import Job, jobs
+from generator.preview import preview_cache
+from generator.validation import DuplicateFilter, apply_explanations, question_kind, validate_questions
 
 from config import (
-    AI_MODEL, AI_MAX_TOKENS, AI_TEMPERATURE, AI_PROVIDER,
-    DEEPSEEK_BASE_URL, VALIDATION, ERROR_MESSAGES
+    VALIDATION, ERROR_MESSAGES, GENERATION_BATCH_SIZE, GENERATION_MIN_BATCH_SIZE, GENERATION_BATCH_CONCURRENCY,
+    QUESTION_REGENERATION_ATTEMPTS, IMPORT_MAX_BYTES, IMPORT_MAX_ROWS,
+    TWO_PHASE_GENERATION, TWO_PHASE_EXPLANATION_STYLES, EXPLANATION_BATCH_SIZE, EXPLANATION_BATCH_CONCURRENCY,
+    PREVIEW_QUESTIONS, PREVIEW_LONG_FORM_QUESTIONS, PREVIEW_TIMEOUT_SECONDS,
+    REGENERATE_MAX_QUESTIONS, REGENERATE_FEEDBACK_MAX_LENGTH,
+    JOB_REALTIME_CONCURRENCY, JOB_WORKER_INTERVAL_SECONDS, BATCH_POLL_MIN_SECONDS, BATCH_POLL_MAX_SECONDS,
+    BATCH_MAX_CALLS, AI_MODEL_PRICING, get_monthly_question_limit
 )
 from utils.logging_config import get_logger
 from utils.exceptions import ValidationError, GenerationError
+from utils import metrics
+from utils.tracing import span
+from utils.compression import choose_encoding
+from utils.rate_limit import preview_rate_limiter, rate_limiter
+from utils.admission import AdmissionRejected, admission
+from utils.singleflight import SingleFlight
+from utils.idempotency import StoredBody, idempotency_store
 
 generator_router = APIRouter(prefix="/api/generator")
 
 # Setup logging
 logger = get_logger("generator")
 
-# Initialize AI clients based on provider
-if AI_PROVIDER == "deepseek":
-    client = OpenAI(
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-        base_url=DEEPSEEK_BASE_URL
-    )
-else:
-    client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+# CSV downloads are sent in chunks so compression and the client can start early
+CSV_CHUNK_SIZE = 64 * 1024
+
+# Identical generate requests from the same user share one in-flight generation
+generation_flights = SingleFlight("generation")
+preview_flights = SingleFlight("preview")
 
 
 class GenerateTestRequest(BaseModel):
@@ -90,7 +123,7 @@ def get_question_type_distribution(formats: List[str], total: int) -> dict:
     if "true-false" in formats:
         types_selected.append("true_false")
     if "scenario-based" in formats:
-        types_selected.append("multiple_choice")  # Scenarios are multiple choice
+        types_selected.append("scenario_based")  # Multiple choice, routed separately
 
     if not types_selected:
         types_selected = ["multiple_choice"]  # Default
@@ -105,14 +138,120 @@ def get_question_type_distribution(formats: List[str], total: int) -> dict:
     return distribution
 
 
-async def generate_questions_with_ai(request: GenerateTestRequest) -> List[dict]:
-    """Generate practice test questions using Claude AI"""
-
-    # Determine question type distribution
-    distribution = get_question_type_distribution(request.question_formats, request.num_questions)
-
-    # Build the AI prompt
-    prompt = f"""You are an expert educational content creator specializing in creating high-quality Udemy practice test questions.
+def plan_batches(distribution: dict, batch_size: int = GENERATION_BATCH_SIZE) -> List[dict]:
+    """
+    Split a question type distribution into per-batch distributions
+
+    Batches are as even as possible (at most batch_size questions each) and
+    interleave the question types. The plan is deterministic, so a resumed
+    run maps its checkpoints onto the same batches.
+    """
+    remaining = {qtype: count for qtype, count in distribution.items() if count > 0}
+    order = []
+    while remaining:
+        for qtype in list(remaining):
+            order.append(qtype)
+            remaining[qtype] -= 1
+            if not remaining[qtype]:
+                del remaining[qtype]
+
+    num_batches = max(1, math.ceil(len(order) / batch_size))
+    size = math.ceil(len(order) / num_batches) if order else 0
+    batches = []
+    for start in range(0, len(order), size or 1):
+        batch: dict = {}
+        for qtype in order[start:start + size]:
+            batch[qtype] = batch.get(qtype, 0) + 1
+        batches.append(batch)
+    return batches or [dict(distribution)]
+
+
+class Batch(NamedTuple):
+    """One AI call of a generation run"""
+    route: ModelRoute
+    distribution: dict
+    index: int  # Position among the batches of the same route
+    count: int  # Number of batches of the same route
+
+
+def plan_routed_batches(distribution: dict, difficulty_level: str) -> List[Batch]:
+    """
+    Group question types by model route (MODEL_ROUTES in config.py) and batch each group
+
+    The GENERATION_BATCH_CONCURRENCY slots are shared out between routes in
+    proportion to their work (questions / relative_speed, so a fast route
+    needs fewer slots for the same questions), and each route splits its
+    questions over its slots (batches between GENERATION_MIN_BATCH_SIZE and
+    GENERATION_BATCH_SIZE). The slowest batch - which decides the total
+    time - stays small without queueing batches behind each other.
+
+    Routes keep the order in which their first question type appears in the
+    distribution, so the plan is deterministic for checkpoint resumption.
+    """
+    groups: dict = {}
+    for qtype, count in distribution.items():
+        if count > 0:
+            route = resolve_route(qtype, difficulty_level)
+            groups.setdefault(route, {})[qtype] = count
+
+    work = {route: sum(group.values()) / route.relative_speed for route, group in groups.items()}
+    total_work = sum(work.values())
+    slots = {route: max(1, round(GENERATION_BATCH_CONCURRENCY * w / total_work)) for route, w in work.items()}
+    while sum(slots.values()) > GENERATION_BATCH_CONCURRENCY and max(slots.values()) > 1:
+        # Take a slot from the route whose batches grow least without it
+        spare = min((r for r in slots if slots[r] > 1), key=lambda r: work[r] / (slots[r] - 1))
+        slots[spare] -= 1
+
+    batches = []
+    for route, group in groups.items():
+        batch_size = math.ceil(sum(group.values()) / slots[route])
+        batch_size = min(GENERATION_BATCH_SIZE, max(GENERATION_MIN_BATCH_SIZE, batch_size))
+        group_batches = plan_batches(group, batch_size)
+        batches.extend(Batch(route, batch, i, len(group_batches)) for i, batch in enumerate(group_batches))
+    return batches or [Batch(resolve_route("multiple_choice", difficulty_level), dict(distribution), 0, 1)]
+
+
+def merge_routed_questions(batches: List[Batch], results: dict) -> List[Question]:
+    """Merge per-batch questions so each route's questions are spread evenly through the test"""
+    by_route: dict = {}
+    for index, batch in enumerate(batches):
+        by_route.setdefault(batch.route, []).extend(results[index])
+
+    positioned = []
+    for questions in by_route.values():
+        n = len(questions)
+        positioned.extend(((i + 0.5) / n, question) for i, question in enumerate(questions))
+    positioned.sort(key=lambda item: item[0])
+    return [question for _, question in positioned]
+
+
+def format_batch_prompt(objectives: List[str], batch_index: int, batch_count: int) -> str:
+    """Prompt section steering each batch of a multi-batch run towards different objectives"""
+    if batch_count <= 1:
+        return ""
+    focus = objectives[batch_index::batch_count] or [objectives[batch_index % len(objectives)]]
+    return f"""
+BATCH:
+This is batch {batch_index + 1} of {batch_count} of a larger practice test generated in parts.
+To avoid overlapping with the other batches, focus mainly on these learning objectives:
+{chr(10).join(f"- {obj}" for obj in focus)}
+"""
+
+
+def format_avoid_prompt(existing_questions: Sequence[str]) -> str:
+    """Prompt section listing questions the test already has, so new ones do not repeat them"""
+    if not existing_questions:
+        return ""
+    return f"""
+EXISTING QUESTIONS:
+The practice test already contains questions like these. Do not repeat or closely paraphrase them:
+{chr(10).join(f"- {' '.join(text.split())[:200]}" for text in existing_questions)}
+"""
+
+
+def build_course_context(request: GenerateTestRequest) -> str:
+    """Prompt section describing the course, the same for every AI call of a request"""
+    return f"""You are an expert educational content creator specializing in creating high-quality Udemy practice test questions.
 
 COURSE DETAILS:
 - Course Title: {request.working_title}
@@ -125,30 +264,68 @@ COURSE DETAILS:
 LEARNING OBJECTIVES:
 {chr(10).join(f"- {obj}" for obj in request.learning_objectives)}
 
-TASK:
-Generate exactly {request.num_questions} practice test questions for "{request.practice_test_title}".
-All questions should be specifically focused on the topics and concepts covered in this particular practice test section.
-
 DIFFICULTY GUIDANCE:
 {format_difficulty_prompt(request.difficulty_level)}
 
 EXPLANATION STYLE:
 {format_explanation_style_prompt(request.explanation_style)}
 
-QUESTION TYPE DISTRIBUTION:
-{json.dumps(distribution, indent=2)}
-
-REQUIREMENTS:
+"""
+
+
+def format_feedback_prompt(feedback: str) -> str:
+    """Prompt section passing on a reviewer's feedback about the questions being replaced"""
+    if not feedback:
+        return ""
+    return f"""
+REVIEWER FEEDBACK:
+These questions replace ones a reviewer rejected. Address this feedback:
+{feedback.strip()}
+"""
+
+
+def build_generation_prompt(request: GenerateTestRequest, distribution: dict,
+                            batch_index: int = 0, batch_count: int = 1,
+                            existing_questions: Sequence[str] = (), stems_only: bool = False,
+                            feedback: str = "") -> Prompt:
+    """
+    Build the AI prompt for generating a practice test (or one batch of it)
+
+    The course context and instructions come first and are the same for
+    every batch of a request (and its preview), so providers can serve them
+    from their prompt cache; the batch's question counts follow. With
+    stems_only, the questions come without explanations, which
+    build_explanation_prompt asks for separately. feedback is a reviewer's
+    note on questions being replaced.
+    """
+    num_questions = sum(distribution.values())
+    if stems_only:
+        explanation_rule = "Do not write any explanations - they are written in a separate step"
+        true_false_explanation = ""
+        answer_explanation = ""
+        overall_line = ""
+        explanation_notes = ""
+    else:
+        explanation_rule = "Explanations should help learners understand WHY the answer is correct"
+        true_false_explanation = " with explanation for both true/false cases"
+        answer_explanation = ', "explanation": "Why this is correct/incorrect"'
+        overall_line = """    "overall_explanation": "Overall explanation of the correct answer(s)",
+"""
+        explanation_notes = """- Each answer option MUST have its own explanation (why it's correct or incorrect)
+- overall_explanation should explain the correct answer(s) comprehensively
+"""
+    instructions = f"""REQUIREMENTS:
 1. Each question MUST directly relate to one or more of the learning objectives
 2. Ensure good variety across all learning objectives
 3. Questions should be clear, unambiguous, and professionally written
 4. For multiple_choice: provide exactly 4 answer options with ONE correct answer
 5. For multiple_select: provide 4-6 options with 2-3 correct answers
-6. For true_false: provide a clear statement with explanation for both true/false cases
-7. Avoid trick questions or overly obvious answers
-8. Include {"at least 2 scenario-based questions" if "scenario-based" in request.question_formats else "practical application questions"}
-9. Wrong answers should be plausible but clearly incorrect
-10. Explanations should help learners understand WHY the answer is correct
+6. For true_false: provide a clear statement{true_false_explanation}
+7. For scenario_based: a multiple_choice question built around a realistic workplace scenario
+8. Avoid trick questions or overly obvious answers
+9. Include {"at least 2 scenario-based questions" if "scenario-based" in request.question_formats else "practical application questions"}
+10. Wrong answers should be plausible but clearly incorrect
+11. {explanation_rule}
 
 OUTPUT FORMAT:
 Return a JSON array of question objects with this EXACT structure for Udemy CSV format:
@@ -157,13 +334,12 @@ Return a JSON array of question objects with this EXACT structure for Udemy CSV
     "question": "The full question text",
     "question_type": "multiple-choice|multi-select",
     "answers": [
-      {{"text": "Answer option 1", "explanation": "Why this is correct/incorrect", "is_correct": false}},
-      {{"text": "Answer option 2", "explanation": "Why this is correct/incorrect", "is_correct": true}},
-      {{"text": "Answer option 3", "explanation": "Why this is correct/incorrect", "is_correct": false}},
-      {{"text": "Answer option 4", "explanation": "Why this is correct/incorrect", "is_correct": false}}
+      {{"text": "Answer option 1"{answer_explanation}, "is_correct": false}},
+      {{"text": "Answer option 2"{answer_explanation}, "is_correct": true}},
+      {{"text": "Answer option 3"{answer_explanation}, "is_correct": false}},
+      {{"text": "Answer option 4"{answer_explanation}, "is_correct": false}}
     ],
-    "overall_explanation": "Overall explanation of the correct answer(s)",
-    "domain": "{request.category}"
+{overall_line}    "domain": "{request.category}"
   }}
 ]
 
@@ -171,77 +347,343 @@ IMPORTANT NOTES:
 - For multiple-choice: exactly 4-6 answer options, ONLY ONE with is_correct=true
 - For multi-select: 4-6 answer options, 2-3 with is_correct=true
 - For true/false: convert to multiple-choice with 2 options (TRUE and FALSE)
-- Each answer option MUST have its own explanation (why it's correct or incorrect)
-- overall_explanation should explain the correct answer(s) comprehensively
-- Use "multiple-choice" not "multiple_choice", use "multi-select" not "multiple_select"
+{explanation_notes}- Use "multiple-choice" not "multiple_choice", use "multi-select" not "multiple_select"
+
+"""
+    task = f"""TASK:
+Generate exactly {num_questions} practice test questions for "{request.practice_test_title}".
+All questions should be specifically focused on the topics and concepts covered in this particular practice test section.
+{format_batch_prompt(request.learning_objectives, batch_index, batch_count)}{format_avoid_prompt(existing_questions)}{format_feedback_prompt(feedback)}
+QUESTION TYPE DISTRIBUTION:
+{json.dumps(distribution, indent=2)}
 
 CRITICAL: Return ONLY the JSON array, no other text or markdown formatting."""
+    return Prompt(build_course_context(request) + instructions, task)
 
-    try:
-        logger.info(f"Generating {request.num_questions} questions using {AI_PROVIDER} for course: {request.working_title}")
-
-        # Call AI API based on provider
-        if AI_PROVIDER == "deepseek":
-            # DeepSeek uses OpenAI-compatible API
-            response = client.chat.completions.create(
-                model=AI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are an expert educational content creator specializing in creating high-quality Udemy practice test questions."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=AI_MAX_TOKENS,
-                temperature=AI_TEMPERATURE
-            )
 
-            logger.debug(f"DeepSeek response received, tokens used: {response.usage.prompt_tokens + response.usage.completion_tokens}")
-            response_text = response.choices[0].message.content.strip()
-        else:
-            # Claude API
-            message = client.messages.create(
-                model=AI_MODEL,
-                max_tokens=AI_MAX_TOKENS,
-                temperature=AI_TEMPERATURE,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+def build_explanation_prompt(request: GenerateTestRequest, questions: Sequence[Question]) -> Prompt:
+    """Build the AI prompt for writing the explanations of stem-only questions"""
+    numbered = [
+        {
+            "id": i + 1,
+            "question": question.question,
+            "answers": [{"text": answer.text, "is_correct": question.is_correct(j)}
+                        for j, answer in enumerate(question.answers)],
+        }
+        for i, question in enumerate(questions)
+    ]
+    instructions = """TASK:
+Write the explanations for the questions below. The questions and correct answers are final - do not change them.
+For every question write:
+- one explanation per answer option, in the same order, saying why that option is correct or incorrect
+- an overall_explanation that explains the correct answer(s) comprehensively
+
+"""
+    questions_section = f"""QUESTIONS TO EXPLAIN:
+{json.dumps(numbered, indent=2, ensure_ascii=False)}
+
+OUTPUT FORMAT:
+Return a JSON array with one object per question ({len(questions)} objects), in the same order:
+[
+  {{"id": 1, "answer_explanations": ["Why option 1 is correct/incorrect", "Why option 2 is correct/incorrect"], "overall_explanation": "Overall explanation of the correct answer(s)"}}
+]
 
-            logger.debug(f"Claude response received, tokens used: {message.usage.input_tokens + message.usage.output_tokens}")
-            response_text = message.content[0].text.strip()
+CRITICAL: Return ONLY the JSON array, no other text or markdown formatting."""
+    return Prompt(build_course_context(request) + instructions, questions_section)
+
+
+def parse_ai_response(response_text: str) -> list:
+    """
+    Parse the AI response into a list of raw questions (see generator.validation)
+
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON
+        ValueError: If the response is not a list of questions
+    """
+    # Remove markdown code blocks if present
+    if response_text.startswith("```json"):
+        response_text = response_text.replace("```json", "").replace("```", "").strip()
+    elif response_text.startswith("```"):
+        response_text = response_text.replace("```", "").strip()
+
+    questions = json.loads(response_text)
+
+    # Some models wrap the array in an object
+    if isinstance(questions, dict) and isinstance(questions.get("questions"), list):
+        questions = questions["questions"]
+    if not isinstance(questions, list):
+        raise ValueError("AI response is not a JSON array of questions")
+
+    return questions
 
-        # Remove markdown code blocks if present
-        if response_text.startswith("```json"):
-            response_text = response_text.replace("```json", "").replace("```", "").strip()
-        elif response_text.startswith("```"):
-            response_text = response_text.replace("```", "").strip()
 
-        questions = json.loads(response_text)
+def distribution_kind(qtype: str) -> str:
+    """question_kind that questions of a distribution type have (scenario_based ones are multiple_choice)"""
+    return qtype if qtype in ("true_false", "multiple_select") else "multiple_choice"
 
-        # Validate structure
-        for q in questions:
-            if not all(key in q for key in ["question", "question_type", "answers", "overall_explanation"]):
-                raise ValueError("Invalid question structure returned by AI. Missing required fields.")
 
-            # Validate answers structure
-            if not isinstance(q["answers"], list) or len(q["answers"]) < 2:
-                raise ValueError("Each question must have at least 2 answer options")
+def missing_distribution(distribution: dict, available: Counter) -> dict:
+    """
+    Question types of a distribution not covered by the available questions
 
-            for ans in q["answers"]:
-                if not all(key in ans for key in ["text", "explanation", "is_correct"]):
-                    raise ValueError("Each answer must have text, explanation, and is_correct fields")
+    available counts questions per question_kind; multiple_choice questions
+    cover both the multiple_choice and scenario_based types.
+    """
+    available = Counter(available)
+    missing = {}
+    for qtype, count in distribution.items():
+        kind = distribution_kind(qtype)
+        covered = min(count, available[kind])
+        available[kind] -= covered
+        if count > covered:
+            missing[qtype] = count - covered
+    return missing
 
-        logger.info(f"Successfully validated {len(questions)} questions")
-        return questions
+
+def shortfall_distribution(distribution: dict, questions: List[Question]) -> dict:
+    """Question types of a batch's distribution not covered by its valid questions"""
+    return missing_distribution(distribution, Counter(question_kind(q) for q in questions))
+
+
+async def generate_batch(request: GenerateTestRequest, batch: Batch,
+                         seen: Optional[DuplicateFilter] = None, stems_only: bool = False,
+                         feedback: str = "") -> List[Question]:
+    """
+    Generate and validate one batch of questions on its route
+
+    Questions the validator cannot repair, repeats of questions in seen (the
+    rest of the test) and questions the AI left out are regenerated with a
+    prompt for just those question types, up to QUESTION_REGENERATION_ATTEMPTS
+    more AI calls. With stems_only the questions have no explanations yet
+    (see explain_questions).
+    """
+    questions: List[Question] = []
+    distribution = batch.distribution
+
+    try:
+        for attempt in range(QUESTION_REGENERATION_ATTEMPTS + 1):
+            prompt = build_generation_prompt(request, distribution, batch.index, batch.count,
+                                             seen.examples if seen is not None else (), stems_only, feedback)
+            response_text = await call_ai(prompt, batch.route)
+            estimator.observe(batch.route, request.explanation_style, "stems" if stems_only else "questions",
+                              sum(distribution.values()), response_text)
+
+            parse_start = time.perf_counter()
+            with span("parse"):
+                report = validate_questions(parse_ai_response(response_text), explanations=not stems_only)
+
+            metrics.PARSE_SECONDS.observe(time.perf_counter() - parse_start)
+            fresh = [q for q in report.questions if seen is None or seen.add(q.question) is None]
+            if len(fresh) < len(report.questions):
+                metrics.QUESTIONS_REJECTED_TOTAL.labels("duplicate").inc(len(report.questions) - len(fresh))
+            questions.extend(fresh)
+            distribution = shortfall_distribution(batch.distribution, questions)
+            if not distribution:
+                return questions
+
+            reasons = sorted({reason for rejection in report.rejected for reason in rejection.reasons})
+            logger.warning(f"Batch {batch.index} is {sum(distribution.values())} questions short "
+                           f"({len(report.rejected)} rejected: {', '.join(reasons) or 'none'}, "
+                           f"{len(report.questions) - len(fresh)} duplicates)")
+
+        metrics.PARSE_FAILURES_TOTAL.labels(reason="failed_validation").inc()
+        raise GenerationError(f"{sum(distribution.values())} questions failed validation "
+                              f"after {QUESTION_REGENERATION_ATTEMPTS} regeneration attempts")
 
     except json.JSONDecodeError as e:
+        metrics.PARSE_FAILURES_TOTAL.labels(reason="invalid_json").inc()
         raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
+    except ValueError as e:
+        metrics.PARSE_FAILURES_TOTAL.labels(reason="invalid_structure").inc()
+        raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
 
+def uses_two_phase(request: GenerateTestRequest) -> bool:
+    """Whether a request's questions are generated as stems first, explanations second (TWO_PHASE_GENERATION)"""
+    if TWO_PHASE_GENERATION == "auto":
+        return request.explanation_style in TWO_PHASE_EXPLANATION_STYLES
+    return TWO_PHASE_GENERATION == "on"
+
+
+async def explain_questions(request: GenerateTestRequest, route: ModelRoute, questions: List[Question],
+                            slots: asyncio.Semaphore):
+    """
+    Write the explanations of stem-only questions, EXPLANATION_BATCH_SIZE questions per AI call
+
+    The calls run in parallel (as many at a time as slots allows) and fill
+    their questions in as they complete. Questions left without valid
+    explanations are asked for again, up to QUESTION_REGENERATION_ATTEMPTS
+    more calls each.
+    """
+    async def explain(chunk: List[Question]):
+        pending = chunk
+        for attempt in range(QUESTION_REGENERATION_ATTEMPTS + 1):
+            async with slots:
+                response_text = await call_ai(build_explanation_prompt(request, pending), route)
+            estimator.observe(route, request.explanation_style, "explanations", len(pending), response_text)
+            try:
+                with span("parse"):
+                    pending = apply_explanations(pending, parse_ai_response(response_text))
+            except ValueError as e:
+                metrics.PARSE_FAILURES_TOTAL.labels(reason="invalid_explanations").inc()
+                logger.warning(f"Unreadable explanations for {len(pending)} questions: {e}")
+            if not pending:
+                return
+        metrics.PARSE_FAILURES_TOTAL.labels(reason="failed_validation").inc()
+        raise GenerationError(f"{len(pending)} questions are missing explanations "
+                              f"after {QUESTION_REGENERATION_ATTEMPTS} regeneration attempts")
+
+    chunks = [questions[start:start + EXPLANATION_BATCH_SIZE]
+              for start in range(0, len(questions), EXPLANATION_BATCH_SIZE)]
+    try:
+        await asyncio.gather(*(explain(chunk) for chunk in chunks))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
+
+
+async def generate_questions_with_ai(request: GenerateTestRequest, run_id: Optional[str] = None,
+                                     distribution: Optional[dict] = None,
+                                     existing: Optional[DuplicateFilter] = None,
+                                     feedback: str = "") -> List[Question]:
+    """
+    Generate practice test questions using the configured AI provider
+
+    Question types are routed to models by MODEL_ROUTES, and each route's
+    questions are generated in batches of up to GENERATION_BATCH_SIZE,
+    GENERATION_BATCH_CONCURRENCY at a time. With a run_id, each batch is
+    checkpointed when it completes and batches checkpointed by an earlier
+    attempt of the same run are reused instead of regenerated.
+
+    For long-form explanation styles (uses_two_phase) batches generate stems
+    only; as each batch's stems are done its slot goes to the next batch
+    while its explanations are written in parallel (explain_questions).
+
+    distribution overrides the request's question types (e.g. only what an
+    imported test is missing); questions repeating one in existing, or each
+    other, are regenerated. feedback is passed on to every batch's prompt.
+    """
+    if distribution is None:
+        distribution = get_question_type_distribution(request.question_formats, request.num_questions)
+    batches = plan_routed_batches(distribution, request.difficulty_level)
+    seen = existing if existing is not None else DuplicateFilter()
+
+    completed = {}
+    if run_id:
+        saved = await asyncio.to_thread(checkpoints.load_batches, run_id)
+        completed = {
+            index: questions for index, questions in saved.items()
+            if index < len(batches) and len(questions) == sum(batches[index].distribution.values())
+        }
+        if completed:
+            metrics.GENERATION_BATCHES_TOTAL.labels("resumed").inc(len(completed))
+            for questions in completed.values():
+                for question in questions:
+                    seen.add(question.question)
+            logger.info(f"Resuming run {run_id}: {len(completed)} of {len(batches)} batches already generated")
+
+    missing = [index for index in range(len(batches)) if index not in completed]
+    routes = ", ".join(sorted({f"{b.route.name}={b.route.model}" for b in batches}))
+    logger.info(f"Generating {sum(sum(batches[i].distribution.values()) for i in missing)} questions in "
+                f"{len(missing)} batches ({routes}{', two-phase' if uses_two_phase(request) else ''}) "
+                f"for course: {request.working_title}")
+
+    semaphore = asyncio.Semaphore(GENERATION_BATCH_CONCURRENCY)
+    two_phase = uses_two_phase(request)
+    explanation_slots = asyncio.Semaphore(EXPLANATION_BATCH_CONCURRENCY)
+
+    async def run_batch(index: int):
+        async with semaphore:
+            with span("batch", index=index, route=batches[index].route.name):
+                questions = await generate_batch(request, batches[index], seen, stems_only=two_phase,
+                                                 feedback=feedback)
+        if two_phase:
+            with span("explanations", index=index):
+                await explain_questions(request, batches[index].route, questions, explanation_slots)
+        completed[index] = questions
+        metrics.GENERATION_BATCHES_TOTAL.labels("generated").inc()
+        if run_id:
+            await asyncio.to_thread(checkpoints.save_batch, run_id, index, questions)
+
+    # Let every batch finish (and checkpoint) even if one fails
+    results = await asyncio.gather(*(run_batch(index) for index in missing), return_exceptions=True)
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if failures:
+        metrics.GENERATION_BATCHES_TOTAL.labels("failed").inc(len(failures))
+        if len(completed) == 0 or not run_id:
+            raise failures[0]
+        done = sum(len(questions) for questions in completed.values())
+        total = sum(distribution.values())
+        logger.error(f"Run {run_id} failed with {done}/{total} questions checkpointed: {failures[0]}")
+        raise HTTPException(
+            status_code=500,
+            detail=ERROR_MESSAGES["generation_incomplete"].format(done=done, total=total)
+        )
+
+    questions = merge_routed_questions(batches, completed)
+    logger.info(f"Successfully validated {len(questions)} questions")
+    return questions
+
+
+class GenerationEstimate(NamedTuple):
+    output_tokens: int
+    seconds: float
+    cost_usd: float
+    ai_calls: int
+    concurrent_calls: int  # Average AI calls in flight, for admission control
+
+
+def estimate_generation(request: GenerateTestRequest) -> GenerationEstimate:
+    """
+    Predict a request's output tokens, wall time and AI cost from the rolling estimator
+
+    Batches are laid out like generate_questions_with_ai runs them: each
+    starts in the first free one of GENERATION_BATCH_CONCURRENCY slots, and
+    with two-phase generation its explanation calls follow its stems in
+    parallel. Regeneration of rejected questions is not included.
+    """
+    distribution = get_question_type_distribution(request.question_formats, request.num_questions)
+    batches = plan_routed_batches(distribution, request.difficulty_level)
+    two_phase = uses_two_phase(request)
+    style = request.explanation_style
+
+    slots = [0.0] * min(GENERATION_BATCH_CONCURRENCY, len(batches))
+    output_tokens = cost = seconds = call_seconds = 0.0
+    calls = 0
+    for batch in batches:
+        count = sum(batch.distribution.values())
+        phases = [("stems" if two_phase else "questions", 1, count)]
+        if two_phase:
+            phases.append(("explanations", math.ceil(count / EXPLANATION_BATCH_SIZE), min(count, EXPLANATION_BATCH_SIZE)))
+        input_price, output_price = AI_MODEL_PRICING.get(batch.route.model, (0.0, 0.0))
+
+        slot = slots.index(min(slots))
+        end = slots[slot]
+        for phase, phase_calls, questions_per_call in phases:
+            call_tokens = estimator.tokens_per_question(batch.route, style, phase) * questions_per_call
+            output_tokens += call_tokens * phase_calls
+            cost += (estimator.prompt_tokens(batch.route, phase) * input_price
+                     + call_tokens * output_price) * phase_calls / 1_000_000
+            calls += phase_calls
+            duration = estimator.call_seconds(batch.route, call_tokens)
+            call_seconds += duration * phase_calls
+            end += duration
+            if phase != "explanations":
+                slots[slot] = end  # Explanations run outside the batch slots
+        seconds = max(seconds, end)
+
+    concurrent = max(1, round(call_seconds / seconds)) if seconds else 1
+    return GenerationEstimate(round(output_tokens), round(seconds, 1), round(cost, 4), calls, concurrent)
+
+
 async def update_user_question_usage(user_id: str, num_questions: int):
     """Update user's monthly question usage counter"""
     try:
+        supabase_client = get_supabase_client()
+
         # Get current usage
         response = supabase_client.table("users").select("monthly_chars_used").eq("id", user_id).execute()
 
@@ -264,71 +706,82 @@ async def update_user_question_usage(user_id: str, num_questions: int):
         # Don't raise exception - we don't want to fail the request if tracking fails
 
 
-def convert_to_udemy_csv(questions: List[dict]) -> str:
-    """Convert questions to Udemy CSV format matching the official template"""
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write header matching Udemy template exactly
-    writer.writerow([
-        "Question",
-        "Question Type",
-        "Answer Option 1",
-        "Explanation 1",
-        "Answer Option 2",
-        "Explanation 2",
-        "Answer Option 3",
-        "Explanation 3",
-        "Answer Option 4",
-        "Explanation 4",
-        "Answer Option 5",
-        "Explanation 5",
-        "Answer Option 6",
-        "Explanation 6",
-        "Correct Answers",
-        "Overall Explanation",
-        "Domain"
-    ])
-
-    # Write questions
-    for q in questions:
-        row = [q["question"], q["question_type"]]
-
-        # Process up to 6 answer options
-        answers = q.get("answers", [])
-        correct_indices = []
-
-        for i in range(6):
-            if i < len(answers):
-                answer = answers[i]
-                row.append(answer["text"])
-                row.append(answer["explanation"])
-                # Track correct answer indices (1-based for Udemy)
-                if answer.get("is_correct", False):
-                    correct_indices.append(str(i + 1))
-            else:
-                # Empty cells for unused answer slots
-                row.append("")
-                row.append("")
-
-        # Correct answers as comma-separated indices
-        row.append(",".join(correct_indices))
-
-        # Overall explanation
-        row.append(q.get("overall_explanation", ""))
-
-        # Domain (category)
-        row.append(q.get("domain", ""))
-
-        writer.writerow(row)
-
-    return output.getvalue()
+async def iter_chunks(data: bytes, chunk_size: int = CSV_CHUNK_SIZE):
+    """Yield a payload in fixed-size chunks for a StreamingResponse"""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
 
 
-@generator_router.post("/generate")
-async def generate_test(request: GenerateTestRequest, current_user: dict = Depends(get_current_user)):
-    """Generate practice test questions and return as CSV"""
+def request_fingerprint(user_id: str, request: GenerateTestRequest) -> str:
+    """
+    Hash of a user's generate request, insensitive to formatting differences
+
+    Whitespace in text fields and the order of question_formats do not change
+    the generated test, so they are normalized away.
+    """
+    normalized = {
+        key: " ".join(value.split()) if isinstance(value, str) else value
+        for key, value in request.model_dump().items()
+    }
+    normalized["learning_objectives"] = [" ".join(obj.split()) for obj in request.learning_objectives]
+    normalized["question_formats"] = sorted(set(request.question_formats))
+    payload = json.dumps([user_id, normalized], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def run_id_for(fingerprint: str) -> str:
+    """Generation run id: retrying the same request resumes the same run"""
+    return fingerprint[:32]
+
+
+async def run_generation(request: GenerateTestRequest, current_user: dict, run_id: str) -> bytes:
+    """
+    Generate the questions, charge the user's usage and return the encoded CSV
+
+    Raises:
+        AdmissionRejected: If the generation would not finish within ADMISSION_SLO_SECONDS
+    """
+    estimate = estimate_generation(request)
+    async with admission.admit(estimate.concurrent_calls, estimate.seconds):
+        await asyncio.to_thread(checkpoints.start_run, run_id, current_user["id"], request.model_dump())
+        try:
+            with metrics.GENERATIONS_IN_FLIGHT.track_inprogress():
+                questions = await generate_questions_with_ai(request, run_id)
+        except HTTPException as e:
+            e.headers = {**(e.headers or {}), "X-Generation-Run-Id": run_id}
+            raise
+        await asyncio.to_thread(checkpoints.delete_run, run_id)
+
+    logger.info(f"Successfully generated {len(questions)} questions for: {request.working_title}")
+
+    # Update user's question usage counter
+    with span("usage_update"):
+        await update_user_question_usage(current_user["id"], request.num_questions)
+
+    # Convert to CSV
+    with span("csv_encode"), metrics.CSV_ENCODE_SECONDS.time():
+        csv_bytes = await encode_udemy_csv(questions)
+
+    with span("history_save"):
+        await asyncio.to_thread(history.save, current_user, request.working_title, request.practice_test_title,
+                                len(questions), io.BytesIO(csv_bytes), request.model_dump())
+    return csv_bytes
 
+
+def rate_limited_user(current_user: dict = Depends(get_current_user)) -> dict:
+    """Authenticated user, after counting the request against their tier's rate limit"""
+    rate_limiter.check(current_user["id"], current_user.get("tier", "free"))
+    return current_user
+
+
+def preview_rate_limited_user(current_user: dict = Depends(get_current_user)) -> dict:
+    """Authenticated user, after counting the request against their tier's preview rate limit"""
+    preview_rate_limiter.check(current_user["id"], current_user.get("tier", "free"))
+    return current_user
+
+
+def validate_generate_request(request: GenerateTestRequest):
+    """Check a generate request's learning objectives against the VALIDATION constraints"""
     # Validate inputs using config constants
     if len(request.learning_objectives) < VALIDATION["min_learning_objectives"]:
         logger.warning(f"Validation failed: Only {len(request.learning_objectives)} objectives provided")
@@ -345,31 +798,730 @@ async def generate_test(request: GenerateTestRequest, current_user: dict = Depen
                 detail=f"Each learning objective must be max {VALIDATION['learning_objective_max_length']} characters"
             )
 
-    # Generate questions
-    questions = await generate_questions_with_ai(request)
 
-    logger.info(f"Successfully generated {len(questions)} questions for: {request.working_title}")
+@generator_router.post("/generate")
+async def generate_test(
+    request: GenerateTestRequest,
+    current_user: dict = Depends(rate_limited_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    prefer: Optional[str] = Header(None)
+):
+    """
+    Generate practice test questions and return as CSV
+
+    Clients may send an Idempotency-Key header; retrying with the same key
+    and body replays the stored CSV without generating or charging again.
+
+    Under load, a test that would not finish in time is not started: the
+    answer is 503 with Retry-After, or - for clients sending
+    "Prefer: respond-async" - 202 with a background job (see GET /jobs/{id}).
+    """
+    validate_generate_request(request)
+
+    # Double-clicks and client retries join the generation already running for this request
+    key = request_fingerprint(current_user["id"], request)
+    respond_async = "respond-async" in (prefer or "").lower()
+
+    async def run_or_divert() -> bytes:
+        try:
+            return await run_generation(request, current_user, run_id_for(key))
+        except AdmissionRejected:
+            if not respond_async:
+                raise
+        # Diverting inside the flight and the idempotency record queues one job per request:
+        # joiners share it and Idempotency-Key retries replay its 202
+        job = await queue_job(current_user, request, "realtime", None)
+        metrics.ADMISSION_DECISIONS_TOTAL.labels("diverted").inc()
+        return StoredBody(json.dumps(job_to_dict(job)).encode(), 202)
+
+    def generate():
+        # Only requests that accept a 202 join a flight that may end in one
+        return generation_flights.do(f"{key}:async" if respond_async else key, run_or_divert)
+
+    replayed = False
+    if idempotency_key is None:
+        body = await generate()
+    else:
+        body, replayed = await idempotency_store.run(current_user["id"], idempotency_key, key, generate)
+
+    if getattr(body, "status_code", 200) == 202:
+        job_id = json.loads(body)["id"]
+        return Response(body, status_code=202, media_type="application/json", headers={
+            "Location": f"{generator_router.prefix}/jobs/{job_id}", "Preference-Applied": "respond-async",
+            **({"Idempotent-Replayed": "true"} if replayed else {})
+        })
+    return csv_download_response(request, body, replayed)
+
+
+def preview_distribution(request: GenerateTestRequest) -> dict:
+    """Question types of a request's preview: PREVIEW_QUESTIONS spread like the full test's"""
+    count = PREVIEW_LONG_FORM_QUESTIONS if request.explanation_style in TWO_PHASE_EXPLANATION_STYLES else PREVIEW_QUESTIONS
+    return get_question_type_distribution(request.question_formats, min(count, request.num_questions))
+
+
+def preview_key(user_id: str, request: GenerateTestRequest, distribution: dict) -> str:
+    """Cache key of a preview: the request apart from num_questions, plus the question types it asks for"""
+    fingerprint = request_fingerprint(user_id, request.model_copy(update={"num_questions": 0}))
+    return f"{fingerprint}:{json.dumps(distribution, sort_keys=True, separators=(',', ':'))}"
+
+
+async def generate_preview(request: GenerateTestRequest, distribution: dict, key: str) -> List[dict]:
+    """Generate preview questions in one call on PREVIEW_ROUTE and cache them under key"""
+    with span("preview", questions=sum(distribution.values())):
+        questions = await generate_batch(request, Batch(PREVIEW_ROUTE, distribution, 0, 1))
+    preview = [question.to_dict() for question in questions]
+    preview_cache.put(key, preview)
+    return preview
+
+
+@generator_router.post("/preview")
+async def preview_test(request: GenerateTestRequest, current_user: dict = Depends(preview_rate_limited_user)):
+    """
+    Generate a few sample questions for a request before committing to the full run
+
+    Previews use the fast model and a small output budget, do not count
+    towards usage, and fail with 504 after PREVIEW_TIMEOUT_SECONDS. Their
+    prompt starts with the same course context and instructions as the full
+    run's, which the provider can then serve from its prompt cache. Repeating
+    a request returns the cached preview, whatever its num_questions, as long
+    as the preview's question types are the same. Previews have their own
+    rate limit (PREVIEW_RATE_LIMIT_REQUESTS_PER_MINUTE).
+    """
+    validate_generate_request(request)
+    distribution = preview_distribution(request)
+    key = preview_key(current_user["id"], request, distribution)
+
+    questions = preview_cache.get(key)
+    cached = questions is not None
+    if cached:
+        metrics.PREVIEW_REQUESTS_TOTAL.labels("cached").inc()
+    else:
+        try:
+            # A preview that times out keeps running (the flight is shielded) and is cached for a retry
+            questions = await asyncio.wait_for(
+                preview_flights.do(key, lambda: generate_preview(request, distribution, key)),
+                PREVIEW_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            metrics.PREVIEW_REQUESTS_TOTAL.labels("timeout").inc()
+            logger.warning(f"Preview for user {current_user['id']} timed out after {PREVIEW_TIMEOUT_SECONDS}s")
+            raise HTTPException(status_code=504, detail=ERROR_MESSAGES["preview_timeout"])
+        metrics.PREVIEW_REQUESTS_TOTAL.labels("generated").inc()
+
+    return {"questions": questions, "distribution": distribution, "cached": cached, "model": PREVIEW_ROUTE.model}
+
+
+@generator_router.post("/estimate")
+async def estimate_test(request: GenerateTestRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Predict a test's output tokens, generation time and quota impact before generating it
+
+    Answered from in-memory aggregates of recent AI calls, so the form can
+    ask again on every change; the UI's progress bar runs on seconds.
+    """
+    estimate = estimate_generation(request)
+    tier = current_user.get("tier", "free")
+    limit = get_monthly_question_limit(tier)
+    used = current_user.get("monthly_chars_used", 0)  # Question count (see update_user_question_usage)
+    return {
+        **estimate._asdict(),
+        "quota": {
+            "questions": request.num_questions,
+            "used": used,
+            "limit": limit,
+            "remaining_after": max(0, limit - used - request.num_questions),
+            "within_limit": used + request.num_questions <= limit,
+        },
+    }
 
-    # Update user's question usage counter
-    await update_user_question_usage(current_user["id"], request.num_questions)
 
-    # Convert to CSV
-    csv_content = convert_to_udemy_csv(questions)
+@generator_router.post("/runs/{run_id}/resume")
+async def resume_generation(run_id: str, current_user: dict = Depends(rate_limited_user)):
+    """Resume a failed generation run, generating only the batches that were not checkpointed"""
+    run = await asyncio.to_thread(checkpoints.get_run, run_id)
+    if run is None or run["user_id"] != current_user["id"]:
+        raise HTTPException(status_code=404, detail=ERROR_MESSAGES["run_not_found"])
 
-    # Create filename
-    safe_title = "".join(c for c in request.working_title if c.isalnum() or c in (' ', '-', '_')).strip()
+    request = GenerateTestRequest(**run["request"])
+    key = request_fingerprint(current_user["id"], request)
+    csv_bytes = await generation_flights.do(key, lambda: run_generation(request, current_user, run_id))
+    return csv_download_response(request, csv_bytes)
+
+
+def parse_generate_request(raw: str) -> GenerateTestRequest:
+    """Parse a generate request sent as a JSON form field next to an upload"""
+    try:
+        return GenerateTestRequest.model_validate_json(raw)
+    except PydanticValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json(include_url=False)))
+
+
+async def scan_upload(file: UploadFile) -> ImportReport:
+    """Validate an uploaded practice test CSV off the event loop"""
+    if file.size is not None and file.size > IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=ERROR_MESSAGES["import_too_large"].format(rows=IMPORT_MAX_ROWS))
+    try:
+        with span("import_scan"):
+            return await asyncio.to_thread(scan_import, file.file)
+    except ImportRowError as e:
+        raise HTTPException(status_code=400, detail=ERROR_MESSAGES["invalid_import"].format(reason=e))
+
+
+@generator_router.post("/import")
+async def import_test(
+    file: UploadFile = File(...),
+    request: Optional[str] = Form(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Check an existing Udemy practice test CSV against Udemy's rules
+
+    With a generate request (JSON form field), also diff the test against
+    it: the question types it is missing and those it has too many of.
+    """
+    report = await scan_upload(file)
+    body = report.to_dict()
+
+    if request is not None:
+        target = parse_generate_request(request)
+        distribution = get_question_type_distribution(target.question_formats, target.num_questions)
+        wanted = Counter()
+        for qtype, count in distribution.items():
+            wanted[distribution_kind(qtype)] += count
+        body["target"] = distribution
+        body["missing"] = missing_distribution(distribution, report.kinds)
+        body["surplus"] = dict(report.kinds - wanted)
+
+    logger.info(f"Imported {report.rows} rows for user {current_user['id']}: {report.valid} valid")
+    return body
+
+
+@generator_router.post("/import/extend")
+async def extend_imported_test(
+    file: UploadFile = File(...),
+    request: str = Form(...),
+    current_user: dict = Depends(rate_limited_user)
+):
+    """
+    Complete an uploaded practice test up to a generate request
+
+    Only the question types the upload is missing are generated (rows that
+    fail validation or repeat another row count as missing), without
+    repeating the uploaded questions. Returns the upload's valid questions
+    followed by the new ones as one CSV.
+    """
+    target = parse_generate_request(request)
+    report = await scan_upload(file)
+    missing = missing_distribution(
+        get_question_type_distribution(target.question_formats, target.num_questions), report.kinds
+    )
+
+    new_questions: List[Question] = []
+    if missing:
+        with metrics.GENERATIONS_IN_FLIGHT.track_inprogress():
+            new_questions = await generate_questions_with_ai(target, distribution=missing, existing=report.existing)
+        with span("usage_update"):
+            await update_user_question_usage(current_user["id"], len(new_questions))
+
+    with span("csv_encode"), metrics.CSV_ENCODE_SECONDS.time():
+        output = await asyncio.to_thread(merged_csv_file, file.file, new_questions)
+
+    with span("history_save"):
+        await asyncio.to_thread(history.save, current_user, target.working_title, target.practice_test_title,
+                                report.valid + len(new_questions), output, target.model_dump())
+        output.seek(0)
+
+    logger.info(f"Extended imported test for user {current_user['id']}: "
+                f"{report.valid} kept, {len(new_questions)} generated")
+    return csv_download_response(target, iter_file(output), headers={
+        "X-Imported-Questions": str(report.valid),
+        "X-Generated-Questions": str(len(new_questions)),
+        "X-Rejected-Rows": str(report.rejected_count + report.duplicate_count),
+    })
+
+
+@generator_router.get("/history")
+async def list_history(
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user)
+):
+    """List the user's finished tests that can still be downloaded again, newest first"""
+    entries = await asyncio.to_thread(history.list, current_user["id"], limit)
+    return {"tests": [entry.to_dict() for entry in entries]}
+
+
+@generator_router.get("/history/{entry_id}/download")
+async def download_from_history(
+    entry_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Download a finished test again, without generating or charging usage
+
+    A single byte range of the CSV (Range: bytes=first-last) can be
+    requested to resume an interrupted download. Whole downloads go out as
+    the stored gzip data when the client accepts gzip.
+    """
+    entry = await asyncio.to_thread(history.get, current_user["id"], entry_id)
+    path = history.blob_path(entry) if entry is not None else None
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=ERROR_MESSAGES["history_not_found"])
+
+    headers = {
+        "Content-Disposition": f"attachment; filename={csv_filename(entry.title)}",
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+    }
+    try:
+        byte_range = parse_range(range_header, entry.size)
+    except ValueError:
+        raise HTTPException(status_code=416, detail=ERROR_MESSAGES["invalid_range"],
+                            headers={"Content-Range": f"bytes */{entry.size}"})
+
+    # Each representation gets its own strong validator; ranges always address the identity CSV
+    identity_etag = f'"{entry.digest}"'
+    if byte_range is not None:
+        first, last = byte_range
+        return StreamingResponse(iter_blob_range(path, first, last), status_code=206, media_type="text/csv",
+                                 headers={**headers, "ETag": identity_etag,
+                                          "Content-Range": f"bytes {first}-{last}/{entry.size}",
+                                          "Content-Length": str(last - first + 1)})
+    if choose_encoding(accept_encoding, ("gzip",)) == "gzip":
+        return StreamingResponse(iter_file(open(path, "rb")), media_type="text/csv",
+                                 headers={**headers, "ETag": f'"{entry.digest}-gz"', "Content-Encoding": "gzip",
+                                          "Content-Length": str(entry.stored_size)})
+    return StreamingResponse(iter_blob_range(path, 0, entry.size - 1), media_type="text/csv",
+                             headers={**headers, "ETag": identity_etag, "Content-Length": str(entry.size)})
+
+
+class RegenerateQuestionsRequest(BaseModel):
+    """Request model for regenerating questions of a stored test"""
+    indices: List[int] = Field(..., min_length=1, max_length=REGENERATE_MAX_QUESTIONS)
+    feedback: str = Field("", max_length=REGENERATE_FEEDBACK_MAX_LENGTH)
+
+
+def read_history_rows(path: str) -> List[List[str]]:
+    """The question rows of a stored test"""
+    with gzip.open(path, "rb") as blob:
+        return [row for _, row in iter_rows(blob)]
+
+
+@generator_router.post("/history/{entry_id}/regenerate")
+async def regenerate_questions(
+    entry_id: str,
+    body: RegenerateQuestionsRequest,
+    current_user: dict = Depends(rate_limited_user)
+):
+    """
+    Regenerate selected questions of a finished test and return the patched CSV
+
+    indices are 0-based positions of questions in the test. Only those are
+    generated again, of the same question types and with the optional
+    reviewer feedback, avoiding both the rest of the test and the questions
+    they replace; every other row is returned unchanged. Usage is charged
+    for the regenerated questions only, and the patched test is saved to the
+    history as a new entry (X-History-Entry-Id).
+    """
+    entry = await asyncio.to_thread(history.get, current_user["id"], entry_id)
+    path = history.blob_path(entry) if entry is not None else None
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=ERROR_MESSAGES["history_not_found"])
+    if entry.request is None:
+        raise HTTPException(status_code=409, detail=ERROR_MESSAGES["history_not_regenerable"])
+
+    request = GenerateTestRequest.model_validate_json(entry.request)
+    rows = await asyncio.to_thread(read_history_rows, path)
+    indices = sorted(set(body.indices))
+    if not rows or indices[0] < 0 or indices[-1] >= len(rows):
+        raise HTTPException(status_code=400,
+                            detail=ERROR_MESSAGES["invalid_question_indices"].format(last=len(rows) - 1))
+
+    kinds = {}
+    for index in indices:
+        question = row_to_question(rows[index])
+        kinds[index] = question_kind(question) if question is not None else "multiple_choice"
+
+    # The replaced questions go first, so the prompt quotes them among the questions not to repeat
+    seen = DuplicateFilter()
+    for index in indices + [i for i in range(len(rows)) if i not in kinds]:
+        seen.add(rows[index][0], index)
+
+    with metrics.GENERATIONS_IN_FLIGHT.track_inprogress():
+        new_questions = await generate_questions_with_ai(request, distribution=dict(Counter(kinds.values())),
+                                                         existing=seen, feedback=body.feedback)
+    with span("usage_update"):
+        await update_user_question_usage(current_user["id"], len(new_questions))
+
+    by_kind: dict = {}
+    for question in new_questions:
+        by_kind.setdefault(question_kind(question), []).append(question)
+    replacements = {index: by_kind[kind].pop(0) for index, kind in kinds.items()}
+
+    with span("csv_encode"), metrics.CSV_ENCODE_SECONDS.time():
+        output = await asyncio.to_thread(patched_csv_file, rows, replacements)
+
+    with span("history_save"):
+        patched = await asyncio.to_thread(history.save, current_user, request.working_title,
+                                          request.practice_test_title, len(rows), output, request.model_dump())
+        output.seek(0)
+
+    logger.info(f"Regenerated {len(indices)} of {len(rows)} questions of history entry {entry_id} "
+                f"for user {current_user['id']}")
+    return csv_download_response(request, iter_file(output), headers={
+        "X-Regenerated-Questions": str(len(indices)),
+        **({"X-History-Entry-Id": patched.id} if patched is not None else {}),
+    })
+
+
+class GenerationJobRequest(BaseModel):
+    """Request model for a background generation job"""
+    request: GenerateTestRequest
+    delivery: Literal["realtime", "batch"] = "realtime"
+    notify_url: Optional[str] = None  # Public https:// URL that receives the job as JSON when it finishes
+
+
+def job_to_dict(job: Job) -> dict:
+    body = job.to_dict()
+    if job.history_entry_id:
+        body["download_url"] = f"{generator_router.prefix}/history/{job.history_entry_id}/download"
+    return body
+
+
+def job_request(job: Job) -> GenerateTestRequest:
+    return GenerateTestRequest.model_validate_json(job.request)
+
+
+def plan_job_batches(request: GenerateTestRequest) -> List[Batch]:
+    """The AI calls of a job - the same plan as a real-time run, so both deliveries produce the same test"""
+    distribution = get_question_type_distribution(request.question_formats, request.num_questions)
+    return plan_routed_batches(distribution, request.difficulty_level)
+
+
+async def check_notify_url(url: str) -> str:
+    """
+    Make sure a notify_url is an https:// URL on the public internet and return an address to send to
+
+    The host is resolved and every address it resolves to must be global, so
+    job notifications cannot reach loopback, private, link-local or reserved
+    addresses (cloud metadata endpoints, internal services).
+
+    Raises:
+        ValueError: If the URL is not https:// or its host is not public
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "https" or not parts.hostname or parts.username or parts.password:
+        raise ValueError("not an https:// URL")
+    try:
+        port = parts.port or 443
+        addresses = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"cannot resolve {parts.hostname}: {e}")
+    for *_, sockaddr in addresses:
+        if not ipaddress.ip_address(sockaddr[0].split("%")[0]).is_global:
+            raise ValueError(f"{parts.hostname} resolves to non-public address {sockaddr[0]}")
+    return addresses[0][4][0]
+
+
+async def send_notification(url: str, payload: dict, transport: Optional[httpx.AsyncBaseTransport] = None):
+    """
+    POST payload to a notify_url, connecting only to the address check_notify_url vetted
+
+    The request goes to that IP with the original Host header and TLS server
+    name, so the certificate is still checked against the host, and a DNS
+    answer that changes after the check (DNS rebinding) is never used.
+    """
+    address = await check_notify_url(url)
+    hostname = urlsplit(url).hostname
+    async with httpx.AsyncClient(timeout=10, follow_redirects=False, transport=transport) as client:
+        await client.post(httpx.URL(url).copy_with(host=address), json=payload,
+                          headers={"Host": urlsplit(url).netloc}, extensions={"sni_hostname": hostname})
+
+
+async def notify_job(job_id: str):
+    """POST a finished job to its notify_url, best-effort"""
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None or not job.notify_url:
+        return
+    try:
+        await send_notification(job.notify_url, job_to_dict(job))
+    except (ValueError, httpx.HTTPError) as e:
+        logger.warning(f"Notifying {job.notify_url} about job {job.id} failed: {e}")
+
+
+async def complete_job(job: Job, request: GenerateTestRequest, questions: List[Question]):
+    """Charge usage, save a job's test to the history and mark the job completed"""
+    user = {"id": job.user_id, "tier": job.tier}
+    with span("usage_update"):
+        await update_user_question_usage(job.user_id, len(questions))
+    with span("csv_encode"), metrics.CSV_ENCODE_SECONDS.time():
+        csv_bytes = await encode_udemy_csv(questions)
+    with span("history_save"):
+        entry = await asyncio.to_thread(history.save, user, request.working_title, request.practice_test_title,
+                                        len(questions), io.BytesIO(csv_bytes), request.model_dump())
+    await asyncio.to_thread(jobs.finish, job.id, "completed", entry.id if entry is not None else None)
+    metrics.GENERATION_JOBS_TOTAL.labels(job.delivery, "completed").inc()
+    logger.info(f"Job {job.id} ({job.delivery}) completed with {len(questions)} questions")
+    await notify_job(job.id)
+
+
+async def fail_job(job: Job, error: BaseException):
+    detail = error.detail if isinstance(error, HTTPException) else str(error)
+    await asyncio.to_thread(jobs.finish, job.id, "failed", None, str(detail))
+    metrics.GENERATION_JOBS_TOTAL.labels(job.delivery, "failed").inc()
+    logger.error(f"Job {job.id} ({job.delivery}) failed: {detail}")
+    await notify_job(job.id)
+
+
+async def run_realtime_job(job: Job):
+    """Generate a realtime job like /generate does, checkpointed under the job id"""
+    request = job_request(job)
+    try:
+        await asyncio.to_thread(checkpoints.start_run, job.id, job.user_id, request.model_dump())
+        with metrics.GENERATIONS_IN_FLIGHT.track_inprogress():
+            questions = await generate_questions_with_ai(request, job.id)
+        await asyncio.to_thread(checkpoints.delete_run, job.id)
+        await complete_job(job, request, questions)
+    except Exception as e:
+        await fail_job(job, e)
+
+
+async def submit_batch_jobs():
+    """
+    Send the AI calls of queued batch jobs to the providers, one provider batch per provider
+
+    Calls for providers without a batch API, or whose submission fails, are
+    not sent; assemble_batch_job makes them in real time instead.
+    """
+    calls: dict = {}
+    total = 0
+    for job in await asyncio.to_thread(jobs.with_status, "queued", "batch"):
+        request = job_request(job)
+        batches = plan_job_batches(request)
+        if total and total + len(batches) > BATCH_MAX_CALLS:
+            break
+        if not await asyncio.to_thread(jobs.claim, job.id, "queued", "submitted"):
+            continue
+        total += len(batches)
+        for index, batch in enumerate(batches):
+            if supports_message_batches(batch.route.provider):
+                prompt = build_generation_prompt(request, batch.distribution, batch.index, batch.count)
+                calls.setdefault(batch.route.provider, {}).setdefault(job.id, []).append(
+                    (f"{job.id}-{index}", prompt, batch.route))
+
+    for provider, by_job in calls.items():
+        provider_calls = [call for job_calls in by_job.values() for call in job_calls]
+        try:
+            batch_id = await submit_message_batch(provider, provider_calls)
+        except Exception as e:
+            metrics.AI_BATCH_CALLS_TOTAL.labels(provider, "failed").inc(len(provider_calls))
+            logger.error(f"Submitting a {provider} batch of {len(provider_calls)} calls failed, "
+                         f"making them in real time: {e}")
+            continue
+        metrics.AI_BATCH_CALLS_TOTAL.labels(provider, "submitted").inc(len(provider_calls))
+        await asyncio.to_thread(jobs.add_provider_batch, batch_id, provider, list(by_job), BATCH_POLL_MIN_SECONDS)
+
+
+async def poll_provider_batches():
+    """Check the provider batches that are due, storing the results of those that have ended"""
+    for batch in await asyncio.to_thread(jobs.due_provider_batches):
+        # Each check doubles the wait until the next one, up to BATCH_POLL_MAX_SECONDS
+        interval = min(batch.interval * 2, BATCH_POLL_MAX_SECONDS)
+        if not await asyncio.to_thread(jobs.claim_provider_batch, batch, interval):
+            continue
+        try:
+            if not await message_batch_ended(batch.provider, batch.id):
+                continue
+            results: dict = {}
+            async for custom_id, text in iter_message_batch_results(batch.provider, batch.id):
+                job_id, _, index = custom_id.rpartition("-")
+                results.setdefault(job_id, {})[int(index)] = text
+                metrics.AI_BATCH_CALLS_TOTAL.labels(batch.provider, "succeeded" if text else "failed").inc()
+            await asyncio.to_thread(jobs.save_results, batch.id, results)
+            logger.info(f"{batch.provider} batch {batch.id} ended after {jobs.clock() - batch.submitted:.0f}s")
+        except Exception as e:
+            logger.warning(f"Checking {batch.provider} batch {batch.id} failed: {e}")
+
+
+async def assemble_batch_job(job: Job):
+    """
+    Build a batch job's test from its provider batch results
+
+    Calls that failed or were never sent, and questions that fail validation
+    or repeat another, are made up with real-time calls (generate_batch), so
+    a job does not wait for another provider batch.
+    """
+    request = job_request(job)
+    batches = plan_job_batches(request)
+    responses = await asyncio.to_thread(jobs.results, job.id)
+    seen = DuplicateFilter()
+    completed = {}
+    for index in range(len(batches)):
+        completed[index] = []
+        if not responses.get(index):
+            continue
+        try:
+            report = validate_questions(parse_ai_response(responses[index]))
+        except ValueError as e:
+            metrics.PARSE_FAILURES_TOTAL.labels(reason="invalid_json").inc()
+            logger.warning(f"Job {job.id} batch {index}: unreadable response ({e})")
+            continue
+        completed[index] = [q for q in report.questions if seen.add(q.question) is None]
+
+    async def make_up(index: int, distribution: dict):
+        completed[index].extend(await generate_batch(request, batches[index]._replace(distribution=distribution), seen))
+
+    shortfalls = {index: shortfall_distribution(batches[index].distribution, completed[index]) for index in completed}
+    shortfalls = {index: distribution for index, distribution in shortfalls.items() if distribution}
+    try:
+        if shortfalls:
+            logger.info(f"Job {job.id}: making up {sum(sum(d.values()) for d in shortfalls.values())} questions "
+                        f"in real time")
+            semaphore = asyncio.Semaphore(GENERATION_BATCH_CONCURRENCY)
+
+            async def limited(index: int, distribution: dict):
+                async with semaphore:
+                    await make_up(index, distribution)
+
+            await asyncio.gather(*(limited(index, distribution) for index, distribution in shortfalls.items()))
+        await complete_job(job, request, merge_routed_questions(batches, completed))
+    except Exception as e:
+        await fail_job(job, e)
+
+
+_realtime_jobs: set = set()
+
+
+async def process_jobs():
+    """One pass of the job worker: start queued jobs, poll due provider batches, assemble ended ones"""
+    await asyncio.to_thread(jobs.requeue_stale)
+
+    free = JOB_REALTIME_CONCURRENCY - len(_realtime_jobs)
+    if free > 0:
+        for job in await asyncio.to_thread(jobs.with_status, "queued", "realtime", free):
+            if await asyncio.to_thread(jobs.claim, job.id, "queued", "running"):
+                task = asyncio.ensure_future(run_realtime_job(job))
+                _realtime_jobs.add(task)
+                task.add_done_callback(_realtime_jobs.discard)
+
+    await submit_batch_jobs()
+    await poll_provider_batches()
+    for job in await asyncio.to_thread(jobs.with_status, "submitted", "batch"):
+        if await asyncio.to_thread(jobs.pending_provider_batches, job.id) == 0 and \
+                await asyncio.to_thread(jobs.claim, job.id, "submitted", "finishing"):
+            with span("job_assemble"):
+                await assemble_batch_job(job)
+
+
+_job_worker: Optional[asyncio.Task] = None
+
+
+async def job_worker():
+    pruned = float("-inf")
+    while True:
+        try:
+            await process_jobs()
+        except Exception as e:
+            logger.error(f"Job worker pass failed: {e}")
+        # Expired checkpoints are cleaned up here rather than on the request path
+        if time.monotonic() - pruned >= CHECKPOINT_PRUNE_INTERVAL_SECONDS:
+            pruned = time.monotonic()
+            await asyncio.to_thread(checkpoints.prune)
+        await asyncio.sleep(JOB_WORKER_INTERVAL_SECONDS)
+
+
+def start_job_worker():
+    """
+    Run the job worker in this process (on startup, and on job requests for hosts without startup events)
+
+    The worker gets a fresh context: started from a request, it would
+    otherwise inherit that request's trace and add every job's spans to it.
+    On serverless hosts (Vercel) the process is frozen between invocations,
+    so queued jobs only make progress while requests (such as polling
+    GET /jobs/{id}) are being served.
+    """
+    global _job_worker
+    if _job_worker is None or _job_worker.done():
+        _job_worker = asyncio.get_running_loop().create_task(job_worker(), context=contextvars.Context())
+
+
+async def queue_job(current_user: dict, request: GenerateTestRequest, delivery: str,
+                    notify_url: Optional[str]) -> Job:
+    job = await asyncio.to_thread(jobs.create, current_user["id"], current_user.get("tier", "free"),
+                                  request.model_dump(), delivery, notify_url)
+    metrics.GENERATION_JOBS_TOTAL.labels(job.delivery, "queued").inc()
+    logger.info(f"Queued {job.delivery} job {job.id} for user {current_user['id']}")
+    start_job_worker()
+    return job
+
+
+@generator_router.post("/jobs", status_code=202)
+async def create_job(body: GenerationJobRequest, current_user: dict = Depends(rate_limited_user)):
+    """
+    Queue a test for generation in the background
+
+    The finished test is saved to the history: poll GET /jobs/{id} (or pass
+    notify_url) for the entry to download. delivery "batch" trades speed for
+    price - results within hours at about half the AI cost.
+    """
+    validate_generate_request(body.request)
+    if body.notify_url is not None:
+        try:
+            await check_notify_url(body.notify_url)
+        except ValueError as e:
+            logger.warning(f"Rejected notify_url {body.notify_url}: {e}")
+            raise HTTPException(status_code=400, detail=ERROR_MESSAGES["invalid_notify_url"])
+
+    return job_to_dict(await queue_job(current_user, body.request, body.delivery, body.notify_url))
+
+
+@generator_router.get("/jobs")
+async def list_jobs(limit: int = Query(50, ge=1, le=200), current_user: dict = Depends(get_current_user)):
+    """List the user's generation jobs, newest first"""
+    start_job_worker()
+    return {"jobs": [job_to_dict(job) for job in await asyncio.to_thread(jobs.list, current_user["id"], limit)]}
+
+
+@generator_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Status of a generation job, with the history download once it has completed"""
+    start_job_worker()
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None or job.user_id != current_user["id"]:
+        raise HTTPException(status_code=404, detail=ERROR_MESSAGES["job_not_found"])
+    return job_to_dict(job)
+
+
+def csv_filename(working_title: str) -> str:
+    safe_title = "".join(c for c in working_title if c.isalnum() or c in (' ', '-', '_')).strip()
     safe_title = safe_title.replace(' ', '_')
-    filename = f"{safe_title}_practice_test.csv"
+    return f"{safe_title}_practice_test.csv"
+
+
+def iter_file(file: BinaryIO, chunk_size: int = CSV_CHUNK_SIZE):
+    """Yield a file in chunks for a StreamingResponse, closing it at the end"""
+    try:
+        while chunk := file.read(chunk_size):
+            yield chunk
+    finally:
+        file.close()
+
+
+def csv_download_response(request: GenerateTestRequest, content: Union[bytes, Iterable[bytes]],
+                          replayed: bool = False, headers: Optional[dict] = None) -> StreamingResponse:
+    """Stream a generated test as a CSV file download"""
+    filename = csv_filename(request.working_title)
 
     logger.info(f"Returning CSV file: {filename}")
 
     # Return as downloadable file
     return StreamingResponse(
-        io.BytesIO(csv_content.encode('utf-8')),
+        iter_chunks(content) if isinstance(content, bytes) else content,
         media_type="text/csv",
         headers={
-            "Content-Disposition": f"attachment; filename={filename}"
+            "Content-Disposition": f"attachment; filename={filename}",
+            **({"Idempotent-Replayed": "true"} if replayed else {}),
+            **(headers or {})
         }
     )
-
-
@@ -0,0 +1,331 @@
+# generator/services.py - AI provider clients and calls
+import os
+import time
+import asyncio
+import random
+import threading
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+from config import (
+    AI_MODEL, AI_MAX_TOKENS, AI_TEMPERATURE, AI_PROVIDER, AI_MAX_RETRIES,
+    DEEPSEEK_BASE_URL, FAKE_PROVIDER_URL, FAKE_PROVIDER_API,
+    CLAUDE_MODEL, CLAUDE_MAX_TOKENS, DEEPSEEK_MODEL, DEEPSEEK_MAX_TOKENS, FAKE_MODEL, FAKE_MAX_TOKENS,
+    MODEL_ROUTING_ENABLED, MODEL_ROUTES, AI_MODEL_PRICING, AI_FAST_MODEL, AI_FAST_MODEL_SPEED, PREVIEW_MAX_TOKENS, BATCH_PRICE_FACTOR
+)
+from utils.logging_config import get_logger
+from utils import metrics
+from utils.tracing import span
+
+# Setup logging
+logger = get_logger("generator.services")
+
+SYSTEM_PROMPT = "You are an expert educational content creator specializing in creating high-quality Udemy practice test questions."
+
+# Per-provider defaults for routes that only name a provider
+PROVIDER_MODELS = {"claude": CLAUDE_MODEL, "deepseek": DEEPSEEK_MODEL, "fake": FAKE_MODEL}
+PROVIDER_MAX_TOKENS = {"claude": CLAUDE_MAX_TOKENS, "deepseek": DEEPSEEK_MAX_TOKENS, "fake": FAKE_MAX_TOKENS}
+
+
+class ModelRoute(NamedTuple):
+    """Provider, model and sampling settings used for a group of questions"""
+    name: str
+    provider: str
+    model: str
+    temperature: float
+    max_tokens: int
+    relative_speed: float = 1.0  # Output speed relative to AI_MODEL, for batch planning
+
+
+DEFAULT_ROUTE = ModelRoute("default", AI_PROVIDER, AI_MODEL, AI_TEMPERATURE, AI_MAX_TOKENS)
+
+# Previews: a few questions on the fast model with a small output budget
+PREVIEW_ROUTE = ModelRoute("preview", AI_PROVIDER, AI_FAST_MODEL, AI_TEMPERATURE, PREVIEW_MAX_TOKENS,
+                           AI_FAST_MODEL_SPEED)
+
+
+class Prompt(str):
+    """
+    Prompt text whose first prefix_length characters are shared with other calls
+
+    The shared prefix (course context and fixed instructions) comes first so
+    providers can reuse it from their prompt cache: DeepSeek and OpenAI cache
+    common prefixes automatically, Claude is asked to with cache_control.
+    Plain str prompts are sent without a cache breakpoint.
+    """
+    prefix_length: int
+
+    def __new__(cls, prefix: str, rest: str) -> "Prompt":
+        prompt = super().__new__(cls, prefix + rest)
+        prompt.prefix_length = len(prefix)
+        return prompt
+
+
+class Completion(str):
+    """
+    Response text of an AI call with its token usage and duration
+
+    generator.estimator learns output tokens per question and call time from
+    these; anything that only needs the text can treat it as a str.
+    """
+    prompt_tokens: int
+    completion_tokens: int
+    seconds: float
+
+    def __new__(cls, text: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                seconds: float = 0.0) -> "Completion":
+        completion = super().__new__(cls, text)
+        completion.prompt_tokens = prompt_tokens
+        completion.completion_tokens = completion_tokens
+        completion.seconds = seconds
+        return completion
+
+
+def _claude_content(prompt: str):
+    """User message content for the messages API, with a cache breakpoint after a Prompt's shared prefix"""
+    split = getattr(prompt, "prefix_length", 0)
+    if not split:
+        return prompt
+    return [
+        {"type": "text", "text": prompt[:split], "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": prompt[split:]},
+    ]
+
+
+def resolve_route(question_type: str, difficulty_level: str) -> ModelRoute:
+    """Return the first MODEL_ROUTES entry matching a question type and difficulty"""
+    if not MODEL_ROUTING_ENABLED:
+        return DEFAULT_ROUTE
+
+    for rule in MODEL_ROUTES:
+        if question_type not in rule.get("question_types", [question_type]):
+            continue
+        if difficulty_level not in rule.get("difficulty_levels", [difficulty_level]):
+            continue
+        provider = rule.get("provider", AI_PROVIDER)
+        same_provider = provider == AI_PROVIDER
+        return ModelRoute(
+            name=rule.get("name", "default"),
+            provider=provider,
+            model=rule.get("model", AI_MODEL if same_provider else PROVIDER_MODELS[provider]),
+            temperature=rule.get("temperature", AI_TEMPERATURE),
+            max_tokens=rule.get("max_tokens", AI_MAX_TOKENS if same_provider else PROVIDER_MAX_TOKENS[provider]),
+            relative_speed=rule.get("relative_speed", 1.0),
+        )
+    return DEFAULT_ROUTE
+
+
+def uses_chat_completions_api(provider: str) -> bool:
+    """Providers that speak the OpenAI chat-completions API (the rest use the Anthropic messages API)"""
+    return provider == "deepseek" or (provider == "fake" and FAKE_PROVIDER_API == "openai")
+
+
+# The SDKs are slow to import, so each provider's client is only created
+# on its first AI call (not on every serverless cold start)
+_clients: Dict[str, object] = {}
+_client_lock = threading.Lock()
+
+
+def get_ai_client(provider: str = AI_PROVIDER):
+    """Return the AI client for a provider, creating it on first use"""
+    client = _clients.get(provider)
+    if client is not None:
+        return client
+
+    with _client_lock:
+        if provider not in _clients:
+            # SDK-level retries are disabled so that retries (and 429s) are visible in our metrics
+            if provider == "deepseek":
+                from openai import AsyncOpenAI
+                client = AsyncOpenAI(
+                    api_key=os.getenv("DEEPSEEK_API_KEY"),
+                    base_url=DEEPSEEK_BASE_URL,
+                    max_retries=0
+                )
+            elif provider == "fake":
+                # Local stand-in server, speaks either API depending on FAKE_PROVIDER_API
+                if FAKE_PROVIDER_API == "openai":
+                    from openai import AsyncOpenAI
+                    client = AsyncOpenAI(api_key="fake", base_url=f"{FAKE_PROVIDER_URL}/v1", max_retries=0)
+                else:
+                    from anthropic import AsyncAnthropic
+                    client = AsyncAnthropic(api_key="fake", base_url=FAKE_PROVIDER_URL, max_retries=0)
+            else:
+                from anthropic import AsyncAnthropic
+                client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), max_retries=0)
+            _clients[provider] = client
+            logger.info(f"Initialized {provider} client")
+    return _clients[provider]
+
+
+def _provider_errors(provider: str):
+    """Return (transient errors worth retrying, rate-limit error) for a provider's SDK"""
+    if uses_chat_completions_api(provider):
+        import openai as sdk
+    else:
+        import anthropic as sdk
+    return (sdk.APIConnectionError, sdk.RateLimitError, sdk.InternalServerError), sdk.RateLimitError
+
+
+def _record_token_usage(route: ModelRoute, prompt_tokens: int, completion_tokens: int, cached_tokens: int,
+                        price_factor: float = 1.0):
+    """Add token usage (and its cost, times price_factor) of one AI call to the counters"""
+    tokens = metrics.AI_TOKENS_TOTAL
+    tokens.labels(route.provider, route.model, "prompt").inc(prompt_tokens or 0)
+    tokens.labels(route.provider, route.model, "completion").inc(completion_tokens or 0)
+    tokens.labels(route.provider, route.model, "cached").inc(cached_tokens or 0)
+
+    input_price, output_price = AI_MODEL_PRICING.get(route.model, (0.0, 0.0))
+    cost = ((prompt_tokens or 0) * input_price + (completion_tokens or 0) * output_price) * price_factor / 1_000_000
+    metrics.AI_COST_USD_TOTAL.labels(route.provider, route.model).inc(cost)
+
+
+async def _stream_completion(prompt: str, route: ModelRoute, on_first_token) -> Completion:
+    """Stream a completion for a route and return the full text with its token usage"""
+    client = get_ai_client(route.provider)
+    chunks = []
+    prompt_tokens = completion_tokens = 0
+
+    if uses_chat_completions_api(route.provider):
+        # DeepSeek (and the fake provider by default) use the OpenAI-compatible API
+        stream = await client.chat.completions.create(
+            model=route.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=route.max_tokens,
+            temperature=route.temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        usage = None
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not chunks:
+                    on_first_token()
+                chunks.append(chunk.choices[0].delta.content)
+            if chunk.usage:
+                usage = chunk.usage
+
+        if usage:
+            # DeepSeek reports cache hits as prompt_cache_hit_tokens, OpenAI as prompt_tokens_details
+            cached = getattr(usage, "prompt_cache_hit_tokens", None)
+            if cached is None and usage.prompt_tokens_details:
+                cached = usage.prompt_tokens_details.cached_tokens
+            _record_token_usage(route, usage.prompt_tokens, usage.completion_tokens, cached)
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+            logger.debug(f"{route.provider} response received, tokens used: {usage.prompt_tokens + usage.completion_tokens}")
+    else:
+        # Claude API
+        async with client.messages.stream(
+            model=route.model,
+            max_tokens=route.max_tokens,
+            temperature=route.temperature,
+            messages=[
+                {"role": "user", "content": _claude_content(prompt)}
+            ]
+        ) as stream:
+            async for text in stream.text_stream:
+                if not chunks:
+                    on_first_token()
+                chunks.append(text)
+            usage = (await stream.get_final_message()).usage
+
+        _record_token_usage(route, usage.input_tokens, usage.output_tokens,
+                            getattr(usage, "cache_read_input_tokens", 0))
+        prompt_tokens, completion_tokens = usage.input_tokens, usage.output_tokens
+        logger.debug(f"{route.provider} response received, tokens used: {usage.input_tokens + usage.output_tokens}")
+
+    return Completion("".join(chunks).strip(), prompt_tokens, completion_tokens)
+
+
+async def call_ai(prompt: str, route: ModelRoute = DEFAULT_ROUTE) -> Completion:
+    """Call the AI provider for a route, retrying transient errors with backoff"""
+    with span("ai_call", provider=route.provider, model=route.model), metrics.AI_CALLS_IN_FLIGHT.track_inprogress():
+        return await _call_ai_with_retries(prompt, route)
+
+
+async def _call_ai_with_retries(prompt: str, route: ModelRoute) -> Completion:
+    retryable_errors, rate_limit_error = _provider_errors(route.provider)
+    provider, model = route.provider, route.model
+
+    for attempt in range(AI_MAX_RETRIES + 1):
+        start = time.perf_counter()
+
+        def on_first_token():
+            metrics.AI_TIME_TO_FIRST_TOKEN_SECONDS.labels(provider, model).observe(time.perf_counter() - start)
+
+        try:
+            response = await _stream_completion(prompt, route, on_first_token)
+            response.seconds = time.perf_counter() - start
+            metrics.AI_REQUEST_SECONDS.labels(provider, model).observe(response.seconds)
+            return response
+        except retryable_errors as e:
+            if isinstance(e, rate_limit_error):
+                metrics.AI_RATE_LIMITED_TOTAL.labels(provider, model).inc()
+            if attempt == AI_MAX_RETRIES:
+                raise
+            metrics.AI_RETRIES_TOTAL.labels(provider, model).inc()
+            delay = 0.5 * (2 ** attempt) + random.uniform(0, 0.25)
+            logger.warning(f"{provider} call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+# ==================== BATCH API ====================
+
+def supports_message_batches(provider: str) -> bool:
+    """Providers with a batch API for non-urgent calls (Anthropic Message Batches, or the fake stand-in)"""
+    return provider in ("claude", "fake")
+
+
+def get_batch_client(provider: str):
+    """Messages API client for a provider's batch calls (the fake provider serves batches on either API setting)"""
+    if provider != "fake" or FAKE_PROVIDER_API != "openai":
+        return get_ai_client(provider)
+    with _client_lock:
+        if "fake-batches" not in _clients:
+            from anthropic import AsyncAnthropic
+            _clients["fake-batches"] = AsyncAnthropic(api_key="fake", base_url=FAKE_PROVIDER_URL, max_retries=0)
+    return _clients["fake-batches"]
+
+
+async def submit_message_batch(provider: str, calls: List[Tuple[str, str, ModelRoute]]) -> str:
+    """Submit (custom id, prompt, route) calls as one provider batch and return its id"""
+    client = get_batch_client(provider)
+    requests = [
+        {
+            "custom_id": custom_id,
+            "params": {
+                "model": route.model,
+                "max_tokens": route.max_tokens,
+                "temperature": route.temperature,
+                "messages": [{"role": "user", "content": _claude_content(prompt)}],
+            },
+        }
+        for custom_id, prompt, route in calls
+    ]
+    with span("ai_batch_submit", provider=provider, calls=len(requests)):
+        batch = await client.beta.messages.batches.create(requests=requests)
+    logger.info(f"Submitted {provider} batch {batch.id} with {len(requests)} calls")
+    return batch.id
+
+
+async def message_batch_ended(provider: str, batch_id: str) -> bool:
+    batch = await get_batch_client(provider).beta.messages.batches.retrieve(batch_id)
+    return batch.processing_status == "ended"
+
+
+async def iter_message_batch_results(provider: str, batch_id: str) -> AsyncIterator[Tuple[str, Optional[str]]]:
+    """Yield (custom id, response text or None if the call failed) for an ended batch, recording token usage"""
+    results = await get_batch_client(provider).beta.messages.batches.results(batch_id)
+    async for item in results:
+        if item.result.type != "succeeded":
+            logger.warning(f"Batch {batch_id} call {item.custom_id} {item.result.type}")
+            yield item.custom_id, None
+            continue
+        message = item.result.message
+        usage = message.usage
+        _record_token_usage(ModelRoute("batch", provider, message.model, 0.0, 0), usage.input_tokens,
+                            usage.output_tokens, getattr(usage, "cache_read_input_tokens", 0), BATCH_PRICE_FACTOR)
+        yield item.custom_id, "".join(block.text for block in message.content if block.type == "text").strip()
@@ -0,0 +1,342 @@
+# generator/validation.py - Rule-based validation and auto-repair of generated questions
+"""
+A single pass over the questions parsed from an AI response.
+
+Problems with one deterministic fix are repaired in place:
+    question_type        spellings like "multiple_choice" or "Multi Select" normalized
+    is_correct           "true" / 1 coerced to a bool
+    whitespace           text fields stripped
+    duplicate_option     repeated options (same text and is_correct) removed
+    true_false_case      True/false options written as TRUE / FALSE
+    extra_options        wrong options beyond UDEMY_LIMITS["max_answers"] dropped
+    explanation_length   over-long explanations cut after the last sentence that fits
+
+Everything else - a multiple-choice with no or several correct answers, a
+multi-select with one, over-long question or option text, a missing
+overall_explanation or answer explanation - is rejected with its reasons,
+so only those questions have to be regenerated. (Explanations that are
+present but blank, as in imported CSVs, are kept.)
+
+In two-phase generation, stems (questions, options and correct answers)
+are validated without explanations, which apply_explanations fills in later
+with the same repairs.
+
+DuplicateFilter catches questions a test already has (generated earlier in
+the run, or imported), comparing fingerprints of the normalized question text.
+"""
+
+import hashlib
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from config import UDEMY_LIMITS, AVOID_PROMPT_EXAMPLES
+from generator.models import Answer, Question
+from utils import metrics
+
+MULTIPLE_CHOICE = "multiple-choice"
+MULTI_SELECT = "multi-select"
+
+QUESTION_TYPE_ALIASES = {
+    "multiple-choice": MULTIPLE_CHOICE,
+    "single-choice": MULTIPLE_CHOICE,
+    "single-select": MULTIPLE_CHOICE,
+    "scenario-based": MULTIPLE_CHOICE,
+    "true-false": MULTIPLE_CHOICE,
+    "true-or-false": MULTIPLE_CHOICE,
+    "mc": MULTIPLE_CHOICE,
+    "multi-select": MULTI_SELECT,
+    "multiple-select": MULTI_SELECT,
+    "multiselect": MULTI_SELECT,
+    "multiple-response": MULTI_SELECT,
+    "multiple-answer": MULTI_SELECT,
+}
+
+BOOLEAN_STRINGS = {"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}
+
+SENTENCE_ENDS = (". ", "! ", "? ", ".\n", "!\n", "?\n")
+
+
+class Rejection(NamedTuple):
+    """A question that could not be repaired"""
+    index: int  # Position in the AI response
+    question: Any
+    reasons: List[str]
+
+
+class ValidationReport(NamedTuple):
+    questions: List[Question]  # Valid (possibly repaired) questions, in response order
+    rejected: List[Rejection]
+    repairs: Dict[str, int]  # Repair rule -> number of times applied
+
+
+def question_kind(question: Question) -> str:
+    """Distribution type of a validated question (true_false, multiple_select or multiple_choice)"""
+    if question.question_type == MULTI_SELECT:
+        return "multiple_select"
+    if [answer.text for answer in question.answers] in (["TRUE", "FALSE"], ["FALSE", "TRUE"]):
+        return "true_false"
+    return "multiple_choice"
+
+
+def question_fingerprint(text: str) -> bytes:
+    """8-byte key that is equal for question texts differing only in case, spacing or punctuation"""
+    normalized = " ".join("".join(c for c in text.casefold() if c.isalnum() or c.isspace()).split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+
+
+class DuplicateFilter:
+    """
+    Fingerprints of the questions a test already has
+
+    Holds 8 bytes per question plus the first AVOID_PROMPT_EXAMPLES question
+    texts, which prompts quote so the AI does not repeat them.
+    """
+
+    def __init__(self):
+        self._positions: Dict[bytes, int] = {}
+        self.examples: List[str] = []
+
+    def __len__(self):
+        return len(self._positions)
+
+    def add(self, text: str, position: int = 0) -> Optional[int]:
+        """Record a question; if it duplicates an earlier one, return that one's position instead"""
+        key = question_fingerprint(text)
+        earlier = self._positions.get(key)
+        if earlier is not None:
+            return earlier
+        self._positions[key] = position
+        if len(self.examples) < AVOID_PROMPT_EXAMPLES:
+            self.examples.append(text)
+        return None
+
+
+def _clean_text(value: Any, repairs: Dict[str, int]) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    cleaned = value.strip()
+    if cleaned != value:
+        repairs["whitespace"] += 1
+    return cleaned
+
+
+def _trim_to_sentence(text: str, limit: int) -> Optional[str]:
+    """Cut text after the last complete sentence within limit, or None if there is none"""
+    if text[:limit].rstrip().endswith((".", "!", "?")):
+        return text[:limit].rstrip()
+    cut = max(text.rfind(end, 0, limit) for end in SENTENCE_ENDS)
+    return text[:cut + 1] if cut > 0 else None
+
+
+def _repair_explanation(text: str, limit: int, repairs: Dict[str, int], reasons: List[str]) -> str:
+    if len(text) <= limit:
+        return text
+    trimmed = _trim_to_sentence(text, limit)
+    if trimmed is None:
+        reasons.append("explanation_too_long")
+        return text
+    repairs["explanation_length"] += 1
+    return trimmed
+
+
+def _repair_question(raw: Any, repairs: Dict[str, int],
+                     explanations: bool = True) -> Tuple[Optional[Question], List[str]]:
+    """Return (repaired question, []) or (None, reasons it cannot be repaired)"""
+    if not isinstance(raw, dict):
+        return None, ["not_an_object"]
+
+    reasons: List[str] = []
+    text = _clean_text(raw.get("question"), repairs)
+    if not text:
+        reasons.append("missing_question")
+    elif len(text) > UDEMY_LIMITS["question_max_length"]:
+        reasons.append("question_too_long")
+
+    question_type = raw.get("question_type")
+    normalized = None
+    if isinstance(question_type, str):
+        normalized = QUESTION_TYPE_ALIASES.get("-".join(question_type.strip().lower().replace("_", " ").split()))
+    if normalized is None:
+        reasons.append("unknown_question_type")
+    elif normalized != question_type:
+        repairs["question_type"] += 1
+
+    # Stems come without explanations; everywhere else a missing one means the question is incomplete
+    overall = _clean_text(raw.get("overall_explanation", None if explanations else ""), repairs)
+    if overall is None:
+        reasons.append("missing_overall_explanation")
+    else:
+        overall = _repair_explanation(overall, UDEMY_LIMITS["overall_explanation_max_length"], repairs, reasons)
+
+    domain = _clean_text(raw.get("domain", ""), repairs) or ""
+
+    answers: List[Answer] = []
+    correct: List[bool] = []
+    seen: Dict[str, bool] = {}
+    raw_answers = raw.get("answers")
+    for raw_answer in raw_answers if isinstance(raw_answers, list) else []:
+        if not isinstance(raw_answer, dict):
+            reasons.append("invalid_answer")
+            continue
+        answer_text = _clean_text(raw_answer.get("text"), repairs)
+
+        is_correct = raw_answer.get("is_correct")
+        if not isinstance(is_correct, bool):
+            is_correct = BOOLEAN_STRINGS.get(str(is_correct).strip().lower())
+            if is_correct is not None:
+                repairs["is_correct"] += 1
+
+        if not answer_text or is_correct is None:
+            reasons.append("invalid_answer")
+            continue
+        if len(answer_text) > UDEMY_LIMITS["answer_max_length"]:
+            reasons.append("answer_too_long")
+
+        key = answer_text.casefold()
+        if key in seen:
+            if seen[key] != is_correct:
+                reasons.append("conflicting_duplicate_options")
+            else:
+                repairs["duplicate_option"] += 1
+            continue
+        seen[key] = is_correct
+
+        explanation = raw_answer.get("explanation")
+        if explanation is None:
+            if explanations:
+                reasons.append("missing_explanation")
+            explanation = ""
+        explanation = _clean_text(explanation, repairs)
+        if explanation is None:
+            reasons.append("invalid_answer")
+            continue
+        explanation = _repair_explanation(explanation, UDEMY_LIMITS["explanation_max_length"], repairs, reasons)
+
+        answers.append(Answer(answer_text, explanation))
+        correct.append(is_correct)
+
+    if len(answers) == 2 and {answer.text.lower() for answer in answers} == {"true", "false"}:
+        if any(answer.text not in ("TRUE", "FALSE") for answer in answers):
+            for answer in answers:
+                answer.text = answer.text.upper()
+            repairs["true_false_case"] += 1
+
+    max_answers = UDEMY_LIMITS["max_answers"]
+    if len(answers) > max_answers:
+        # Drop wrong options from the end; the question stays answerable as long as every correct one fits
+        surplus = len(answers) - max_answers
+        wrong = [i for i, is_correct in enumerate(correct) if not is_correct]
+        if len(wrong) - surplus >= 1:
+            dropped = set(wrong[-surplus:])
+            answers = [answer for i, answer in enumerate(answers) if i not in dropped]
+            correct = [is_correct for i, is_correct in enumerate(correct) if i not in dropped]
+            repairs["extra_options"] += 1
+        else:
+            reasons.append("too_many_options")
+
+    if len(answers) < UDEMY_LIMITS["min_answers"]:
+        reasons.append("too_few_options")
+
+    correct_count = sum(correct)
+    if correct_count == 0:
+        reasons.append("no_correct_answer")
+    elif normalized == MULTIPLE_CHOICE and correct_count > 1:
+        reasons.append("multiple_correct_answers")
+    elif normalized == MULTI_SELECT and correct_count == 1:
+        reasons.append("single_correct_answer")
+    elif normalized == MULTI_SELECT and correct_count == len(answers):
+        reasons.append("all_answers_correct")
+
+    if reasons:
+        return None, list(dict.fromkeys(reasons))
+    mask = sum(1 << i for i, is_correct in enumerate(correct) if is_correct)
+    return Question(text, normalized, answers, mask, overall, domain), []
+
+
+def validate_questions(questions: List[Any], explanations: bool = True) -> ValidationReport:
+    """
+    Repair what can be repaired and reject the rest, in one pass over the raw (parsed JSON) questions
+
+    With explanations=False the questions are stems, expected to come
+    without explanations (see apply_explanations).
+    """
+    valid: List[Question] = []
+    rejected: List[Rejection] = []
+    repairs: Dict[str, int] = Counter()
+
+    for index, raw in enumerate(questions):
+        question, reasons = _repair_question(raw, repairs, explanations)
+        if question is None:
+            rejected.append(Rejection(index, raw, reasons))
+            for reason in reasons:
+                metrics.QUESTIONS_REJECTED_TOTAL.labels(reason).inc()
+        else:
+            valid.append(question)
+
+    for rule, count in repairs.items():
+        metrics.QUESTION_REPAIRS_TOTAL.labels(rule).inc(count)
+    return ValidationReport(valid, rejected, dict(repairs))
+
+
+def _explanation_item_ids(items: List[Any]) -> Dict[int, dict]:
+    """Explanation objects by their 1-based "id" (their position when it is missing or unreadable)"""
+    by_id: Dict[int, dict] = {}
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        try:
+            key = int(item.get("id", position + 1))
+        except (TypeError, ValueError):
+            key = position + 1
+        by_id.setdefault(key, item)
+    return by_id
+
+
+def apply_explanations(questions: List[Question], items: List[Any]) -> List[Question]:
+    """
+    Fill stem-only questions' explanations from a parsed explanation response
+
+    The item with "id" i + 1 belongs to questions[i] and holds
+    answer_explanations (one per answer, in order) and overall_explanation.
+    A question is only changed when all of its explanations pass; the ones
+    that do not are returned, to be asked for again.
+    """
+    repairs: Dict[str, int] = Counter()
+    by_id = _explanation_item_ids(items)
+    unexplained: List[Question] = []
+
+    for position, question in enumerate(questions):
+        item = by_id.get(position + 1, {})
+        reasons: List[str] = []
+
+        overall = _clean_text(item.get("overall_explanation"), repairs)
+        if not overall:
+            reasons.append("missing_overall_explanation")
+        else:
+            overall = _repair_explanation(overall, UDEMY_LIMITS["overall_explanation_max_length"], repairs, reasons)
+
+        raw_explanations = item.get("answer_explanations")
+        if not isinstance(raw_explanations, list):
+            raw_explanations = []
+        explanations: List[str] = []
+        for index in range(len(question.answers)):
+            explanation = raw_explanations[index] if index < len(raw_explanations) else None
+            explanation = _clean_text(explanation, repairs)
+            if explanation is None:
+                reasons.append("missing_explanation")
+                continue
+            explanations.append(_repair_explanation(explanation, UDEMY_LIMITS["explanation_max_length"],
+                                                    repairs, reasons))
+
+        if reasons:
+            unexplained.append(question)
+            for reason in dict.fromkeys(reasons):
+                metrics.QUESTIONS_REJECTED_TOTAL.labels(reason).inc()
+            continue
+        question.overall_explanation = overall
+        for answer, explanation in zip(question.answers, explanations):
+            answer.explanation = explanation
+
+    for rule, count in repairs.items():
+        metrics.QUESTION_REPAIRS_TOTAL.labels(rule).inc(count)
+    return unexplained
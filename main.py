@@ -1,18 +1,22 @@
 # main.py - FastAPI Application with Auth, Billing, and Test Generation
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
 # Import routers
 from auth.routes import auth_router
 from billing.routes import billing_router
-from generator.routes import generator_router
+from generator.routes import generator_router, start_job_worker
 
 # Import config
 from config import APP_NAME, APP_DESCRIPTION, APP_VERSION
+from utils.metrics import REGISTRY, CONTENT_TYPE_LATEST
+from utils.tracing import TracingMiddleware
+from utils.compression import CompressionMiddleware
+from utils.page_cache import PageCache
+from utils.assets import AssetManifest
 
 # Initialize FastAPI app with enhanced metadata
 app = FastAPI(
@@ -59,11 +63,29 @@ app = FastAPI(
     ]
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Background generation jobs (the job endpoints also start the worker, for hosts without startup events)
+app.add_event_handler("startup", start_job_worker)
 
-# Templates
+# Streaming brotli/gzip compression for CSV downloads and JSON responses
+app.add_middleware(CompressionMiddleware)
+
+# Per-request tracing spans (adds a Server-Timing header)
+app.add_middleware(TracingMiddleware)
+
+# Static files are referenced by content-hashed URLs via the asset_url() template helper
+assets = AssetManifest()
+
+# Templates (pages are rendered once and served from memory with ETags)
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = assets.url
+pages = PageCache(templates)
+
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_asset(request: Request, path: str):
+    """Serve a static file (immutable when requested by its fingerprinted URL)"""
+    return assets.response(request, path)
+
 
 # Register routers
 app.include_router(auth_router, tags=["Authentication"])
@@ -78,7 +100,7 @@ async def landing_page(request: Request):
 
     Homepage with product information, features, and demo examples.
     """
-    return templates.TemplateResponse("index.html", {"request": request})
+    return pages.response(request, "index.html")
 
 
 @app.get("/app", response_class=HTMLResponse, tags=["Pages"])
@@ -89,7 +111,7 @@ async def app_page(request: Request):
     Main application page for generating practice test questions.
     Requires authentication.
     """
-    return templates.TemplateResponse("app.html", {"request": request})
+    return pages.response(request, "app.html")
 
 
 @app.get("/pro", response_class=HTMLResponse, tags=["Pages"])
@@ -99,7 +121,7 @@ async def pro_page(request: Request):
 
     View subscription plans and upgrade options (Free, Pro, Business).
     """
-    return templates.TemplateResponse("pro.html", {"request": request})
+    return pages.response(request, "pro.html")
 
 
 @app.get("/login", response_class=HTMLResponse, tags=["Pages"])
@@ -109,7 +131,7 @@ async def login_page(request: Request):
 
     User authentication page with email/password and Google OAuth.
     """
-    return templates.TemplateResponse("login.html", {"request": request})
+    return pages.response(request, "login.html")
 
 
 @app.get("/register", response_class=HTMLResponse, tags=["Pages"])
@@ -119,7 +141,7 @@ async def register_page(request: Request):
 
     Create a new user account with email verification.
     """
-    return templates.TemplateResponse("register.html", {"request": request})
+    return pages.response(request, "register.html")
 
 
 @app.get("/verify-email", response_class=HTMLResponse, tags=["Pages"])
@@ -129,7 +151,7 @@ async def verify_email_page(request: Request):
 
     Shows email verification instructions and resend options.
     """
-    return templates.TemplateResponse("verify-email.html", {"request": request})
+    return pages.response(request, "verify-email.html")
 
 
 @app.get("/health", tags=["System"])
@@ -144,3 +166,13 @@ async def health_check():
         "app": APP_NAME,
         "version": APP_VERSION
     }
+
+
+@app.get("/metrics", tags=["System"], include_in_schema=False)
+async def metrics_endpoint():
+    """
+    Metrics Endpoint
+
+    Exposes generation pipeline metrics in the Prometheus text format.
+    """
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
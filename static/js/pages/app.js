@@ -242,6 +242,84 @@ function showUpgradePrompt(type, requested, remaining = 0) {
   }
 }
 
+// Predicted generation time, output tokens and quota impact (null if the estimate fails)
+async function fetchEstimate(formData) {
+  try {
+    const res = await fetch('/api/generator/estimate', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${token}`
+      },
+      body: JSON.stringify(formData)
+    });
+    return res.ok ? await res.json() : null;
+  } catch (error) {
+    return null;
+  }
+}
+
+// Progress bar paced by the estimated seconds; it slows down near the end instead of stopping
+function startProgress(estimatedSeconds) {
+  const container = document.getElementById('generationProgress');
+  const bar = document.getElementById('generationProgressBar');
+  const text = document.getElementById('generationProgressText');
+  const started = Date.now();
+
+  function update() {
+    const elapsed = (Date.now() - started) / 1000;
+    const fraction = 1 - Math.exp(-2 * elapsed / estimatedSeconds);
+    bar.style.width = `${Math.min(fraction, 0.97) * 100}%`;
+    const remaining = Math.max(0, Math.round(estimatedSeconds - elapsed));
+    text.textContent = remaining > 0 ? `About ${remaining}s remaining` : 'Almost done...';
+  }
+
+  update();
+  container.style.display = 'block';
+  const timer = setInterval(update, 500);
+  return () => {
+    clearInterval(timer);
+    container.style.display = 'none';
+    bar.style.width = '0%';
+  };
+}
+
+function downloadBlob(blob, filename) {
+  const url = window.URL.createObjectURL(blob);
+  const a = document.createElement('a');
+  a.href = url;
+  a.download = filename;
+  document.body.appendChild(a);
+  a.click();
+  document.body.removeChild(a);
+  window.URL.revokeObjectURL(url);
+}
+
+// Wait for a background job (the server queues one when it is busy) and fetch its CSV
+async function waitForJob(job) {
+  while (job.status !== 'completed') {
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Generation failed');
+    }
+    await new Promise(resolve => setTimeout(resolve, 5000));
+    const res = await fetch(`/api/generator/jobs/${job.id}`, {
+      headers: { 'Authorization': `Bearer ${token}` }
+    });
+    if (!res.ok) {
+      throw new Error('Lost track of the queued generation. Check your history later.');
+    }
+    job = await res.json();
+  }
+
+  const res = await fetch(job.download_url, {
+    headers: { 'Authorization': `Bearer ${token}` }
+  });
+  if (!res.ok) {
+    throw new Error('The test was generated but could not be downloaded. Check your history.');
+  }
+  return res.blob();
+}
+
 // Form submission - Generate and Download CSV
 document.getElementById('generatorForm').addEventListener('submit', async (e) => {
   e.preventDefault();
@@ -267,14 +345,26 @@ document.getElementById('generatorForm').addEventListener('submit', async (e) =>
   const originalText = btn.textContent;
   btn.disabled = true;
   btn.textContent = 'Generating questions...';
-  showStatus('AI is generating your questions. This may take 30-60 seconds...', 'info');
+
+  const estimate = await fetchEstimate(formData);
+  const estimatedSeconds = estimate ? Math.max(5, Math.round(estimate.seconds)) : 45;
+  showStatus(`AI is generating your questions. This should take about ${estimatedSeconds} seconds...`, 'info');
+  const stopProgress = startProgress(estimatedSeconds);
+
+  // One key per submission: if this request is retried, the server replays its result
+  const idempotencyKey = (window.crypto && crypto.randomUUID)
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
 
   try {
     const response = await fetch('/api/generator/generate', {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
-        'Authorization': `Bearer ${token}`
+        'Authorization': `Bearer ${token}`,
+        'Idempotency-Key': idempotencyKey,
+        // When the server is busy it queues the test as a background job instead of refusing it
+        'Prefer': 'respond-async'
       },
       body: JSON.stringify(formData)
     });
@@ -284,17 +374,18 @@ document.getElementById('generatorForm').addEventListener('submit', async (e) =>
       throw new Error(error.detail || 'Generation failed');
     }
 
+    let blob;
+    if (response.status === 202) {
+      showStatus('We are busy right now, so your test was queued. Keep this page open - it will download when ready.', 'info');
+      blob = await waitForJob(await response.json());
+    } else {
+      blob = await response.blob();
+    }
+
     // Download the CSV file
-    const blob = await response.blob();
-    const url = window.URL.createObjectURL(blob);
-    const a = document.createElement('a');
-    a.href = url;
-    a.download = formData.working_title.replace(/[^a-z0-9]/gi, '_') + '_practice_test.csv';
-    document.body.appendChild(a);
-    a.click();
-    document.body.removeChild(a);
-    window.URL.revokeObjectURL(url);
+    downloadBlob(blob, formData.working_title.replace(/[^a-z0-9]/gi, '_') + '_practice_test.csv');
 
+    stopProgress();
     showStatus('CSV file downloaded successfully!', 'success');
     btn.textContent = originalText;
     btn.disabled = false;
@@ -303,6 +394,7 @@ document.getElementById('generatorForm').addEventListener('submit', async (e) =>
     loadUserData();
 
   } catch (error) {
+    stopProgress();
     showStatus(`Error: ${error.message}`, 'error');
     btn.textContent = originalText;
     btn.disabled = false;
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script to verify admission control: queueing, load shedding and diverting to background jobs
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+from generator import routes
+from generator.jobs import SQLiteJobStore
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.idempotency import IdempotencyStore, MemoryBackend
+from testutils import Clock, make_request
+
+
+def test_admission_controller():
+    """Test that generations queue for AI call slots and are rejected when they would miss the SLO"""
+    print("Testing admission controller...")
+    clock = Clock()
+    controller = AdmissionController(max_calls=8, max_queue=10, slo_seconds=100, enabled=True,
+                                     external_calls=lambda: 0, clock=clock)
+    order = []
+
+    async def generation(name, calls, seconds, hold):
+        async with controller.admit(calls, seconds):
+            order.append(name)
+            await hold.wait()
+
+    async def scenario():
+        a, b, c = asyncio.Event(), asyncio.Event(), asyncio.Event()
+        tasks = [asyncio.ensure_future(generation("a", 4, 60, a)), asyncio.ensure_future(generation("b", 4, 60, b))]
+        await asyncio.sleep(0)
+        assert order == ["a", "b"] and controller.running_calls == 8
+
+        # Starts when a or b is done (at 60s) and finishes by 90s: queued
+        tasks.append(asyncio.ensure_future(generation("c", 4, 30, c)))
+        await asyncio.sleep(0)
+        assert controller.queue_depth == 1 and order == ["a", "b"]
+
+        # Would start at 60s and finish at 110s: rejected, retry when the wait has shrunk by 10s
+        try:
+            async with controller.admit(4, 50):
+                raise AssertionError("expected a rejection")
+        except AdmissionRejected as e:
+            assert e.status_code == 503 and e.headers["Retry-After"] == "10", e.headers
+
+        a.set()
+        await asyncio.sleep(0.01)
+        assert order == ["a", "b", "c"] and controller.queue_depth == 0
+        b.set()
+        c.set()
+        await asyncio.gather(*tasks)
+
+        # Longer than the SLO on its own, but nothing to wait for: admitted
+        async with controller.admit(8, 500):
+            assert controller.running_calls == 8
+        assert controller.running_calls == 0
+
+    asyncio.run(scenario())
+    print("✅ Admission Controller Test PASSED!")
+
+
+def test_generate_sheds_load():
+    """Test that /generate answers 503 with Retry-After, or 202 with a job when the client prefers async
+
+    Concurrent and Idempotency-Key retries of a diverted request get the same job, not one each.
+    """
+    print("Testing load shedding on /generate...")
+    request = make_request()
+    user = {"id": "u1", "tier": "free"}
+    controller = AdmissionController(max_calls=4, slo_seconds=30, enabled=True, external_calls=lambda: 0)
+
+    async def scenario():
+        async with controller.admit(4, 600):  # Another generation holds every AI call slot for 10 minutes
+            try:
+                await routes.generate_test(request, user, idempotency_key=None, prefer=None)
+                raise AssertionError("expected a 503")
+            except AdmissionRejected as e:
+                assert e.status_code == 503 and int(e.headers["Retry-After"]) > 0
+            joined = await asyncio.gather(*[
+                routes.generate_test(request, user, idempotency_key=None, prefer="respond-async") for _ in range(3)
+            ])
+            keyed = make_request(num_questions=20)
+            first = await routes.generate_test(keyed, user, idempotency_key="k1", prefer="respond-async")
+            retried = await routes.generate_test(keyed, user, idempotency_key="k1", prefer="respond-async")
+            return joined, first, retried
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteJobStore(os.path.join(directory, "jobs.sqlite3"))
+        patched = {"admission": controller, "jobs": store, "start_job_worker": lambda: None,
+                   "idempotency_store": IdempotencyStore(MemoryBackend())}
+        original = {name: getattr(routes, name) for name in patched}
+        for name, value in patched.items():
+            setattr(routes, name, value)
+        try:
+            joined, first, retried = asyncio.run(scenario())
+        finally:
+            for name, value in original.items():
+                setattr(routes, name, value)
+
+        ids = {json.loads(response.body)["id"] for response in joined}
+        assert len(ids) == 1 and all(response.status_code == 202 for response in joined)
+        response = joined[0]
+        body = json.loads(response.body)
+        assert response.headers["Location"].endswith(f"/jobs/{body['id']}")
+        job = store.get(body["id"])
+        assert job.status == "queued" and job.delivery == "realtime" and json.loads(job.request)["num_questions"] == 10
+
+        assert first.status_code == retried.status_code == 202 and retried.headers["Idempotent-Replayed"] == "true"
+        assert json.loads(first.body)["id"] == json.loads(retried.body)["id"]
+        assert retried.headers["Location"] == first.headers["Location"]
+        assert store.count("queued") == 2
+    print("✅ Load Shedding Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_admission_controller()
+        test_generate_sheds_load()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Admission Test FAILED: {e}")
+        sys.exit(1)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script to verify generation batching and per-batch checkpoints
+"""
+import os
+import sys
+import tempfile
+import time
+
+from generator.checkpoints import SQLiteCheckpointStore
+from config import GENERATION_BATCH_CONCURRENCY
+from generator.routes import get_question_type_distribution, plan_batches, plan_routed_batches
+
+
+def test_plan_batches():
+    """Test that batches are even, bounded and add up to the distribution"""
+    print("Testing batch planning...")
+    for total in (1, 20, 26, 99, 250):
+        distribution = get_question_type_distribution(["mix-all"], total)
+        batches = plan_batches(distribution, batch_size=25)
+        sizes = [sum(batch.values()) for batch in batches]
+        assert sum(sizes) == total, (total, sizes)
+        assert max(sizes) <= 25 and max(sizes) - min(sizes) <= 1, (total, sizes)
+        for qtype, count in distribution.items():
+            assert sum(batch.get(qtype, 0) for batch in batches) == count
+        assert batches == plan_batches(distribution, batch_size=25)  # Deterministic for resume
+    print("✅ Batch Planning Test PASSED!")
+
+
+def test_plan_routed_batches():
+    """Test that routed batches cover the distribution and fit the parallel slots"""
+    print("Testing routed batch planning...")
+    for formats, difficulty, total in ((["mix-all"], "beginner", 60), (["mix-all"], "intermediate", 60),
+                                       (["single-choice", "scenario-based"], "advanced", 50),
+                                       (["mix-all"], "mixed", 250)):
+        distribution = get_question_type_distribution(formats, total)
+        batches = plan_routed_batches(distribution, difficulty)
+        for qtype, count in distribution.items():
+            assert sum(batch.distribution.get(qtype, 0) for batch in batches) == count
+        assert all(len({batch.route for batch in batches if qtype in batch.distribution}) == 1
+                   for qtype in distribution)  # Each question type has one route
+        if total <= 100:
+            assert len(batches) <= GENERATION_BATCH_CONCURRENCY, (formats, difficulty, len(batches))
+        assert batches == plan_routed_batches(distribution, difficulty)  # Deterministic for resume
+    print("✅ Routed Batch Planning Test PASSED!")
+
+
+def test_sqlite_checkpoints():
+    """Test saving, loading and deleting a run's batches"""
+    print("Testing SQLite checkpoints...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteCheckpointStore(os.path.join(tmp, "checkpoints.sqlite3"))
+        store.start_run("run-1", "user-1", {"num_questions": 50})
+        store.save_batch("run-1", 1, [{"question": "Q26"}])
+        store.save_batch("run-1", 0, [{"question": "Q1"}])
+
+        assert store.get_run("run-1") == {"user_id": "user-1", "request": {"num_questions": 50}}
+        assert store.load_batches("run-1") == {0: [{"question": "Q1"}], 1: [{"question": "Q26"}]}
+
+        store.delete_run("run-1")
+        assert store.get_run("run-1") is None
+        assert store.load_batches("run-1") == {}
+
+        # Pruning drops runs created before the cutoff, with their batches
+        store.start_run("run-2", "user-1", {"num_questions": 25})
+        store.save_batch("run-2", 0, [{"question": "Q1"}])
+        store.prune(time.time() - 60)
+        assert store.load_batches("run-2") == {0: [{"question": "Q1"}]}
+        store.prune(time.time() + 1)
+        assert store.get_run("run-2") is None and store.load_batches("run-2") == {}
+
+        # A run past the TTL is not resumed, and starting it again begins from scratch
+        store.start_run("run-3", "user-1", {"num_questions": 25})
+        store.save_batch("run-3", 0, [{"question": "Old"}])
+        store._connection().execute("UPDATE generation_runs SET created = ? WHERE run_id = 'run-3'",
+                                    (time.time() - 10 * 24 * 3600,))
+        assert store.get_run("run-3") is None and store.load_batches("run-3") == {}
+        store.start_run("run-3", "user-1", {"num_questions": 25})
+        assert store.get_run("run-3") is not None and store.load_batches("run-3") == {}
+        store.save_batch("run-3", 1, [{"question": "New"}])
+        assert store.load_batches("run-3") == {1: [{"question": "New"}]}
+    print("✅ Checkpoint Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_plan_batches()
+        test_plan_routed_batches()
+        test_sqlite_checkpoints()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Checkpoint Test FAILED: {e}")
+        sys.exit(1)
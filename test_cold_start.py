@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the serverless entry point imports without the heavy SDKs
+"""
+import json
+import subprocess
+import sys
+
+LAZY_MODULES = ("openai", "anthropic", "stripe", "supabase", "jose")
+
+
+def test_sdks_not_imported_at_startup():
+    """Importing api.index must not pull in the AI, Stripe, Supabase or JWT SDKs"""
+    print("Testing cold-start imports...")
+    script = f"import sys, api.index; print(__import__('json').dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    print(f"  SDKs loaded at startup: {loaded or 'none'}")
+    assert loaded == [], f"SDKs imported at startup: {loaded}"
+
+    print("✅ Cold Start Test PASSED!")
+
+
+if __name__ == "__main__":
+    test_sdks_not_imported_at_startup()
+    sys.exit(0)
@@ -6,6 +6,9 @@ import csv
 import io
 import sys
 
+from generator.models import Question
+from generator.export import convert_to_udemy_csv
+
 # Mock question data in the new format
 mock_questions = [
     {
@@ -35,72 +38,12 @@ mock_questions = [
     }
 ]
 
-def convert_to_udemy_csv(questions):
-    """Convert questions to Udemy CSV format matching the official template"""
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write header matching Udemy template exactly
-    writer.writerow([
-        "Question",
-        "Question Type",
-        "Answer Option 1",
-        "Explanation 1",
-        "Answer Option 2",
-        "Explanation 2",
-        "Answer Option 3",
-        "Explanation 3",
-        "Answer Option 4",
-        "Explanation 4",
-        "Answer Option 5",
-        "Explanation 5",
-        "Answer Option 6",
-        "Explanation 6",
-        "Correct Answers",
-        "Overall Explanation",
-        "Domain"
-    ])
-
-    # Write questions
-    for q in questions:
-        row = [q["question"], q["question_type"]]
-
-        # Process up to 6 answer options
-        answers = q.get("answers", [])
-        correct_indices = []
-
-        for i in range(6):
-            if i < len(answers):
-                answer = answers[i]
-                row.append(answer["text"])
-                row.append(answer["explanation"])
-                # Track correct answer indices (1-based for Udemy)
-                if answer.get("is_correct", False):
-                    correct_indices.append(str(i + 1))
-            else:
-                # Empty cells for unused answer slots
-                row.append("")
-                row.append("")
-
-        # Correct answers as comma-separated indices
-        row.append(",".join(correct_indices))
-
-        # Overall explanation
-        row.append(q.get("overall_explanation", ""))
-
-        # Domain (category)
-        row.append(q.get("domain", ""))
-
-        writer.writerow(row)
-
-    return output.getvalue()
-
 def test_csv_format():
     """Test that generated CSV matches expected format"""
     print("Testing CSV Generation...")
     print("=" * 70)
 
-    csv_content = convert_to_udemy_csv(mock_questions)
+    csv_content = convert_to_udemy_csv([Question.from_dict(q) for q in mock_questions])
 
     print("\nGenerated CSV:")
     print("-" * 70)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test script to verify generation estimates: the rolling estimator and the estimate endpoint
+"""
+import asyncio
+import sys
+
+from generator import routes
+from generator.estimator import GenerationEstimator
+from generator.services import Completion, ModelRoute
+from testutils import make_request
+
+ROUTE = ModelRoute("strong", "fake", "fake-chat", 0.7, 8000)
+
+
+def test_estimator_learns():
+    """Test that the estimator starts from its priors and follows observed calls"""
+    print("Testing rolling estimator...")
+    estimator = GenerationEstimator(decay=0.2)
+    prior = estimator.tokens_per_question(ROUTE, "technical", "questions")
+    assert estimator.tokens_per_question(ROUTE, "technical", "stems") < prior
+
+    # Calls without usage (plain text, e.g. from a fake) are ignored
+    estimator.observe(ROUTE, "technical", "questions", 10, "[]")
+    assert estimator.tokens_per_question(ROUTE, "technical", "questions") == prior
+
+    # 100 tokens per question; 1s to the first token, then 200 tokens per second
+    for questions in (5, 10, 20, 10, 5, 20) * 5:
+        tokens = questions * 100
+        estimator.observe(ROUTE, "technical", "questions", questions, Completion("[]", 900, tokens, 1 + tokens / 200))
+    assert abs(estimator.tokens_per_question(ROUTE, "technical", "questions") - 100) < 5
+    assert abs(estimator.call_seconds(ROUTE, 1000) - 6) < 0.5
+    assert abs(estimator.call_seconds(ROUTE, 3000) - 16) < 1
+    assert abs(estimator.prompt_tokens(ROUTE, "questions") - 900) < 50
+    # Other styles keep their priors
+    assert estimator.tokens_per_question(ROUTE, "very-detailed", "questions") > 100
+    print("✅ Rolling Estimator Test PASSED!")
+
+
+def test_estimate_endpoint():
+    """Test that estimates grow with the test and report the quota impact"""
+    print("Testing estimate endpoint...")
+    user = {"id": "u1", "tier": "free", "monthly_chars_used": 5}
+
+    small = asyncio.run(routes.estimate_test(make_request(num_questions=5), user))
+    large = asyncio.run(routes.estimate_test(make_request(num_questions=20), user))
+    assert 0 < small["output_tokens"] < large["output_tokens"] and 0 < small["seconds"] <= large["seconds"]
+    assert small["cost_usd"] < large["cost_usd"] and large["ai_calls"] >= 1
+    assert small["quota"] == {"questions": 5, "used": 5, "limit": 20, "remaining_after": 10, "within_limit": True}
+    assert not large["quota"]["within_limit"] and large["quota"]["remaining_after"] == 0
+
+    # Two-phase styles add explanation calls
+    detailed = routes.estimate_generation(make_request(explanation_style="very-detailed"))
+    assert detailed.ai_calls > routes.estimate_generation(make_request()).ai_calls
+    print("✅ Estimate Endpoint Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_estimator_learns()
+        test_estimate_endpoint()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Estimate Test FAILED: {e}")
+        sys.exit(1)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the generation history store: dedupe, retention, eviction and byte ranges
+"""
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+
+from generator import routes
+from generator.export import convert_to_udemy_csv
+from generator.history import HistoryStore, SQLiteHistoryStore, iter_blob_range, parse_range
+from generator.models import Answer, Question
+from generator.services import DEFAULT_ROUTE
+from utils.compression import CompressionMiddleware
+from testutils import Clock, make_request
+
+CSV = ("Question,Question Type\n" + "".join(f"Question {i},multiple-choice\n" for i in range(2000))).encode()
+
+
+def save(store, user_id="u1", days=7, body=CSV, title="Course"):
+    return store.save(user_id, days, title, "Test 1", 10, io.BytesIO(body))
+
+
+def test_content_addressed():
+    """Test that identical CSVs share one compressed blob and entries are per user"""
+    print("Testing content-addressed storage...")
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteHistoryStore(directory, clock=Clock(1_000_000.0))
+        first, second = save(store), save(store, "u2")
+        assert first.digest == second.digest and first.id != second.id
+        assert first.size == len(CSV) and first.stored_size < len(CSV) / 5, first
+        with gzip.open(store.blob_path(first.digest)) as blob:
+            assert blob.read() == CSV
+
+        assert [e.id for e in store.list("u1", 10)] == [first.id]
+        assert store.get("u2", first.id) is None and store.get("u1", first.id) == first
+    print("✅ Content-Addressed Test PASSED!")
+
+
+def test_retention_and_eviction():
+    """Test per-tier expiry and least-recently-used eviction by total size"""
+    print("Testing retention and eviction...")
+    with tempfile.TemporaryDirectory() as directory:
+        clock = Clock(1_000_000.0)
+        store = SQLiteHistoryStore(directory, clock=clock)
+        short, long = save(store, days=7), save(store, days=90, body=CSV + b"x\n")
+        clock.now += 8 * 86400
+        store.prune()
+        assert [e.id for e in store.list("u1", 10)] == [long.id]
+        assert not os.path.exists(store.blob_path(short.digest))
+        assert os.path.exists(store.blob_path(long.digest))
+
+        # Room for two blobs: the entry downloaded least recently goes first
+        store.max_bytes = long.stored_size * 2 + 100
+        clock.now += 1
+        second = save(store, body=CSV + b"y\n")
+        clock.now += 1
+        store.get("u1", long.id)
+        clock.now += 1
+        third = save(store, body=CSV + b"z\n")
+        assert {e.id for e in store.list("u1", 10)} == {long.id, third.id}
+        assert not os.path.exists(store.blob_path(second.digest))
+    print("✅ Retention and Eviction Test PASSED!")
+
+
+def test_ranges():
+    """Test Range header parsing and reading ranges from a compressed blob"""
+    print("Testing byte ranges...")
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    for bad in ("bytes=100-", "bytes=5-1", "bytes=a-b", "bytes=-0"):
+        try:
+            parse_range(bad, 100)
+            raise AssertionError(f"{bad} accepted")
+        except ValueError:
+            pass
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteHistoryStore(directory)
+        entry = save(store)
+        path = store.blob_path(entry.digest)
+        assert b"".join(iter_blob_range(path, 1000, 20999, chunk_size=4096)) == CSV[1000:21000]
+        assert b"".join(iter_blob_range(path, 0, entry.size - 1)) == CSV
+
+        # The gzip and identity representations have different strong ETags
+        async def download(accept_encoding):
+            return await routes.download_from_history(entry.id, None, accept_encoding, {"id": "u1"})
+
+        original, routes.history = routes.history, HistoryStore(store)
+        try:
+            gzipped, identity = asyncio.run(download("gzip")), asyncio.run(download(None))
+        finally:
+            routes.history = original
+        assert gzipped.headers["ETag"] == f'"{entry.digest}-gz"' and identity.headers["ETag"] == f'"{entry.digest}"'
+
+        # Bodies the compression middleware encodes get their own ETag too
+        async def through_middleware(accept_encoding):
+            async def app(scope, receive, send):
+                await send({"type": "http.response.start", "status": 200,
+                            "headers": [(b"content-type", b"text/csv"), (b"etag", f'"{entry.digest}"'.encode())]})
+                await send({"type": "http.response.body", "body": CSV})
+
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding)]}
+            await CompressionMiddleware(app)(scope, None, send)
+            return dict(messages[0]["headers"])
+
+        encoded = asyncio.run(through_middleware(b"gzip"))
+        assert encoded[b"content-encoding"] == b"gzip" and encoded[b"etag"] == f'"{entry.digest}-gz"'.encode()
+    print("✅ Byte Range Test PASSED!")
+
+
+def test_regenerate_questions():
+    """Test that only the selected questions are regenerated, avoiding the rest of the test"""
+    print("Testing question regeneration...")
+    test = [Question(f"Stored question {i}?", "multiple-choice", [Answer("TRUE"), Answer("FALSE")], 0b01,
+                     "Because.", "Cloud") for i in range(6)]
+    test[4] = Question("Pick two?", "multi-select", [Answer("A"), Answer("B"), Answer("C"), Answer("D")], 0b0011,
+                       "Because.", "Cloud")
+    request = make_request(num_questions=6, question_formats=["mix-all"])
+    prompts = []
+
+    async def fake_call_ai(prompt, route=DEFAULT_ROUTE):
+        prompts.append(prompt)
+        distribution = json.loads(prompt.split("QUESTION TYPE DISTRIBUTION:")[1].split("CRITICAL:")[0])
+        answers = {"true_false": [["TRUE", True], ["FALSE", False]],
+                   "multiple_select": [["A", True], ["B", True], ["C", False], ["D", False]]}
+        return json.dumps([
+            {"question": f"New {qtype} {i}?", "question_type": "multi-select" if qtype == "multiple_select" else "multiple-choice",
+             "answers": [{"text": text, "explanation": "Why.", "is_correct": correct}
+                         for text, correct in answers[qtype]],
+             "overall_explanation": "Because.", "domain": "Cloud"}
+            for qtype, count in distribution.items() for i in range(count)
+        ])
+
+    async def regenerate():
+        response = await routes.regenerate_questions(
+            entry.id, routes.RegenerateQuestionsRequest(indices=[4, 1, 4], feedback="Too easy"), user)
+        return response, b"".join([chunk async for chunk in response.body_iterator])
+
+    with tempfile.TemporaryDirectory() as directory:
+        user = {"id": "u1", "tier": "free"}
+        store = HistoryStore(SQLiteHistoryStore(directory))
+        body = convert_to_udemy_csv(test).encode("utf-8")
+        entry = store.save(user, "AWS", "Test 1", 6, io.BytesIO(body), request.model_dump())
+        original = routes.history, routes.call_ai
+        routes.history, routes.call_ai = store, fake_call_ai
+        try:
+            response, patched = asyncio.run(regenerate())
+        finally:
+            routes.history, routes.call_ai = original
+
+        rows = list(csv.reader(io.StringIO(patched.decode("utf-8"))))
+        assert [r[0] for r in rows[1:]] == ["Stored question 0?", "New true_false 0?", "Stored question 2?",
+                                            "Stored question 3?", "New multiple_select 0?", "Stored question 5?"], rows
+        stored = list(csv.reader(io.StringIO(body.decode("utf-8"))))
+        assert [rows[i] for i in (0, 1, 3, 4, 6)] == [stored[i] for i in (0, 1, 3, 4, 6)]
+        assert "Too easy" in prompts[0] and "- Stored question 1?" in prompts[0] and "- Pick two?" in prompts[0]
+        assert [e.id for e in store.list("u1", 10)][0] == response.headers["X-History-Entry-Id"] != entry.id
+    print("✅ Question Regeneration Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_content_addressed()
+        test_retention_and_eviction()
+        test_ranges()
+        test_regenerate_questions()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ History Test FAILED: {e}")
+        sys.exit(1)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script to verify importing, checking and extending existing Udemy practice test CSVs
+"""
+import csv
+import io
+import sys
+from collections import Counter
+
+from generator.export import UDEMY_CSV_HEADER
+from generator.importer import ImportRowError, merged_csv_file, scan_import
+from generator.models import Answer, Question
+from generator.routes import missing_distribution
+
+TEMPLATE = "static/files/udemy_template.csv"
+
+
+def csv_file(rows, header=UDEMY_CSV_HEADER):
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return io.BytesIO(text.getvalue().encode("utf-8"))
+
+
+def row(question, answers, correct, question_type="multiple-choice"):
+    cells = [question, question_type]
+    for i in range(6):
+        cells += [answers[i], ""] if i < len(answers) else ["", ""]
+    return cells + [correct, "Explained.", "Cloud"]
+
+
+def test_template_import():
+    """Test that Udemy's own template imports cleanly"""
+    print("Testing template import...")
+    with open(TEMPLATE, "rb") as f:
+        report = scan_import(f)
+    assert report.rows > 0 and report.valid == report.rows, report.to_dict()
+    assert report.kinds["multiple_select"] > 0 and report.kinds["true_false"] > 0, report.kinds
+    print(f"   {report.rows} rows, types {dict(report.kinds)}")
+    print("✅ Template Import Test PASSED!")
+
+
+def test_problem_rows():
+    """Test that broken rows are reported by line and duplicates are caught"""
+    print("Testing problem rows...")
+    report = scan_import(csv_file([
+        row("Which service stores objects?", ["S3", "EC2", "IAM"], "1"),
+        row("Which service stores objects? ", ["S3", "EC2"], "1"),  # Duplicate of line 2
+        row("Pick the compute services", ["EC2", "Lambda", "S3"], "1,2", "multi-select"),
+        row("Which region is the default?", ["us-east-1", "eu-west-1"], "3"),  # Correct answer is empty
+        row("Which port does HTTPS use?", ["443", "80"], "x"),  # Invalid correct answers
+        row("", ["A", "B"], "1"),  # Missing question
+        [""] * len(UDEMY_CSV_HEADER),  # Blank rows are skipped
+    ]))
+    problems = {problem["line"]: problem["reasons"] for problem in report.to_dict()["problems"]}
+    assert report.rows == 6 and report.valid == 2, report.to_dict()
+    assert report.duplicate_count == 1 and problems[3] == ["duplicate_of_line_2"], problems
+    assert "correct_answer_is_empty" in problems[5], problems
+    assert "invalid_correct_answers" in problems[6], problems
+    assert "missing_question" in problems[7], problems
+
+    try:
+        scan_import(csv_file([], header=["Question", "Answer"]))
+        raise AssertionError("wrong header accepted")
+    except ImportRowError:
+        pass
+    print("✅ Problem Rows Test PASSED!")
+
+
+def test_extend():
+    """Test the missing distribution and the merged CSV"""
+    print("Testing extend...")
+    upload = csv_file([
+        row("Which service stores objects?", ["S3", "EC2", "IAM"], "1"),
+        row("Which service stores objects?", ["S3", "EC2", "IAM"], "1"),
+        row("Pick the compute services", ["EC2", "Lambda", "S3"], "1,2", "multi-select"),
+    ])
+    report = scan_import(upload)
+    missing = missing_distribution({"multiple_choice": 3, "multiple_select": 1, "true_false": 1}, report.kinds)
+    assert missing == {"multiple_choice": 2, "true_false": 1}, missing
+    assert report.existing.add("which service STORES objects") is not None
+
+    new = [Question("Lambda is serverless.", "multiple-choice", [Answer("True"), Answer("False")], 0b01)]
+    output = merged_csv_file(upload, new)
+    rows = list(csv.reader(io.TextIOWrapper(output, encoding="utf-8", newline="")))
+    assert rows[0] == UDEMY_CSV_HEADER
+    assert [r[0] for r in rows[1:]] == ["Which service stores objects?", "Pick the compute services",
+                                        "Lambda is serverless."], rows
+    assert Counter(r[1] for r in rows[1:]) == {"multiple-choice": 2, "multi-select": 1}, rows
+    assert rows[3][14] == "1", rows
+    print("✅ Extend Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_template_import()
+        test_problem_rows()
+        test_extend()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Import Test FAILED: {e}")
+        sys.exit(1)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Test script to verify background generation jobs: the job store, batch delivery and the worker
+"""
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+
+import httpx
+
+from generator import routes
+from generator.history import HistoryStore, SQLiteHistoryStore
+from generator.jobs import JOB_STALE_SECONDS, SQLiteJobStore
+from generator.services import DEFAULT_ROUTE
+from utils import tracing
+from testutils import Clock, make_request
+
+
+def fake_response(prompt, tag):
+    distribution = json.loads(prompt.split("QUESTION TYPE DISTRIBUTION:")[1].split("CRITICAL:")[0])
+    return json.dumps([
+        {"question": f"{tag} question {i}?", "question_type": "multiple-choice",
+         "answers": [{"text": "TRUE", "explanation": "Yes.", "is_correct": True},
+                     {"text": "FALSE", "explanation": "No.", "is_correct": False}],
+         "overall_explanation": "Because.", "domain": "Cloud"}
+        for i in range(sum(distribution.values()))
+    ])
+
+
+def test_job_store():
+    """Test that state changes are compare-and-set, provider batches back off and stale jobs are picked up"""
+    print("Testing job store...")
+    with tempfile.TemporaryDirectory() as directory:
+        clock = Clock(1_000_000.0)
+        store = SQLiteJobStore(os.path.join(directory, "jobs.sqlite3"), clock=clock)
+        job = store.create("u1", "free", {"num_questions": 10}, "batch", None)
+        assert store.claim(job.id, "queued", "submitted") and not store.claim(job.id, "queued", "submitted")
+
+        store.add_provider_batch("b1", "claude", [job.id], 30)
+        assert store.due_provider_batches() == [] and store.pending_provider_batches(job.id) == 1
+        clock.now += 30
+        (batch,) = store.due_provider_batches()
+        # Only one of two workers polling the same batch gets it
+        assert store.claim_provider_batch(batch, 60) and not store.claim_provider_batch(batch, 60)
+        clock.now += 59
+        assert store.due_provider_batches() == []
+
+        store.save_results("b1", {job.id: {0: "[]", 1: None}})
+        assert store.pending_provider_batches(job.id) == 0 and store.results(job.id) == {0: "[]", 1: None}
+
+        assert store.claim(job.id, "submitted", "finishing")
+        clock.now += JOB_STALE_SECONDS + 1
+        store.requeue_stale()
+        assert store.get(job.id).status == "submitted"
+        store.finish(job.id, "completed", "entry")
+        assert store.results(job.id) == {} and store.get(job.id).history_entry_id == "entry"
+    print("✅ Job Store Test PASSED!")
+
+
+def test_batch_job():
+    """Test that a batch job's calls go out as one provider batch and failed calls are made up in real time"""
+    print("Testing batch delivery...")
+    submitted = []
+    realtime = []
+
+    async def fake_submit(provider, calls):
+        submitted.append(calls)
+        return "batch-1"
+
+    async def fake_ended(provider, batch_id):
+        return True
+
+    async def fake_results(provider, batch_id):
+        for index, (custom_id, prompt, route) in enumerate(submitted[0]):
+            # The first call of the batch fails
+            yield custom_id, fake_response(prompt, f"Batch {index}") if index else None
+
+    async def fake_call_ai(prompt, route=DEFAULT_ROUTE):
+        realtime.append(prompt)
+        return fake_response(prompt, f"Realtime {len(realtime)}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        clock = Clock(1_000_000.0)
+        store = SQLiteJobStore(os.path.join(directory, "jobs.sqlite3"), clock=clock)
+        history = HistoryStore(SQLiteHistoryStore(directory))
+        jobs = [store.create("u1", "free", make_request(practice_test_title=f"Test {i}", num_questions=30).model_dump(),
+                             "batch", None) for i in range(2)]
+        patched = {"jobs": store, "history": history, "call_ai": fake_call_ai,
+                   "supports_message_batches": lambda provider: True, "submit_message_batch": fake_submit,
+                   "message_batch_ended": fake_ended, "iter_message_batch_results": fake_results}
+        original = {name: getattr(routes, name) for name in patched}
+        for name, value in patched.items():
+            setattr(routes, name, value)
+        try:
+            asyncio.run(routes.process_jobs())
+            assert [store.get(job.id).status for job in jobs] == ["submitted", "submitted"]
+            clock.now += routes.BATCH_POLL_MIN_SECONDS
+            asyncio.run(routes.process_jobs())
+        finally:
+            for name, value in original.items():
+                setattr(routes, name, value)
+
+        batches = routes.plan_job_batches(make_request(num_questions=30))
+        assert len(submitted) == 1 and len(submitted[0]) == 2 * len(batches)
+        assert {call[0].rpartition("-")[0] for call in submitted[0]} == {job.id for job in jobs}
+        assert len(realtime) == 1
+        for job in jobs:
+            finished = store.get(job.id)
+            assert finished.status == "completed", finished
+            entry = history.get("u1", finished.history_entry_id)
+            assert entry is not None and entry.num_questions == 30, entry
+    print("✅ Batch Delivery Test PASSED!")
+
+
+def test_worker_isolation():
+    """Test that notify URLs must be public and the worker does not inherit the request's trace"""
+    print("Testing notify URLs and worker context...")
+
+    async def scenario():
+        for url in ("http://8.8.8.8/hook", "https://127.0.0.1/hook", "https://169.254.169.254/latest/meta-data",
+                    "https://10.0.0.5/hook", "https://[::1]/hook", "https://user:pw@8.8.8.8/hook"):
+            try:
+                await routes.check_notify_url(url)
+                raise AssertionError(f"{url} accepted")
+            except ValueError:
+                pass
+        await routes.check_notify_url("https://8.8.8.8:8443/hook")
+
+        # Notifications go to the vetted address, with the original Host and TLS server name
+        sent = []
+
+        async def resolve(host, port, **kwargs):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("93.184.215.14", port))]
+
+        def handler(request):
+            sent.append(request)
+            return httpx.Response(204)
+
+        asyncio.get_running_loop().getaddrinfo = resolve
+        await routes.send_notification("https://hooks.example.com/done?x=1", {"id": "j1"}, httpx.MockTransport(handler))
+        assert str(sent[0].url) == "https://93.184.215.14/done?x=1", sent[0].url
+        assert sent[0].headers["Host"] == "hooks.example.com"
+        assert sent[0].extensions["sni_hostname"] == "hooks.example.com"
+
+        seen = []
+
+        async def fake_worker():
+            seen.append(tracing.current_span())
+
+        trace = tracing.Trace("POST /api/generator/jobs")
+        token = tracing._current_span.set(trace.root)
+        original, routes.job_worker, routes._job_worker = routes.job_worker, fake_worker, None
+        try:
+            routes.start_job_worker()
+            await routes._job_worker
+        finally:
+            routes.job_worker, routes._job_worker = original, None
+            tracing._current_span.reset(token)
+        assert seen == [None], seen
+
+    asyncio.run(scenario())
+    print("✅ Worker Isolation Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_job_store()
+        test_batch_job()
+        test_worker_isolation()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Jobs Test FAILED: {e}")
+        sys.exit(1)
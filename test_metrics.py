@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the Prometheus metrics registry and text output
+"""
+import sys
+
+from utils.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_metrics_rendering():
+    """Test that counters, gauges and histograms render in Prometheus format"""
+    print("Testing metrics rendering...")
+    registry = MetricsRegistry()
+
+    tokens = Counter("test_tokens_total", "Tokens used", ["provider", "kind"], registry=registry)
+    tokens.labels("deepseek", "prompt").inc(120)
+    tokens.labels(provider="deepseek", kind="prompt").inc(30)
+
+    in_flight = Gauge("test_in_flight", "In-flight work", registry=registry)
+    with in_flight.track_inprogress():
+        assert "test_in_flight 1" in registry.render()
+    assert "test_in_flight 0" in registry.render()
+
+    latency = Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1), registry=registry)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    output = registry.render()
+    print(output)
+
+    assert 'test_tokens_total{provider="deepseek",kind="prompt"} 150' in output
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in output
+    assert 'test_latency_seconds_bucket{le="1"} 2' in output
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in output
+    assert "test_latency_seconds_count 3" in output
+    assert "# TYPE test_latency_seconds histogram" in output
+
+    print("✅ Metrics Test PASSED!")
+
+
+if __name__ == "__main__":
+    test_metrics_rendering()
+    sys.exit(0)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test script to verify chunked CPU offload produces the same CSV as inline encoding
+"""
+import asyncio
+import sys
+
+from benchmarks.fixtures import make_questions
+from config import OFFLOAD_CHUNK_SIZE, OFFLOAD_MIN_QUESTIONS
+from generator import export
+from generator.models import Question
+from utils.offload import CpuPool
+
+
+def check_mode(mode: str):
+    questions = [Question.from_dict(q) for q in make_questions(OFFLOAD_MIN_QUESTIONS + OFFLOAD_CHUNK_SIZE + 7)]
+    expected = export.convert_to_udemy_csv(questions).encode("utf-8")
+
+    pool = CpuPool(mode=mode, max_workers=2)
+    export.cpu_pool = pool
+    try:
+        assert asyncio.run(export.encode_udemy_csv(questions)) == expected
+        # Small exports stay inline
+        assert asyncio.run(export.encode_udemy_csv(questions[:3])) == export.convert_to_udemy_csv(
+            questions[:3]).encode("utf-8")
+        chunks = asyncio.run(pool.map(len, questions, OFFLOAD_CHUNK_SIZE, 1, task="test"))
+        assert sum(chunks) == len(questions)
+        assert max(chunks) == (len(questions) if mode == "off" else OFFLOAD_CHUNK_SIZE), chunks
+    finally:
+        pool.shutdown()
+
+
+def test_offload_modes():
+    """Test that thread and process offload match inline encoding, chunk by chunk"""
+    print("Testing CPU offload...")
+    original = export.cpu_pool
+    try:
+        for mode in ("off", "thread", "process"):
+            check_mode(mode)
+    finally:
+        export.cpu_pool = original
+    print("✅ Offload Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_offload_modes()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Offload Test FAILED: {e}")
+        sys.exit(1)
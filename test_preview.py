@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script to verify test previews: caching, the timeout and the prompt prefix shared with the full run
+"""
+import asyncio
+import json
+import sys
+
+from fastapi import HTTPException
+
+from generator import routes
+from generator.preview import PreviewCache
+from generator.services import DEFAULT_ROUTE, PREVIEW_ROUTE
+from testutils import Clock, make_request
+
+
+def fake_question(i):
+    return {"question": f"Preview question {i}?", "question_type": "multiple-choice",
+            "answers": [{"text": "TRUE", "explanation": "Yes.", "is_correct": True},
+                        {"text": "FALSE", "explanation": "No.", "is_correct": False}],
+            "overall_explanation": "Because.", "domain": "Cloud"}
+
+
+def test_preview_cache():
+    """Test that previews expire and the least recently used one is evicted first"""
+    print("Testing preview cache...")
+    clock = Clock()
+    cache = PreviewCache(ttl=60, max_entries=2, clock=clock)
+    cache.put("a", [{"question": "A"}])
+    cache.put("b", [{"question": "B"}])
+    assert cache.get("a") == [{"question": "A"}]
+    cache.put("c", [{"question": "C"}])
+    assert cache.get("b") is None and len(cache) == 2
+    clock.now += 61
+    assert cache.get("a") is None and cache.get("c") is None
+    print("✅ Preview Cache Test PASSED!")
+
+
+def test_preview_endpoint():
+    """Test that a preview shares the full run's prompt prefix, is cached, and times out with 504"""
+    print("Testing preview endpoint...")
+    calls = []
+    delay = 0.0
+
+    async def fake_call_ai(prompt, route=DEFAULT_ROUTE):
+        calls.append((prompt, route))
+        await asyncio.sleep(delay)
+        asked = sum(json.loads(prompt.split("QUESTION TYPE DISTRIBUTION:")[1].split("CRITICAL:")[0]).values())
+        return json.dumps([fake_question(len(calls) * 10 + i) for i in range(asked)])
+
+    user = {"id": "u1", "tier": "free"}
+    request = make_request()
+
+    async def scenario():
+        nonlocal delay
+        first = await routes.preview_test(request, user)
+        # Another num_questions is the same preview, unless it changes the preview's question types
+        second = await routes.preview_test(make_request(num_questions=100), user)
+        single = await routes.preview_test(make_request(num_questions=1), user)
+        assert not single["cached"] and len(single["questions"]) == sum(single["distribution"].values()) == 1
+
+        delay = 0.3
+        routes.PREVIEW_TIMEOUT_SECONDS = 0.1
+        try:
+            await routes.preview_test(make_request(category="Networking"), user)
+            raise AssertionError("expected a timeout")
+        except HTTPException as e:
+            assert e.status_code == 504, e
+        # The timed-out preview keeps running and is cached for the retry
+        await asyncio.sleep(0.4)
+        retried = await routes.preview_test(make_request(category="Networking"), user)
+        return first, second, retried
+
+    original, routes.call_ai = routes.call_ai, fake_call_ai
+    timeout = routes.PREVIEW_TIMEOUT_SECONDS
+    try:
+        first, second, retried = asyncio.run(scenario())
+    finally:
+        routes.call_ai = original
+        routes.PREVIEW_TIMEOUT_SECONDS = timeout
+
+    assert len(calls) == 3 and calls[0][1] == PREVIEW_ROUTE
+    assert len(first["questions"]) == routes.PREVIEW_QUESTIONS and not first["cached"]
+    assert second["cached"] and second["questions"] == first["questions"]
+    assert retried["cached"]
+
+    # The preview's prompt prefix is the one every batch of the full run starts with
+    preview_prompt = calls[0][0]
+    batch_prompt = routes.build_generation_prompt(request, {"multiple_choice": 10}, 1, 4, ["Existing?"])
+    prefix = preview_prompt[:preview_prompt.prefix_length]
+    assert prefix == batch_prompt[:batch_prompt.prefix_length] and batch_prompt.startswith(prefix)
+    assert "Generate exactly" not in prefix and "Existing?" not in prefix
+    print("✅ Preview Endpoint Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_preview_cache()
+        test_preview_endpoint()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Preview Test FAILED: {e}")
+        sys.exit(1)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the per-tier token-bucket rate limiter
+"""
+import os
+import sys
+import tempfile
+import time
+
+from fastapi import HTTPException
+
+from utils.rate_limit import MemoryBackend, RateLimiter, SQLiteBackend
+from testutils import Clock
+
+
+def check_backend(backend, clock):
+    limiter = RateLimiter(backend, limits={"free": 5, "pro": 20})
+
+    # A burst up to the tier limit is allowed, the next request is not
+    results = [limiter.hit("user-1", "free") for _ in range(6)]
+    assert [r.allowed for r in results] == [True] * 5 + [False], results
+    assert 11 < results[-1].retry_after <= 12, results[-1]
+
+    # Other users and tiers have their own buckets
+    assert limiter.hit("user-2", "free").allowed
+    assert limiter.hit("user-1", "pro").allowed
+    # So do other scopes on the same backend (previews)
+    assert RateLimiter(backend, limits={"free": 5}, scope="preview").hit("user-1", "free").allowed
+
+    # One token refills every 12 seconds at 5 requests/minute
+    clock.now += 12
+    assert limiter.hit("user-1", "free").allowed
+    assert not limiter.hit("user-1", "free").allowed
+
+    try:
+        limiter.check("user-1", "free")
+        raise AssertionError("Expected HTTP 429")
+    except HTTPException as e:
+        assert e.status_code == 429
+        assert e.headers["Retry-After"] == "12", e.headers
+        assert e.headers["X-RateLimit-Limit"] == "5"
+
+
+def test_memory_backend():
+    """Test bursts, refill, per-user/tier keys and Retry-After in process"""
+    print("Testing in-memory rate limiter...")
+    clock = Clock(1000.0)
+    check_backend(MemoryBackend(clock=clock), clock)
+    print("✅ Memory Backend Test PASSED!")
+
+
+def test_sqlite_backend():
+    """Test the same behaviour through the shared SQLite backend"""
+    print("Testing SQLite rate limiter...")
+    with tempfile.TemporaryDirectory() as tmp:
+        clock = Clock(1000.0)
+        check_backend(SQLiteBackend(os.path.join(tmp, "limits.sqlite3"), clock=clock), clock)
+    print("✅ SQLite Backend Test PASSED!")
+
+
+def test_overhead():
+    """Report the per-request cost of each backend"""
+    print("Measuring rate limiter overhead...")
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "memory": MemoryBackend(),
+            "sqlite": SQLiteBackend(os.path.join(tmp, "limits.sqlite3")),
+        }
+        for name, backend in backends.items():
+            limiter = RateLimiter(backend, limits={"free": 10 ** 9})
+            rounds = 2000
+            start = time.perf_counter()
+            for i in range(rounds):
+                limiter.check(f"user-{i % 100}", "free")
+            per_request_us = (time.perf_counter() - start) / rounds * 1e6
+            print(f"  {name}: {per_request_us:.1f} µs per request")
+            if name == "memory":
+                assert per_request_us < 100, per_request_us
+    print("✅ Overhead Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_memory_backend()
+        test_sqlite_backend()
+        test_overhead()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Rate Limit Test FAILED: {e}")
+        sys.exit(1)
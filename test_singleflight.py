@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test script to verify coalescing of identical in-flight generation requests
+"""
+import asyncio
+import sys
+
+from generator.routes import request_fingerprint
+from testutils import make_request
+from utils.singleflight import SingleFlight
+
+
+def test_request_fingerprint():
+    """Test that formatting differences coalesce but real differences do not"""
+    print("Testing request fingerprint normalization...")
+    fields = {"working_title": "AWS Solutions Architect", "question_formats": ["single-choice", "true-false"]}
+
+    def fingerprint(user_id="user-1", **overrides):
+        return request_fingerprint(user_id, make_request(**{**fields, **overrides}))
+
+    base = fingerprint()
+    assert base == fingerprint(working_title="  AWS Solutions  Architect ")
+    assert base == fingerprint(question_formats=["true-false", "single-choice"])
+
+    assert base != fingerprint("user-2")
+    assert base != fingerprint(num_questions=21)
+    assert base != fingerprint(practice_test_title="Test 2")
+    print("✅ Fingerprint Test PASSED!")
+
+
+def test_single_flight():
+    """Test that concurrent duplicates share one call and its result"""
+    print("Testing single-flight coalescing...")
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return f"result-{key}"
+
+    async def scenario():
+        flights = SingleFlight("test")
+        results = await asyncio.gather(
+            flights.do("a", lambda: work("a")),
+            flights.do("a", lambda: work("a")),
+            flights.do("b", lambda: work("b")),
+        )
+        assert results == ["result-a", "result-a", "result-b"], results
+        assert sorted(calls) == ["a", "b"], calls
+        assert flights.in_flight() == 0
+
+        # Once finished, the same key runs again
+        await flights.do("a", lambda: work("a"))
+        assert calls.count("a") == 2
+
+        # A cancelled waiter does not cancel the shared work for the others
+        leader = asyncio.ensure_future(flights.do("c", lambda: work("c")))
+        follower = asyncio.ensure_future(flights.do("c", lambda: work("c")))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == "result-c"
+
+    asyncio.run(scenario())
+    print("✅ Single-Flight Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_request_fingerprint()
+        test_single_flight()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Single-Flight Test FAILED: {e}")
+        sys.exit(1)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test script to verify validation, auto-repair and targeted regeneration of generated questions
+"""
+import asyncio
+import json
+import math
+import sys
+
+from config import EXPLANATION_BATCH_SIZE
+from generator import routes
+from generator.services import DEFAULT_ROUTE
+from generator.validation import apply_explanations, validate_questions
+from testutils import make_request
+
+
+def answer(text, is_correct, explanation="Because."):
+    return {"text": text, "explanation": explanation, "is_correct": is_correct}
+
+
+def question(question_type="multiple-choice", answers=None, **extra):
+    return {
+        "question": "Which service stores objects?",
+        "question_type": question_type,
+        "answers": answers or [answer("S3", True), answer("EC2", False), answer("IAM", False), answer("VPC", False)],
+        "overall_explanation": "S3 is object storage.",
+        "domain": "Cloud",
+        **extra,
+    }
+
+
+def test_repairs():
+    """Test that deterministic problems are fixed in place"""
+    print("Testing auto-repair...")
+    report = validate_questions([
+        question("Multiple_Choice"),
+        question("multiple select", [answer("A", True), answer("B", "true"), answer("C", 0), answer("a", True)]),
+        question("true_false", [answer("true", 1), answer("False", False)]),
+        question(answers=[answer("S3", True)] + [answer(f"Wrong {i}", False) for i in range(7)]),
+        question(answers=[answer("  S3 ", True), answer("EC2", False, "")],
+                 overall_explanation="First sentence. " + "x" * 6000),
+    ])
+    assert not report.rejected, report.rejected
+    mc, ms, tf, many, messy = report.questions
+    assert mc.question_type == "multiple-choice" and ms.question_type == "multi-select"
+    assert [a.text for a in ms.answers] == ["A", "B", "C"] and ms.correct_indices == [0, 1]
+    assert [a.text for a in tf.answers] == ["TRUE", "FALSE"] and tf.question_type == "multiple-choice"
+    assert len(many.answers) == 6 and many.correct_indices == [0]
+    assert messy.answers[0].text == "S3" and messy.answers[1].explanation == ""
+    assert messy.overall_explanation == "First sentence."
+    for rule in ("question_type", "is_correct", "duplicate_option", "true_false_case", "extra_options",
+                 "whitespace", "explanation_length"):
+        assert report.repairs.get(rule), rule
+    print("✅ Repair Test PASSED!")
+
+
+def test_rejections():
+    """Test that only questions without a deterministic fix are rejected"""
+    print("Testing rejections...")
+    report = validate_questions([
+        question(answers=[answer("A", True), answer("B", True), answer("C", False)]),
+        question("multi-select", [answer("A", True), answer("B", False), answer("C", False)]),
+        question(answers=[answer("A", True)] + [answer(f"Right {i}", True) for i in range(6)]),
+        question(answers=[answer("A", True), answer("a", False), answer("B", False)]),
+        question(question="x" * 1001),
+        question("essay"),
+        "not a question",
+        {key: value for key, value in question(answers=[{"text": "A", "is_correct": True}, answer("B", False)]).items()
+         if key != "overall_explanation"},
+        question(),
+    ])
+    reasons = [rejection.reasons for rejection in report.rejected]
+    assert reasons == [["multiple_correct_answers"], ["single_correct_answer"],
+                       ["too_many_options", "multiple_correct_answers"], ["conflicting_duplicate_options"],
+                       ["question_too_long"], ["unknown_question_type"], ["not_an_object"],
+                       ["missing_overall_explanation", "missing_explanation"]], reasons
+    assert len(report.questions) == 1
+    print("✅ Rejection Test PASSED!")
+
+
+def test_targeted_regeneration():
+    """Test that a batch only asks the AI again for the questions it rejected"""
+    print("Testing targeted regeneration...")
+    prompts = []
+    responses = [
+        # First response: one multi-select has a single correct answer and true/false is missing
+        [question(), question(), question("multi-select", [answer("A", True), answer("B", False), answer("C", True)]),
+         question("multi-select", [answer("A", True), answer("B", False), answer("C", False)])],
+        [question("multi-select", [answer("A", True), answer("B", True), answer("C", False)]),
+         question(answers=[answer("TRUE", True), answer("FALSE", False)])],
+    ]
+
+    async def fake_call_ai(prompt, route=DEFAULT_ROUTE):
+        prompts.append(prompt)
+        return json.dumps(responses[len(prompts) - 1])
+
+    request = make_request(num_questions=5, question_formats=["mix-all"])
+    batch = routes.Batch(DEFAULT_ROUTE, {"multiple_choice": 2, "multiple_select": 2, "true_false": 1}, 0, 1)
+
+    original, routes.call_ai = routes.call_ai, fake_call_ai
+    try:
+        questions = asyncio.run(routes.generate_batch(request, batch))
+    finally:
+        routes.call_ai = original
+
+    assert len(prompts) == 2 and len(questions) == 5
+    assert "Generate exactly 2 " in prompts[1], prompts[1][:300]
+    assert '"multiple_select": 1' in prompts[1] and '"true_false": 1' in prompts[1]
+    print("✅ Targeted Regeneration Test PASSED!")
+
+
+def test_two_phase_explanations():
+    """Test that stems validate without explanations and explanations are filled in, re-asking for gaps"""
+    print("Testing two-phase explanations...")
+    stems = [{key: value for key, value in question(question=f"Q{i}").items() if key != "overall_explanation"}
+             for i in range(7)]
+    for stem in stems:
+        stem["answers"] = [{"text": a["text"], "is_correct": a["is_correct"]} for a in stem["answers"]]
+    report = validate_questions(stems, explanations=False)
+    assert len(report.questions) == 7 and not report.repairs.get("missing_explanation"), report
+    questions = report.questions
+
+    # Items are matched by id; a missing overall or answer explanation leaves the question untouched
+    unexplained = apply_explanations(questions[:3], [
+        {"id": 2, "answer_explanations": ["Yes.", "No.", "No.", "No."], "overall_explanation": "Because."},
+        {"id": 1, "answer_explanations": ["Yes.", "No.", "No.", "No."]},
+        {"id": 3, "answer_explanations": ["Yes.", "No."], "overall_explanation": "Because."},
+    ])
+    assert unexplained == [questions[0], questions[2]] and questions[0].overall_explanation == ""
+    assert questions[2].overall_explanation == "" and questions[2].answers[0].explanation == ""
+    assert [a.explanation for a in questions[1].answers] == ["Yes.", "No.", "No.", "No."]
+
+    prompts = []
+
+    async def fake_call_ai(prompt, route=DEFAULT_ROUTE):
+        prompts.append(prompt)
+        asked = json.loads(prompt.split("QUESTIONS TO EXPLAIN:")[1].split("OUTPUT FORMAT:")[0])
+        # The first answer for Q3 leaves out its overall explanation
+        first_q3 = sum('"Q3"' in p for p in prompts) == 1
+        return json.dumps([
+            {"id": q["id"], "answer_explanations": [f"About {a['text']}." for a in q["answers"]],
+             "overall_explanation": "" if q["question"] == "Q3" and first_q3 else f"All about {q['question']}."}
+            for q in asked
+        ])
+
+    request = make_request(num_questions=7, question_formats=["single-choice"], explanation_style="very-detailed")
+    assert routes.uses_two_phase(request) == (routes.TWO_PHASE_GENERATION != "off")
+
+    original, routes.call_ai = routes.call_ai, fake_call_ai
+    try:
+        asyncio.run(routes.explain_questions(request, DEFAULT_ROUTE, questions, asyncio.Semaphore(4)))
+    finally:
+        routes.call_ai = original
+
+    assert len(prompts) == math.ceil(7 / EXPLANATION_BATCH_SIZE) + 1 and sum(p.count('"question":') == 1 and '"Q3"' in p for p in prompts) == 1, prompts
+    assert all(q.overall_explanation == f"All about {q.question}." for q in questions)
+    assert questions[4].answers[0].explanation == "About S3."
+    print("✅ Two-Phase Explanation Test PASSED!")
+
+
+if __name__ == "__main__":
+    try:
+        test_repairs()
+        test_rejections()
+        test_targeted_regeneration()
+        test_two_phase_explanations()
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Validation Test FAILED: {e}")
+        sys.exit(1)
@@ -0,0 +1,28 @@
+# testutils.py - Shared fixtures for the test_*.py scripts
+"""
+Helpers imported by several test scripts: a settable clock for stores and
+caches that take a `clock` callable, and a valid generate request that each
+test adjusts with keyword overrides.
+"""
+
+from generator.routes import GenerateTestRequest
+
+
+class Clock:
+    """Clock whose time only moves when a test sets or advances `now`"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_request(**overrides) -> GenerateTestRequest:
+    """A small valid generate request: 10 beginner true/false questions on AWS"""
+    return GenerateTestRequest(**{
+        "working_title": "AWS", "practice_test_title": "Test 1", "category": "Cloud",
+        "learning_objectives": ["a", "b", "c", "d"], "requirements": "", "target_audience": "",
+        "difficulty_level": "beginner", "num_questions": 10, "question_formats": ["true-false"],
+        "explanation_style": "technical", **overrides,
+    })
@@ -0,0 +1,172 @@
+# utils/admission.py - Admission control for generations
+"""
+Every generation holds some of ADMISSION_MAX_AI_CALLS slots (its average
+number of concurrent AI calls) while it runs. A new generation is admitted if it is
+expected to finish within ADMISSION_SLO_SECONDS, counting:
+
+    wait      until enough slots are free: running generations are expected
+              to release theirs at start + estimated seconds, and earlier
+              waiters take theirs first (FIFO)
+    run       its own estimated seconds (generator.routes.estimate_generation)
+
+Calls made outside admission (previews, imports, background jobs) are seen
+through the ptb_ai_calls_in_flight gauge and count as taken slots too.
+
+An admitted generation that has to wait is queued (at most ADMISSION_MAX_QUEUE
+deep); the rest are rejected with AdmissionRejected (503 with Retry-After)
+before any tokens are spent. Waiting never helps a generation estimated to
+take longer than the SLO by itself, so it is only admitted when it can start
+at once. The state is per worker process.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, List, Tuple
+
+from fastapi import HTTPException
+
+from config import (
+    ADMISSION_CONTROL_ENABLED, ADMISSION_MAX_AI_CALLS, ADMISSION_MAX_QUEUE, ADMISSION_SLO_SECONDS, ERROR_MESSAGES
+)
+from utils import metrics
+from utils.logging_config import get_logger
+
+logger = get_logger("admission")
+
+
+class AdmissionRejected(HTTPException):
+    """503 with Retry-After: the generation would not finish within the SLO"""
+
+    def __init__(self, retry_after: float, reason: str):
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+        super().__init__(
+            status_code=503,
+            detail=ERROR_MESSAGES["overloaded"].format(retry_after=self.retry_after),
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+
+class _Waiter:
+    __slots__ = ("key", "calls", "seconds", "future")
+
+    def __init__(self, key: int, calls: int, seconds: float, future: asyncio.Future):
+        self.key = key
+        self.calls = calls
+        self.seconds = seconds
+        self.future = future
+
+
+class AdmissionController:
+    """Admits generations by AI call slots and expected completion time"""
+
+    def __init__(self, max_calls: int = ADMISSION_MAX_AI_CALLS, max_queue: int = ADMISSION_MAX_QUEUE,
+                 slo_seconds: float = ADMISSION_SLO_SECONDS, enabled: bool = ADMISSION_CONTROL_ENABLED,
+                 external_calls: Callable[[], float] = lambda: metrics.AI_CALLS_IN_FLIGHT.value,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_calls = max_calls
+        self.max_queue = max_queue
+        self.slo_seconds = slo_seconds
+        self.enabled = enabled
+        self.external_calls = external_calls
+        self.clock = clock
+        self._ids = itertools.count()
+        self._running: Dict[int, Tuple[int, float]] = {}  # id -> (calls, expected end)
+        self._waiting: Deque[_Waiter] = deque()
+
+    @property
+    def running_calls(self) -> int:
+        return sum(calls for calls, _ in self._running.values())
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    def _free_calls(self) -> int:
+        # AI calls of admitted generations are part of the gauge too: count whichever is larger
+        return self.max_calls - max(self.running_calls, math.ceil(self.external_calls()))
+
+    def expected_start(self, calls: int) -> float:
+        """Seconds until a generation holding calls slots could start, after everything admitted before it"""
+        now = self.clock()
+        free = self._free_calls()
+        # Generations running past their estimate are expected to end any moment
+        ends: List[Tuple[float, int]] = [(max(end, now), c) for c, end in self._running.values()]
+        heapq.heapify(ends)
+        start = now
+        for need, seconds in [(w.calls, w.seconds) for w in self._waiting] + [(calls, 0.0)]:
+            need = min(need, self.max_calls)
+            while free < need and ends:
+                end, released = heapq.heappop(ends)
+                start = max(start, end)
+                free += released
+            free -= need
+            heapq.heappush(ends, (start + seconds, need))
+        return start - now
+
+    @asynccontextmanager
+    async def admit(self, calls: int, seconds: float):
+        """
+        Hold calls AI call slots for a generation expected to take seconds
+
+        Raises:
+            AdmissionRejected: If it would not finish within the SLO, or the queue is full
+        """
+        if not self.enabled:
+            yield
+            return
+
+        calls = max(1, min(calls, self.max_calls))
+        wait = self.expected_start(calls)
+        # A generation longer than the SLO by itself still runs when it can start right away
+        if wait > 0 and wait + seconds > self.slo_seconds:
+            # Retry once the wait has shrunk enough for this generation to fit
+            self._reject(min(wait, wait + seconds - self.slo_seconds), "slo")
+
+        key = next(self._ids)
+        # Only generations admitted here wake waiters, so with none running there is nothing to wait for
+        if self._running and (self._waiting or self._free_calls() < calls):
+            if len(self._waiting) >= self.max_queue:
+                self._reject(wait, "queue_full")
+            waiter = _Waiter(key, calls, seconds, asyncio.get_running_loop().create_future())
+            self._waiting.append(waiter)
+            metrics.ADMISSION_DECISIONS_TOTAL.labels("queued").inc()
+            try:
+                await waiter.future  # _release_waiting holds the slots for us before waking us
+            except BaseException:
+                if waiter in self._waiting:
+                    self._waiting.remove(waiter)
+                elif self._running.pop(key, None) is not None:
+                    self._release_waiting()
+                raise
+        else:
+            metrics.ADMISSION_DECISIONS_TOTAL.labels("admitted").inc()
+            self._running[key] = (calls, self.clock() + seconds)
+
+        try:
+            yield
+        finally:
+            del self._running[key]
+            self._release_waiting()
+
+    def _release_waiting(self):
+        """Start waiters, in order, while their slots are free (and the first one once nothing is running)"""
+        while self._waiting and (self._waiting[0].calls <= self._free_calls() or not self._running):
+            waiter = self._waiting.popleft()
+            self._running[waiter.key] = (waiter.calls, self.clock() + waiter.seconds)
+            waiter.future.set_result(None)
+
+    def _reject(self, retry_after: float, reason: str):
+        metrics.ADMISSION_DECISIONS_TOTAL.labels(f"rejected_{reason}").inc()
+        error = AdmissionRejected(retry_after, reason)
+        logger.warning(f"Generation rejected ({reason}): {self.running_calls} AI calls held, "
+                       f"{self.queue_depth} queued, retry after {error.retry_after}s")
+        raise error
+
+
+admission = AdmissionController()
@@ -0,0 +1,172 @@
+# utils/assets.py - Fingerprinted, precompressed static asset serving
+"""
+Static assets are referenced from templates through the `asset_url` Jinja
+helper, which appends a content hash (`/static/js/pages/app.js?v=3f2a9c1d0b`).
+A fingerprinted URL changes whenever the file changes, so it is served with
+`Cache-Control: immutable` and browsers never revalidate it.
+
+Precompressed `.br`/`.gz` files next to an asset are used when present and
+newer than the source; otherwise the variant is compressed once in memory.
+Generate them (and a manifest for inspection) ahead of a deploy with:
+
+    python -m utils.assets
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from utils.compression import SUPPORTED_ENCODINGS, choose_encoding, compress
+from utils.logging_config import get_logger
+
+logger = get_logger("assets")
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+MANIFEST_FILE = "asset-manifest.json"
+
+# Set ASSET_CACHE=off during development to pick up file changes without a restart
+ASSET_CACHE_ENABLED = os.getenv("ASSET_CACHE", "on").lower() != "off"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Levels used when compressing ahead of time vs. lazily on a (possibly cold) server
+BUILD_COMPRESSION_LEVELS = {"br": 11, "gzip": 9}
+RUNTIME_COMPRESSION_LEVELS = {"br": 9, "gzip": 9}
+
+# Only text-like assets benefit from compression
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+FINGERPRINT_LENGTH = 10
+
+
+class Asset:
+    """A static file held in memory with its fingerprint and encoded variants"""
+    __slots__ = ("path", "media_type", "fingerprint", "bodies", "compressible")
+
+    def __init__(self, path: Path, relative: str):
+        data = path.read_bytes()
+        self.path = path
+        self.media_type = mimetypes.guess_type(relative)[0] or "application/octet-stream"
+        self.fingerprint = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+        self.bodies: Dict[Optional[str], bytes] = {None: data}
+        self.compressible = self.media_type.startswith(COMPRESSIBLE_TYPES)
+
+        if self.compressible:
+            source_mtime = path.stat().st_mtime
+            for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+                variant = path.with_name(path.name + suffix)
+                if encoding in SUPPORTED_ENCODINGS and variant.exists() and variant.stat().st_mtime >= source_mtime:
+                    self.bodies[encoding] = variant.read_bytes()
+
+    def etag(self, encoding: Optional[str]) -> str:
+        suffix = {"br": "-br", "gzip": "-gz"}.get(encoding, "")
+        return f'"{self.fingerprint}{suffix}"'
+
+    def matches(self, if_none_match: Optional[str], encoding: Optional[str]) -> bool:
+        """True if If-None-Match lists this asset's ETag for the representation being served"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        return self.etag(encoding) in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+    def body(self, encoding: Optional[str]) -> bytes:
+        body = self.bodies.get(encoding)
+        if body is None:
+            body = compress(self.bodies[None], encoding, RUNTIME_COMPRESSION_LEVELS[encoding])
+            body = self.bodies.setdefault(encoding, body)
+        return body
+
+
+class AssetManifest:
+    """Content-hash manifest of everything under static/"""
+
+    def __init__(self, static_dir: Path = STATIC_DIR):
+        self.static_dir = static_dir
+        self._assets: Optional[Dict[str, Asset]] = None
+        self._lock = threading.Lock()
+
+    def _scan(self) -> Dict[str, Asset]:
+        assets = {}
+        for path in sorted(self.static_dir.rglob("*")):
+            if not path.is_file() or path.suffix in PRECOMPRESSED_SUFFIXES.values() or path.name == MANIFEST_FILE:
+                continue
+            relative = path.relative_to(self.static_dir).as_posix()
+            assets[relative] = Asset(path, relative)
+        logger.info(f"Built asset manifest ({len(assets)} files)")
+        return assets
+
+    @property
+    def assets(self) -> Dict[str, Asset]:
+        if self._assets is None or not ASSET_CACHE_ENABLED:
+            with self._lock:
+                if self._assets is None or not ASSET_CACHE_ENABLED:
+                    self._assets = self._scan()
+        return self._assets
+
+    def url(self, path: str) -> str:
+        """Fingerprinted URL for a static file (Jinja helper `asset_url`)"""
+        path = path.lstrip("/")
+        asset = self.assets.get(path)
+        if asset is None:
+            logger.warning(f"Unknown static asset referenced: {path}")
+            return f"/static/{path}"
+        return f"/static/{path}?v={asset.fingerprint}"
+
+    def response(self, request: Request, path: str) -> Response:
+        """Serve a static file, choosing a precompressed variant by Accept-Encoding"""
+        asset = self.assets.get(path)
+        if asset is None:
+            return Response(status_code=404, content="Not Found", media_type="text/plain")
+
+        encoding = choose_encoding(request.headers.get("accept-encoding")) if asset.compressible else None
+        fingerprinted = request.query_params.get("v") == asset.fingerprint
+        headers = {
+            "ETag": asset.etag(encoding),
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if fingerprinted else REVALIDATE_CACHE_CONTROL,
+        }
+        if asset.compressible:
+            headers["Vary"] = "Accept-Encoding"
+
+        if asset.matches(request.headers.get("if-none-match"), encoding):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        body = asset.body(encoding)
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            body = b""
+        return Response(content=body, media_type=asset.media_type, headers=headers)
+
+
+def build(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    """Write .br/.gz variants next to every compressible asset and a manifest file"""
+    manifest = AssetManifest(static_dir)
+    entries = {}
+    for relative, asset in manifest._scan().items():
+        entries[relative] = f"{relative}?v={asset.fingerprint}"
+        if not asset.compressible:
+            continue
+        for encoding in SUPPORTED_ENCODINGS:
+            data = compress(asset.bodies[None], encoding, BUILD_COMPRESSION_LEVELS[encoding])
+            asset.path.with_name(asset.path.name + PRECOMPRESSED_SUFFIXES[encoding]).write_bytes(data)
+            print(f"  {relative}{PRECOMPRESSED_SUFFIXES[encoding]}: {len(asset.bodies[None])} -> {len(data)} bytes")
+
+    (static_dir / MANIFEST_FILE).write_text(json.dumps(entries, indent=2, sort_keys=True) + "\n")
+    return entries
+
+
+if __name__ == "__main__":
+    entries = build()
+    print(f"Wrote {MANIFEST_FILE} with {len(entries)} assets")
@@ -0,0 +1,261 @@
+# utils/compression.py - Content-encoding negotiation and compression helpers
+
+import gzip
+import os
+import zlib
+from typing import Dict, Iterable, Optional
+
+from utils import metrics
+
+try:
+    import brotli
+except ImportError:  # Optional - responses fall back to gzip without it
+    brotli = None
+
+BROTLI_AVAILABLE = brotli is not None
+
+# Encodings we can produce, in order of preference when the client rates them equally
+SUPPORTED_ENCODINGS = ("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)
+
+# Set RESPONSE_COMPRESSION=off when a proxy in front of the app already compresses
+RESPONSE_COMPRESSION_ENABLED = os.getenv("RESPONSE_COMPRESSION", "on").lower() != "off"
+
+# Levels for compressing dynamic responses on the fly (see benchmarks/bench_compression.py):
+# brotli 5 / gzip 6 keep most of the size reduction of the maximum levels at a
+# fraction of the CPU cost per request
+STREAM_COMPRESSION_LEVELS = {"br": 5, "gzip": 6}
+
+# Responses smaller than this are sent uncompressed - headers and CPU outweigh the saving
+COMPRESSION_MIN_SIZE = 1024
+
+# Content types worth compressing (binary formats are already compressed)
+COMPRESSIBLE_CONTENT_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+# Strong ETags of encoded bodies get a suffix per content-coding, so each representation
+# has its own validator (as utils/page_cache.py and utils/assets.py do for theirs)
+_ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+# Event streams must reach the client as soon as they are written
+_UNBUFFERED_CONTENT_TYPES = ("text/event-stream",)
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: q-value}"""
+    codings: Dict[str, float] = {}
+    if not header:
+        return codings
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Iterable[str] = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """
+    Pick the best content-coding acceptable to the client
+
+    Returns None when the response should be sent uncompressed (identity).
+    """
+    codings = parse_accept_encoding(accept_encoding)
+    if not codings:
+        return None
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = codings.get(encoding, codings.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """Compress a complete payload (level defaults to the maximum, for one-off precompression)"""
+    if encoding == "br":
+        if not BROTLI_AVAILABLE:
+            raise ValueError("brotli is not installed")
+        return brotli.compress(data, quality=11 if level is None else level)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class StreamCompressor:
+    """Incremental brotli/gzip compressor for a body produced in several chunks"""
+    __slots__ = ("encoding", "_compressor")
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        self.encoding = encoding
+        if level is None:
+            level = STREAM_COMPRESSION_LEVELS[encoding]
+        if encoding == "br":
+            if not BROTLI_AVAILABLE:
+                raise ValueError("brotli is not installed")
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == "gzip":
+            # wbits 16+ writes a gzip header (with mtime 0) instead of a raw zlib stream
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        """Feed a chunk; returns whatever compressed output is ready (possibly empty)"""
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        """Flush all remaining output and end the stream"""
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies chunk by chunk
+
+    Negotiates brotli/gzip from Accept-Encoding and compresses text-like
+    responses (CSV downloads, JSON APIs) as they stream, so a large body is
+    never held in memory twice. Bodies under `minimum_size`, responses that
+    already carry a Content-Encoding (cached pages, static assets), partial
+    (byte range) responses and event streams pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 levels: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = levels or STREAM_COMPRESSION_LEVELS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RESPONSE_COMPRESSION_ENABLED or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = _header(scope["headers"], b"accept-encoding")
+        encoding = choose_encoding(accept_encoding.decode("latin-1") if accept_encoding else None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingSender(send, encoding, self.levels[encoding], self.minimum_size)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingSender:
+    """Per-response state for CompressionMiddleware"""
+    __slots__ = ("send", "encoding", "level", "minimum_size", "start", "pending", "pending_size",
+                 "compressor", "passthrough", "raw_bytes", "compressed_bytes")
+
+    def __init__(self, send, encoding: str, level: int, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start = None
+        self.pending = []
+        self.pending_size = 0
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            headers = message.get("headers", [])
+            content_type = (_header(headers, b"content-type") or b"").decode("latin-1").lower()
+            self.passthrough = (
+                _header(headers, b"content-encoding") is not None
+                or _header(headers, b"content-range") is not None
+                or not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+                or content_type.startswith(_UNBUFFERED_CONTENT_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            # Buffer until we know the body is big enough to be worth compressing
+            if body:
+                self.pending.append(body)
+                self.pending_size += len(body)
+            if self.pending_size < self.minimum_size:
+                if not more_body:
+                    await self.send(self.start)
+                    await self.send({"type": "http.response.body", "body": b"".join(self.pending)})
+                return
+
+            body = b"".join(self.pending)
+            self.pending = []
+            self.compressor = StreamCompressor(self.encoding, self.level)
+
+            if not more_body:
+                # Whole body arrived at once: compress it in one go and send an exact length
+                compressed = self.compressor.compress(body) + self.compressor.finish()
+                await self.send(self._compressed_start(len(compressed)))
+                await self.send({"type": "http.response.body", "body": compressed})
+                self._finished(len(body), len(compressed))
+                return
+            await self.send(self._compressed_start(None))
+
+        compressed = self.compressor.compress(body) if body else b""
+        self.raw_bytes += len(body)
+        if more_body:
+            self.compressed_bytes += len(compressed)
+            if compressed:
+                await self.send({"type": "http.response.body", "body": compressed, "more_body": True})
+            return
+
+        compressed += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": compressed})
+        self._finished(0, len(compressed))
+
+    def _compressed_start(self, content_length: Optional[int]):
+        """Rewrite the held start message's headers for the compressed body"""
+        original = self.start.get("headers", [])
+        headers = [(k, v) for k, v in original if k.lower() not in (b"content-length", b"vary", b"etag")]
+        etag = _header(original, b"etag")
+        if etag is not None:
+            if not etag.startswith(b"W/") and etag.endswith(b'"'):
+                etag = etag[:-1] + _ETAG_SUFFIXES[self.encoding].encode("latin-1") + b'"'
+            headers.append((b"etag", etag))
+        vary = _header(original, b"vary")
+        if vary and b"accept-encoding" not in vary.lower():
+            vary += b", Accept-Encoding"
+        headers.append((b"vary", vary or b"Accept-Encoding"))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return {**self.start, "headers": headers}
+
+    def _finished(self, raw: int, compressed: int):
+        self.raw_bytes += raw
+        self.compressed_bytes += compressed
+        metrics.RESPONSE_COMPRESSION_BYTES_TOTAL.labels(self.encoding, "raw").inc(self.raw_bytes)
+        metrics.RESPONSE_COMPRESSION_BYTES_TOTAL.labels(self.encoding, "compressed").inc(self.compressed_bytes)
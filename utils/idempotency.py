@@ -0,0 +1,244 @@
+# utils/idempotency.py - Idempotency-Key handling for non-repeatable POST requests
+"""
+A client sends `Idempotency-Key: <unique value>` with a request it may retry.
+The first request with a key reserves it with the request's fingerprint; when
+it succeeds, the response body and status code are stored (the body
+zlib-compressed) until the TTL expires. A retry with the same key and body
+replays the stored response without redoing the work (or charging usage
+again); the same key with a different body is rejected with 422.
+
+A retry that arrives while the first request is still running (possibly in
+another worker) polls the backend for up to IDEMPOTENCY_WAIT_SECONDS and
+replays the result; if it is still running then, the answer is 409 with
+Retry-After. Reservations of in-progress requests last
+IDEMPOTENCY_LEASE_SECONDS, so the key frees up if their worker dies.
+
+Backends (IDEMPOTENCY_BACKEND):
+    memory   In-process dict bounded by IDEMPOTENCY_MAX_BYTES - a single worker (default)
+    sqlite   Shared SQLite file (IDEMPOTENCY_SQLITE_PATH) - several workers on one host
+"""
+
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+
+from utils import metrics
+from utils.logging_config import get_logger
+
+logger = get_logger("idempotency")
+
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory").lower()
+IDEMPOTENCY_SQLITE_PATH = os.getenv("IDEMPOTENCY_SQLITE_PATH", "/tmp/ptb_idempotency.sqlite3")
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+
+# How long a running request holds its key, and how long a retry waits for it to finish
+IDEMPOTENCY_LEASE_SECONDS = 15 * 60
+IDEMPOTENCY_WAIT_SECONDS = 20
+_POLL_SECONDS = 0.5
+
+# Upper bound on compressed bodies held by the memory backend (oldest evicted first)
+IDEMPOTENCY_MAX_BYTES = 64 * 1024 * 1024
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# CSV and JSON bodies shrink 5-10x at this level for a few ms of CPU
+_ZLIB_LEVEL = 6
+
+
+class StoredBody(bytes):
+    """A response body with the status code it was (and will be replayed) sent with"""
+
+    def __new__(cls, body: bytes, status_code: int = 200):
+        stored = super().__new__(cls, body)
+        stored.status_code = status_code
+        return stored
+
+
+class IdempotencyRecord(NamedTuple):
+    fingerprint: str
+    body: Optional[bytes]  # Compressed response body, None while the first request is running
+    status_code: int = 200
+
+
+class MemoryBackend:
+    """Records in a process-local dict, expired by TTL and bounded by total body size"""
+
+    def __init__(self, max_bytes: int = IDEMPOTENCY_MAX_BYTES, clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._records: "OrderedDict[str, Tuple[float, IdempotencyRecord]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, key: str, fingerprint: str, ttl: float) -> Optional[IdempotencyRecord]:
+        """Return the live record for key, or reserve the key and return None"""
+        now = self.clock()
+        with self._lock:
+            existing = self._records.get(key)
+            if existing and existing[0] > now:
+                return existing[1]
+            if existing:
+                self._remove(key)
+            self._records[key] = (now + ttl, IdempotencyRecord(fingerprint, None))
+        return None
+
+    def complete(self, key: str, fingerprint: str, body: bytes, ttl: float, status_code: int = 200):
+        with self._lock:
+            self._remove(key)
+            self._records[key] = (self.clock() + ttl, IdempotencyRecord(fingerprint, body, status_code))
+            self._bytes += len(body)
+            self._evict()
+
+    def release(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        existing = self._records.pop(key, None)
+        if existing and existing[1].body is not None:
+            self._bytes -= len(existing[1].body)
+
+    def _evict(self):
+        """Drop expired records, then the oldest ones until under the byte budget"""
+        now = self.clock()
+        for key in [k for k, (expires, _) in self._records.items() if expires <= now]:
+            self._remove(key)
+        while self._bytes > self.max_bytes and self._records:
+            self._remove(next(iter(self._records)))
+
+
+class SQLiteBackend:
+    """Records in a SQLite file shared by every worker on the host"""
+
+    def __init__(self, path: str = IDEMPOTENCY_SQLITE_PATH, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency_keys "
+                "(key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, expires REAL NOT NULL, body BLOB, "
+                "status_code INTEGER NOT NULL DEFAULT 200)"
+            )
+            # Files created before status codes were stored only hold 200 responses
+            if "status_code" not in [row[1] for row in conn.execute("PRAGMA table_info(idempotency_keys)")]:
+                conn.execute("ALTER TABLE idempotency_keys ADD COLUMN status_code INTEGER NOT NULL DEFAULT 200")
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, key: str, fingerprint: str, ttl: float) -> Optional[IdempotencyRecord]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            row = conn.execute("SELECT fingerprint, body, status_code FROM idempotency_keys WHERE key = ? AND expires > ?",
+                               (key, now)).fetchone()
+            if row is None:
+                conn.execute("DELETE FROM idempotency_keys WHERE expires <= ?", (now,))
+                conn.execute("INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, expires, body) "
+                             "VALUES (?, ?, ?, NULL)", (key, fingerprint, now + ttl))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return IdempotencyRecord(*row) if row else None
+
+    def complete(self, key: str, fingerprint: str, body: bytes, ttl: float, status_code: int = 200):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, expires, body, status_code) "
+            "VALUES (?, ?, ?, ?, ?)", (key, fingerprint, self.clock() + ttl, body, status_code)
+        )
+
+    def release(self, key: str):
+        self._connection().execute("DELETE FROM idempotency_keys WHERE key = ? AND body IS NULL", (key,))
+
+
+class IdempotencyStore:
+    """Runs a request's work at most once per (user, Idempotency-Key)"""
+
+    def __init__(self, backend, ttl: float = IDEMPOTENCY_TTL_SECONDS, lease: float = IDEMPOTENCY_LEASE_SECONDS,
+                 wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS, poll_seconds: float = _POLL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.lease = lease
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+
+    async def run(self, user_id: str, idempotency_key: str, fingerprint: str,
+                  func: Callable[[], Awaitable[bytes]]) -> Tuple[bytes, bool]:
+        """
+        Return (body, replayed) for an idempotent request
+
+        func may return a StoredBody to store a status code other than 200;
+        replays always return a StoredBody carrying the stored status code.
+
+        Raises:
+            HTTPException: 400 for an invalid key, 422 if the key was used with a different request,
+                409 if the request with this key is still running
+        """
+        if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise HTTPException(status_code=400,
+                                detail=f"Idempotency-Key must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+
+        key = f"{user_id}:{idempotency_key}"
+        deadline = time.monotonic() + self.wait_seconds
+        # Reserving again picks the key up if the running request failed or its lease ran out
+        # Backend calls are blocking SQLite transactions: keep them off the event loop
+        while (record := await asyncio.to_thread(self.backend.reserve, key, fingerprint, self.lease)) is not None:
+            if record.fingerprint != fingerprint:
+                metrics.IDEMPOTENCY_REQUESTS_TOTAL.labels("conflict").inc()
+                raise HTTPException(
+                    status_code=422,
+                    detail="This Idempotency-Key was already used with a different request. Use a new key."
+                )
+            if record.body is not None:
+                metrics.IDEMPOTENCY_REQUESTS_TOTAL.labels("replayed").inc()
+                logger.info(f"Replaying stored response for Idempotency-Key of user {user_id}")
+                body = await asyncio.to_thread(zlib.decompress, record.body)
+                return StoredBody(body, record.status_code), True
+            # The original request is still running, maybe in another worker: never run it twice
+            if time.monotonic() >= deadline:
+                metrics.IDEMPOTENCY_REQUESTS_TOTAL.labels("in_progress").inc()
+                retry_after = str(max(1, math.ceil(self.wait_seconds)))
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress. Retry shortly.",
+                    headers={"Retry-After": retry_after}
+                )
+            await asyncio.sleep(self.poll_seconds)
+
+        try:
+            body = await func()
+        except BaseException:
+            await asyncio.to_thread(self.backend.release, key)
+            raise
+
+        compressed = await asyncio.to_thread(zlib.compress, body, _ZLIB_LEVEL)
+        status_code = getattr(body, "status_code", 200)
+        await asyncio.to_thread(self.backend.complete, key, fingerprint, compressed, self.ttl, status_code)
+        metrics.IDEMPOTENCY_REQUESTS_TOTAL.labels("stored").inc()
+        return body, False
+
+
+def create_backend(name: str = IDEMPOTENCY_BACKEND):
+    if name == "sqlite":
+        return SQLiteBackend(IDEMPOTENCY_SQLITE_PATH)
+    if name != "memory":
+        logger.warning(f"Unknown IDEMPOTENCY_BACKEND '{name}', using memory")
+    return MemoryBackend()
+
+
+idempotency_store = IdempotencyStore(create_backend())
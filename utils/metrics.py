@@ -0,0 +1,382 @@
+# utils/metrics.py - Lightweight Prometheus-style metrics
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Default latency buckets (seconds) - tuned for AI calls that take 1s-120s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a Prometheus label set, e.g. {provider="deepseek",model="deepseek-chat"}"""
+    parts = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for all metric types"""
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        """Get the child metric for a label combination"""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} requires labels {self.labelnames}")
+        return self._children[()]
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._unlabelled().inc(amount)
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        """Current value per label combination"""
+        return {key: child.value for key, child in list(self._children.items())}
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._unlabelled().dec(amount)
+
+    def set(self, value: float):
+        self._unlabelled().set(value)
+
+    @property
+    def value(self) -> float:
+        return self._unlabelled().value
+
+    def track_inprogress(self):
+        return self._unlabelled().track_inprogress()
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.upper_bounds = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+    def _render_child(self, key, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        bounds = self.upper_bounds + (float("inf"),)
+        counts = list(child.counts)
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ==================== APPLICATION METRICS ====================
+
+AI_REQUEST_SECONDS = Histogram(
+    "ptb_ai_request_seconds",
+    "Wall time of a single AI provider call, including streaming the full response",
+    ["provider", "model"]
+)
+
+AI_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "ptb_ai_time_to_first_token_seconds",
+    "Time from sending an AI request until the first content token is received",
+    ["provider", "model"]
+)
+
+AI_TOKENS_TOTAL = Counter(
+    "ptb_ai_tokens_total",
+    "Tokens consumed by AI calls (kind is prompt, completion or cached)",
+    ["provider", "model", "kind"]
+)
+
+AI_RETRIES_TOTAL = Counter(
+    "ptb_ai_retries_total",
+    "AI calls retried after a transient provider error",
+    ["provider", "model"]
+)
+
+AI_RATE_LIMITED_TOTAL = Counter(
+    "ptb_ai_rate_limited_total",
+    "AI calls rejected by the provider with HTTP 429",
+    ["provider", "model"]
+)
+
+PARSE_SECONDS = Histogram(
+    "ptb_parse_seconds",
+    "Time spent parsing and validating the AI response into questions",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+
+PARSE_FAILURES_TOTAL = Counter(
+    "ptb_parse_failures_total",
+    "AI responses that could not be parsed or failed validation",
+    ["reason"]
+)
+
+CSV_ENCODE_SECONDS = Histogram(
+    "ptb_csv_encode_seconds",
+    "Time spent encoding generated questions into the Udemy CSV format",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+
+GENERATIONS_IN_FLIGHT = Gauge(
+    "ptb_generations_in_flight",
+    "Test generations currently being processed"
+)
+
+AI_CALLS_IN_FLIGHT = Gauge(
+    "ptb_ai_calls_in_flight",
+    "AI provider calls currently in progress"
+)
+
+RESPONSE_COMPRESSION_BYTES_TOTAL = Counter(
+    "ptb_response_compression_bytes_total",
+    "Response body bytes before (raw) and after (compressed) on-the-fly compression",
+    ["encoding", "kind"]
+)
+
+RATE_LIMITED_TOTAL = Counter(
+    "ptb_rate_limited_total",
+    "Requests rejected by the per-tier rate limiter",
+    ["tier"]
+)
+
+COALESCED_CALLS_TOTAL = Counter(
+    "ptb_coalesced_calls_total",
+    "Calls that joined an identical in-flight call instead of doing the work again",
+    ["operation"]
+)
+
+IDEMPOTENCY_REQUESTS_TOTAL = Counter(
+    "ptb_idempotency_requests_total",
+    "Requests carrying an Idempotency-Key (outcome is stored, replayed, conflict or in_progress)",
+    ["outcome"]
+)
+
+GENERATION_BATCHES_TOTAL = Counter(
+    "ptb_generation_batches_total",
+    "Generation batches by outcome (generated, resumed from a checkpoint, or failed)",
+    ["outcome"]
+)
+
+AI_COST_USD_TOTAL = Counter(
+    "ptb_ai_cost_usd_total",
+    "Estimated AI spend in USD from token usage and AI_MODEL_PRICING",
+    ["provider", "model"]
+)
+
+QUESTION_REPAIRS_TOTAL = Counter(
+    "ptb_question_repairs_total",
+    "Problems in generated questions fixed by the validator, by repair rule",
+    ["rule"]
+)
+
+QUESTIONS_REJECTED_TOTAL = Counter(
+    "ptb_questions_rejected_total",
+    "Generated questions rejected for regeneration, by reason",
+    ["reason"]
+)
+
+OFFLOAD_CHUNKS_TOTAL = Counter(
+    "ptb_offload_chunks_total",
+    "Chunks of CPU-heavy work by where they ran (inline, process or thread)",
+    ["task", "mode"]
+)
+
+PREVIEW_REQUESTS_TOTAL = Counter(
+    "ptb_preview_requests_total",
+    "Test preview requests by outcome (generated, cached or timeout)",
+    ["outcome"]
+)
+
+GENERATION_JOBS_TOTAL = Counter(
+    "ptb_generation_jobs_total",
+    "Background generation jobs by delivery mode and outcome (queued, completed or failed)",
+    ["delivery", "outcome"]
+)
+
+AI_BATCH_CALLS_TOTAL = Counter(
+    "ptb_ai_batch_calls_total",
+    "AI calls sent through provider batch APIs (outcome is submitted, succeeded or failed)",
+    ["provider", "outcome"]
+)
+
+ADMISSION_DECISIONS_TOTAL = Counter(
+    "ptb_admission_decisions_total",
+    "Generation admission decisions (admitted, queued, rejected_slo, rejected_queue_full or diverted)",
+    ["decision"]
+)
@@ -0,0 +1,130 @@
+# utils/offload.py - Bounded worker pool for CPU-heavy post-processing
+"""
+Encoding or validating thousands of questions takes tens to hundreds of
+milliseconds of pure CPU; done inside an async handler it stalls the event
+loop for every other request. CpuPool.map splits such work into chunks and
+runs them in a small process pool, at most one chunk per worker at a time,
+so chunks of a large export queue up behind (and interleave with) other
+requests' chunks instead of flooding the pool.
+
+Inputs below the caller's threshold run inline, where shipping them to a
+worker would cost more than the work itself. Chunk functions must be
+module-level (picklable) and should take and return compact data.
+
+Modes (CPU_OFFLOAD):
+    process   Process pool (default); falls back to threads where processes
+              cannot be created (e.g. serverless runtimes without /dev/shm)
+    thread    Thread pool - keeps the event loop responsive, but shares the GIL
+    off       Always inline
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence, TypeVar
+
+from utils.logging_config import get_logger
+from utils import metrics
+
+logger = get_logger("offload")
+
+CPU_OFFLOAD = os.getenv("CPU_OFFLOAD", "process").lower()
+CPU_OFFLOAD_WORKERS = int(os.getenv("CPU_OFFLOAD_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+
+T = TypeVar("T")
+
+
+def _start_method() -> str:
+    # forkserver workers start from a clean interpreter (no copied event loop,
+    # threads or client connections) and only import what the chunk function needs
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class CpuPool:
+    """Lazily created, bounded executor for CPU-bound chunks"""
+
+    def __init__(self, mode: str = CPU_OFFLOAD, max_workers: int = CPU_OFFLOAD_WORKERS):
+        self.mode = mode
+        self.max_workers = max_workers
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._slots: dict = {}  # Event loop -> semaphore bounding chunks in flight
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.mode == "process":
+                        try:
+                            self._executor = ProcessPoolExecutor(
+                                max_workers=self.max_workers,
+                                mp_context=multiprocessing.get_context(_start_method())
+                            )
+                        except (OSError, NotImplementedError, ImportError) as e:
+                            logger.warning(f"Process pool unavailable ({e}), offloading to threads")
+                            self.mode = "thread"
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                            thread_name_prefix="cpu-offload")
+        return self._executor
+
+    def _slots_for(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        slots = self._slots.get(loop)
+        if slots is None:
+            # One semaphore per loop (tests and benchmarks run several loops in turn)
+            self._slots = {key: value for key, value in self._slots.items() if not key.is_closed()}
+            slots = self._slots.setdefault(loop, asyncio.Semaphore(self.max_workers))
+        return slots
+
+    async def _run_chunk(self, func: Callable[[Sequence], T], chunk: Sequence, task: str) -> T:
+        loop = asyncio.get_running_loop()
+        async with self._slots_for(loop):
+            executor = self._get_executor()
+            try:
+                result = await loop.run_in_executor(executor, func, chunk)
+            except (BrokenProcessPool, OSError) as e:
+                if self.mode != "process":
+                    raise
+                if isinstance(e, BrokenProcessPool):
+                    # A worker died (e.g. killed for memory); start a fresh pool next time
+                    logger.error(f"Worker pool broke during {task}, running the chunk in a thread")
+                else:
+                    # Worker processes cannot be started here; stay on threads from now on
+                    logger.warning(f"Cannot start worker processes ({e}), offloading to threads")
+                    self.mode = "thread"
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                executor.shutdown(wait=False)
+                result = await asyncio.to_thread(func, chunk)
+                metrics.OFFLOAD_CHUNKS_TOTAL.labels(task, "thread").inc()
+                return result
+        metrics.OFFLOAD_CHUNKS_TOTAL.labels(task, self.mode).inc()
+        return result
+
+    async def map(self, func: Callable[[Sequence], T], items: Sequence, chunk_size: int,
+                  min_items: int, task: str) -> List[T]:
+        """
+        Apply func to consecutive chunks of items and return the results in order
+
+        With fewer than min_items items (or CPU_OFFLOAD=off) func runs once,
+        inline, on all of them.
+        """
+        if self.mode == "off" or len(items) < min_items:
+            metrics.OFFLOAD_CHUNKS_TOTAL.labels(task, "inline").inc()
+            return [func(items)]
+
+        chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+        return list(await asyncio.gather(*(self._run_chunk(func, chunk, task) for chunk in chunks)))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+cpu_pool = CpuPool()
@@ -0,0 +1,102 @@
+# utils/page_cache.py - Pre-rendered, precompressed HTML pages with conditional GET
+
+import hashlib
+import os
+import threading
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.templating import Jinja2Templates
+
+from utils.compression import SUPPORTED_ENCODINGS, choose_encoding, compress
+from utils.logging_config import get_logger
+
+logger = get_logger("page_cache")
+
+# Set PAGE_CACHE=off during template development to re-render on every request
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE", "on").lower() != "off"
+
+# Browsers revalidate with the ETag after max-age; a 304 costs almost nothing
+PAGE_CACHE_CONTROL = os.getenv("PAGE_CACHE_CONTROL", "public, max-age=300, must-revalidate")
+
+# ETag suffix per content-coding so each representation has its own strong validator
+_ETAG_SUFFIXES = {None: "", "br": "-br", "gzip": "-gz"}
+
+# Pages are compressed at runtime on a cold start: brotli quality 11 is ~7x slower
+# than 9 (about 100ms for the landing page) for only ~10% smaller output
+PAGE_COMPRESSION_LEVELS = {"br": 9, "gzip": 9}
+
+
+class CachedPage:
+    """An HTML page rendered once into immutable byte buffers"""
+    __slots__ = ("bodies", "etags")
+
+    def __init__(self, html: str):
+        identity = html.encode("utf-8")
+        digest = hashlib.sha256(identity).hexdigest()[:20]
+        self.bodies: Dict[Optional[str], bytes] = {None: identity}
+        self.etags = {
+            encoding: f'"{digest}{_ETAG_SUFFIXES[encoding]}"'
+            for encoding in (None,) + tuple(SUPPORTED_ENCODINGS)
+        }
+
+    def body(self, encoding: Optional[str]) -> bytes:
+        """Return the page in the given content-coding, compressing it on first use"""
+        body = self.bodies.get(encoding)
+        if body is None:
+            body = compress(self.bodies[None], encoding, PAGE_COMPRESSION_LEVELS[encoding])
+            body = self.bodies.setdefault(encoding, body)
+        return body
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """True if the client already holds any representation of this page"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return not candidates.isdisjoint(self.etags.values())
+
+
+class PageCache:
+    """
+    Serves static Jinja2 pages from memory
+
+    The page templates only receive `request` in their context and do not
+    use it, so each page is rendered on its first hit and reused for every
+    later request, with gzip/brotli variants compressed once on first use.
+    """
+
+    def __init__(self, templates: Jinja2Templates):
+        self.templates = templates
+        self._pages: Dict[str, CachedPage] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, request: Request) -> CachedPage:
+        page = self._pages.get(name) if PAGE_CACHE_ENABLED else None
+        if page is None:
+            html = self.templates.get_template(name).render({"request": request})
+            page = CachedPage(html)
+            if PAGE_CACHE_ENABLED:
+                with self._lock:
+                    page = self._pages.setdefault(name, page)
+                logger.info(f"Cached page {name} ({len(page.bodies[None])} bytes)")
+        return page
+
+    def response(self, request: Request, name: str) -> Response:
+        """Build the response for a page, answering 304 when the client's copy is current"""
+        page = self.get(name, request)
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        headers = {
+            "ETag": page.etags[encoding],
+            "Cache-Control": PAGE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+
+        if page.matches(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=page.body(encoding), media_type="text/html; charset=utf-8", headers=headers)
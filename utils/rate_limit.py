@@ -0,0 +1,187 @@
+# utils/rate_limit.py - Per-user, per-tier token-bucket rate limiting
+"""
+Each user gets a token bucket holding RATE_LIMIT_REQUESTS_PER_MINUTE[tier]
+tokens that refills continuously over a minute, so short bursts up to the
+limit are allowed but the sustained rate is capped. Buckets are keyed by
+tier and user id, so an upgrade takes effect immediately. Previews
+(preview_rate_limiter) have their own buckets and limits on the same backend.
+
+Backends (RATE_LIMIT_BACKEND):
+    memory   In-process dict - a single worker (default)
+    sqlite   Shared SQLite file (RATE_LIMIT_SQLITE_PATH) - several workers on one host
+    off      No limiting
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+from config import RATE_LIMIT_REQUESTS_PER_MINUTE, PREVIEW_RATE_LIMIT_REQUESTS_PER_MINUTE
+from utils import metrics
+from utils.logging_config import get_logger
+
+logger = get_logger("rate_limit")
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "/tmp/ptb_rate_limit.sqlite3")
+
+RATE_LIMIT_WINDOW_SECONDS = 60.0
+
+# The in-memory backend drops idle (full) buckets once it holds this many keys
+MAX_MEMORY_BUCKETS = 10000
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float  # Seconds until the next request would be allowed (0 if allowed)
+
+
+def _take(tokens: float, updated: float, now: float, capacity: int, rate: float):
+    """Refill a bucket up to `now` and try to take one token; returns (allowed, tokens)"""
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return True, tokens - 1
+    return False, tokens
+
+
+class MemoryBackend:
+    """Token buckets in a process-local dict (one worker)"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._buckets: Dict[str, List[float]] = {}  # key -> [tokens, updated]
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, capacity: int, window: float) -> RateLimitResult:
+        rate = capacity / window
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_MEMORY_BUCKETS:
+                    self._prune(now, window)
+                bucket = self._buckets[key] = [float(capacity), now]
+            allowed, tokens = _take(bucket[0], bucket[1], now, capacity, rate)
+            bucket[0], bucket[1] = tokens, now
+        return RateLimitResult(allowed, int(tokens), 0.0 if allowed else (1 - tokens) / rate)
+
+    def _prune(self, now: float, window: float):
+        """Drop buckets idle for a full window - they have refilled and carry no state"""
+        idle = [key for key, (_, updated) in self._buckets.items() if now - updated >= window]
+        for key in idle:
+            del self._buckets[key]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBackend:
+    """
+    Token buckets in a SQLite file shared by every worker on the host
+
+    Each hit is a single IMMEDIATE transaction, so concurrent workers see a
+    consistent bucket. Durability is not needed (losing the file just resets
+    the limits), so fsync is disabled and the journal is in WAL mode.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, capacity: int, window: float) -> RateLimitResult:
+        rate = capacity / window
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            row = conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (float(capacity), now)
+            allowed, tokens = _take(tokens, updated, now, capacity, rate)
+            conn.execute("INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return RateLimitResult(allowed, int(tokens), 0.0 if allowed else (1 - tokens) / rate)
+
+    def reset(self):
+        self._connection().execute("DELETE FROM rate_limit_buckets")
+
+
+class RateLimiter:
+    """Applies RATE_LIMIT_REQUESTS_PER_MINUTE (or other per-tier limits) on top of a backend"""
+
+    def __init__(self, backend=None, limits: Optional[Dict[str, int]] = None,
+                 window: float = RATE_LIMIT_WINDOW_SECONDS, scope: str = ""):
+        self.backend = backend
+        self.limits = limits or RATE_LIMIT_REQUESTS_PER_MINUTE
+        self.window = window
+        self.scope = scope  # Prefix that keeps this limiter's buckets apart from others on the backend
+
+    def hit(self, user_id: str, tier: str) -> RateLimitResult:
+        limit = self.limits.get(tier, self.limits["free"])
+        key = f"{tier}:{user_id}"
+        return self.backend.hit(f"{self.scope}:{key}" if self.scope else key, limit, self.window)
+
+    def check(self, user_id: str, tier: str):
+        """
+        Count a request against the user's bucket
+
+        Raises:
+            HTTPException: 429 with Retry-After when the bucket is empty
+        """
+        if self.backend is None:
+            return
+        result = self.hit(user_id, tier)
+        if result.allowed:
+            return
+
+        metrics.RATE_LIMITED_TOTAL.labels(tier).inc()
+        retry_after = max(1, math.ceil(result.retry_after))
+        logger.warning(f"Rate limit exceeded for user {user_id} ({tier}), retry after {retry_after}s")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many requests. Please wait {retry_after} seconds and try again.",
+            headers={
+                "Retry-After": str(retry_after),
+                "X-RateLimit-Limit": str(self.limits.get(tier, self.limits["free"])),
+                "X-RateLimit-Remaining": "0",
+            }
+        )
+
+
+def create_backend(name: str = RATE_LIMIT_BACKEND):
+    """Build the configured backend (None disables rate limiting)"""
+    if name == "off":
+        return None
+    if name == "sqlite":
+        return SQLiteBackend(RATE_LIMIT_SQLITE_PATH)
+    if name != "memory":
+        logger.warning(f"Unknown RATE_LIMIT_BACKEND '{name}', using memory")
+    return MemoryBackend()
+
+
+rate_limiter = RateLimiter(create_backend())
+preview_rate_limiter = RateLimiter(rate_limiter.backend, PREVIEW_RATE_LIMIT_REQUESTS_PER_MINUTE, scope="preview")
@@ -0,0 +1,45 @@
+# utils/singleflight.py - Coalesce concurrent identical async calls into one
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from utils import metrics
+from utils.logging_config import get_logger
+
+logger = get_logger("singleflight")
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time
+
+    While a call for a key is in flight, later callers with the same key wait
+    for it and receive the same result (or exception) instead of starting
+    their own. The work runs in its own task, so a waiter that is cancelled
+    (e.g. the client disconnected) does not cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            metrics.COALESCED_CALLS_TOTAL.labels(self.name).inc()
+            logger.info(f"Joining in-flight {self.name} call")
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
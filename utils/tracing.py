@@ -0,0 +1,206 @@
+# utils/tracing.py - Lightweight per-request tracing spans
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.logging_config import get_logger
+
+logger = get_logger("tracing")
+
+# Where finished traces go: "off", "log" (debug log lines) or "jsonl" (append to TRACE_EXPORT_PATH)
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "log").lower()
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+
+# Request paths that are never traced
+UNTRACED_PREFIXES = ("/static", "/metrics", "/health")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+_export_executor: Optional[ThreadPoolExecutor] = None
+
+
+class Span:
+    """A timed operation within a trace"""
+    __slots__ = ("name", "trace", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(self, name: str, trace: "Trace", parent_id: Optional[str] = None, **attributes):
+        self.name = name
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes: Dict[str, Any] = attributes
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_offset_ms": round((self.start - self.trace.root.start) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """Tree of spans recorded for a single request"""
+
+    def __init__(self, name: str, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self.root = Span(name, self, **attributes)
+        self.spans.append(self.root)
+
+    def finish(self):
+        if self.root.end is None:
+            self.root.end = time.perf_counter()
+
+    def server_timing(self) -> str:
+        """
+        Build a Server-Timing header value with the wall-clock time per stage
+
+        Parallel spans of the same stage overlap, so each stage reports the
+        union of its spans' intervals (never more than the total) and how
+        many spans it had.
+        """
+        now = time.perf_counter()
+        intervals: Dict[str, List[Tuple[float, float]]] = {}
+        for span in self.spans[1:]:
+            key = re.sub(r"[^A-Za-z0-9_.-]", "_", span.name)
+            intervals.setdefault(key, []).append((span.start, span.end if span.end is not None else now))
+        entries = []
+        for name, spans in intervals.items():
+            covered, reached = 0.0, float("-inf")
+            for start, end in sorted(spans):
+                if end > reached:
+                    covered += end - max(start, reached)
+                    reached = end
+            entries.append(f'{name};dur={covered * 1000:.1f};desc="{len(spans)}x"')
+        entries.append(f"total;dur={self.root.duration_ms:.1f}")
+        return ", ".join(entries)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [span.to_dict() for span in self.spans]
+
+
+def current_span() -> Optional[Span]:
+    """Return the innermost active span, if a trace is in progress"""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block of code as a child of the current span
+
+    Does nothing (beyond yielding None) when no trace is active, so it is
+    safe to use in code that also runs outside of HTTP requests.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.trace, parent.span_id, **attributes)
+    parent.trace.spans.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def _write_jsonl(trace: Trace):
+    try:
+        lines = "".join(json.dumps(s, default=str) + "\n" for s in trace.to_dicts())
+        with open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+            f.write(lines)
+    except Exception as e:
+        logger.error(f"Failed to export trace {trace.trace_id}: {str(e)}")
+
+
+def _exporter() -> ThreadPoolExecutor:
+    global _export_executor
+    if _export_executor is None:
+        with _export_lock:
+            if _export_executor is None:
+                # One thread keeps traces in order and appends to the file without a lock
+                _export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+    return _export_executor
+
+
+def export_trace(trace: Trace):
+    """
+    Send a finished trace to the configured exporter
+
+    JSONL appends happen on a background thread, so the request path (and
+    the event loop) never waits on file I/O.
+    """
+    if TRACE_EXPORT == "off":
+        return
+    try:
+        if TRACE_EXPORT == "jsonl":
+            _exporter().submit(_write_jsonl, trace)
+        elif logger.isEnabledFor(logging.DEBUG):
+            for s in trace.to_dicts():
+                logger.debug(f"[TRACE] {json.dumps(s, default=str)}")
+    except Exception as e:
+        logger.error(f"Failed to export trace {trace.trace_id}: {str(e)}")
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that opens a root span per HTTP request
+
+    Adds a Server-Timing header with per-stage durations and exports the
+    finished span tree once the response has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(UNTRACED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}", method=scope["method"], path=scope["path"])
+        token = _current_span.set(trace.root)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                trace.root.set_attribute("status_code", message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            trace.finish()
+            _current_span.reset(token)
+            export_trace(trace)